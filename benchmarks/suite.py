@@ -0,0 +1,207 @@
+"""
+Benchmarks for the gin_rummy hot paths.
+
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --compare baseline.json --threshold 0.1
+
+A comparison exits with status 1 when any benchmark is slower than the baseline by
+more than the threshold (a fraction of the baseline time).
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+
+from gin_rummy import knock_evaluation
+from gin_rummy.cards import Card, Deck, Rank, Suit
+from gin_rummy.deadwood_cache import DeadwoodCache
+from gin_rummy.gin_rummy import Action, GinRummy
+from gin_rummy.observation import ObservationEncoder
+from gin_rummy.rollout import GreedyAgent
+
+NUM_HANDS = 200
+NUM_ROLLOUTS = 20
+
+
+def random_hands(rng, size):
+    deck = Card.enumerate()
+    return [rng.sample(deck, size) for _ in range(NUM_HANDS)]
+
+
+def meld_heavy_hands(rng, size):
+    """ Hands drawn from the four lowest ranks, full of overlapping sets and runs """
+    low_cards = [card for card in Card.enumerate() if card.rank_value < 4]
+    return [rng.sample(low_cards, size) for _ in range(NUM_HANDS)]
+
+
+def adversarial_hand():
+    """ Two four-of-a-kinds and a three-of-a-kind, every card also in runs """
+    return [Card(suit, rank) for rank in (Rank.ACE, Rank.TWO) for suit in Suit] + \
+        [Card(suit, Rank.THREE) for suit in (Suit.SPADES, Suit.DIAMONDS, Suit.CLUBS)]
+
+
+def knock_pairs(rng):
+    """ Knocking hands of at most 10 deadwood, each with a disjoint opponent hand """
+    deck = Card.enumerate()
+    pairs = []
+    while len(pairs) < NUM_HANDS:
+        cards = rng.sample(deck, 20)
+        if knock_evaluation.calc_optimal_deadwood(cards[:10])[0] <= knock_evaluation.MAX_KNOCK_DEADWOOD:
+            pairs.append((cards[:10], cards[10:]))
+    return pairs
+
+
+def playing_games(rng, count=50):
+    """ Games part way through, on a turn with a full 11 card hand or a draw to make """
+    games = []
+    while len(games) < count:
+        game = GinRummy(seed=rng.getrandbits(63))
+        for _ in range(rng.randrange(4, 30)):
+            if game.is_ended():
+                break
+            game.take_action(random_action(game, rng))
+        if not game.is_ended():
+            games.append(game)
+    return games
+
+
+def random_action(game, rng):
+    valid_actions = game.get_valid_actions(game.get_cur_player())
+    return rng.choice([action for action, valid in enumerate(valid_actions) if valid and action != Action.KNOCK])
+
+
+def random_playout(rng):
+    game = GinRummy(seed=rng.getrandbits(63))
+    steps = 0
+    while not game.is_ended() and steps < 1000:
+        game.take_action(random_action(game, rng))
+        steps += 1
+
+
+def build_benchmarks():
+    """ Returns name -> (function, operations per call) """
+    rng = random.Random(0)
+    hands = random_hands(rng, 10)
+    hands_11 = random_hands(rng, 11)
+    heavy_hands = meld_heavy_hands(rng, 11)
+    adversarial = adversarial_hand()
+    knocks = knock_pairs(rng)
+    games = playing_games(rng)
+    draw_games = [game for game in games if len(game.hands[game.get_cur_player()]) == 10]
+    actions = [random_action(game, rng) for game in draw_games]
+    encoder = ObservationEncoder()
+    observations = encoder.allocate(len(games))
+    agent = GreedyAgent()
+    rollout_steps = sum(agent.rollout(GinRummy(seed=0, game=i)) for i in range(NUM_ROLLOUTS))
+
+    def each(function, items):
+        return lambda: [function(item) for item in items], len(items)
+
+    def take_actions():
+        for game, action in zip(draw_games, actions):
+            game.clone().take_action(action)
+
+    def draw_and_get_valid_actions():
+        for game, action in zip(draw_games, actions):
+            drawn = game.clone()
+            drawn.take_action(action)
+            drawn.get_valid_actions(drawn.get_cur_player())
+
+    def rollouts():
+        for i in range(NUM_ROLLOUTS):
+            agent.rollout(GinRummy(seed=0, game=i))
+
+    def shuffle():
+        deck = Deck()
+        deck.shuffle()
+
+    return {
+        'calc_optimal_deadwood/random': each(knock_evaluation.calc_optimal_deadwood, hands),
+        'calc_optimal_deadwood/meld_heavy': each(knock_evaluation.calc_optimal_deadwood, heavy_hands),
+        'calc_optimal_deadwood/adversarial': each(knock_evaluation.calc_optimal_deadwood, [adversarial]),
+        'calc_optimal_deadwood/tree_adversarial':
+            each(lambda hand: knock_evaluation.calc_optimal_deadwood(hand, solver='tree'), [adversarial]),
+        'can_knock': each(knock_evaluation.can_knock, hands_11),
+        'evaluate_knock': each(lambda pair: knock_evaluation.evaluate_knock(*pair), knocks),
+        'get_all_melds': each(knock_evaluation.get_all_melds, heavy_hands),
+        'deck/create': (Deck, 1),
+        'deck/shuffle': (shuffle, 1),
+        # The same games every call, so hands' meld states are already up to date
+        'gin_rummy/get_valid_actions_cached':
+            each(lambda game: game.get_valid_actions(game.get_cur_player()), games),
+        'gin_rummy/take_action': (take_actions, len(draw_games)),
+        # A new 11 card hand every call, so the knock check works out its discards
+        'gin_rummy/draw_and_get_valid_actions': (draw_and_get_valid_actions, len(draw_games)),
+        'gin_rummy/get_observation': each(lambda game: game.get_observation(game.get_cur_player()), games),
+        'gin_rummy/encode_observations': (lambda: encoder.encode_games(games, out=observations), len(games)),
+        'gin_rummy/clone': each(GinRummy.clone, games),
+        'gin_rummy/greedy_rollout_step': (rollouts, rollout_steps),
+        'gin_rummy/random_playout': (lambda: random_playout(rng), 1),
+    }
+
+
+def run(selected=None, repeat=5, min_time=0.2):
+    """ Returns name -> {'seconds_per_op', 'ops_per_second'}, best of repeat runs """
+    # Measure solves, not cache hits
+    saved_cache = knock_evaluation.cache
+    knock_evaluation.cache = DeadwoodCache(capacity=0)
+    results = {}
+    try:
+        for name, (function, operations) in build_benchmarks().items():
+            if selected and not any(pattern in name for pattern in selected):
+                continue
+            number, _ = timeit.Timer(function).autorange()
+            number = max(1, int(number * min_time / 0.2))
+            seconds = min(timeit.repeat(function, number=number, repeat=repeat)) / (number * operations)
+            results[name] = {'seconds_per_op': seconds, 'ops_per_second': 1 / seconds}
+    finally:
+        knock_evaluation.cache = saved_cache
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ Returns (name, baseline seconds, current seconds, change) for every regression over the threshold """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['seconds_per_op']
+        change = result['seconds_per_op'] / before - 1
+        if change > threshold:
+            regressions.append((name, before, result['seconds_per_op'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', help='write results to this JSON baseline')
+    parser.add_argument('--compare', help='compare against this JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown, as a fraction')
+    parser.add_argument('--filter', action='append', help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.repeat)
+    for name, result in results.items():
+        print(f"{name:40} {result['seconds_per_op'] * 1e6:12.2f} us {result['ops_per_second']:14.0f} ops/s")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(), 'time': time.time(), 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before * 1e6:.2f} us -> {after * 1e6:.2f} us (+{change:.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
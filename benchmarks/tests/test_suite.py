@@ -0,0 +1,31 @@
+from benchmarks.suite import compare
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def results(**seconds):
+    return {name: {'seconds_per_op': value, 'ops_per_second': 1 / value} for name, value in seconds.items()}
+
+
+class TestCompare(unittest.TestCase):
+    def setUp(self) -> None:
+        self.baseline = results(deal=1e-6, solve=2e-6)
+
+    def test_regression_over_threshold(self):
+        regressions = compare(results(deal=1.25e-6, solve=2e-6), self.baseline, 0.1)
+        self.assertEqual(len(regressions), 1)
+        name, before, after, change = regressions[0]
+        self.assertEqual((name, before, after), ('deal', 1e-6, 1.25e-6))
+        self.assertAlmostEqual(change, 0.25)
+
+    def test_within_threshold(self):
+        self.assertEqual(compare(results(deal=1.05e-6, solve=1.5e-6), self.baseline, 0.1), [])
+
+    def test_missing_from_baseline(self):
+        self.assertEqual(compare(results(deal=1e-6, encode=5e-6), self.baseline, 0.1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
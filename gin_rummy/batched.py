@@ -0,0 +1,234 @@
+import numpy as np
+
+from gin_rummy.gin_rummy import Action, CardState, DISCARD_OFFSET, GinRummy, HAND_SIZE, LOC_DISCARD, LOC_HAND, \
+    LOC_STOCK, NUM_ACTIONS, NUM_CARDS
+from gin_rummy.dealing import deal_decks, new_seed
+from gin_rummy.knock_evaluation import MAX_KNOCK_DEADWOOD, calc_discard_deadwood_mask
+
+# Observation value of every location, seen from each player. Known opponent cards
+# and the top discard are patched in afterwards.
+_OBSERVATION_TABLE = np.array([
+    [CardState.STOCK, CardState.MY_HAND, CardState.STOCK, CardState.DISCARD],
+    [CardState.STOCK, CardState.STOCK, CardState.MY_HAND, CardState.DISCARD],
+], dtype=np.uint8)
+
+_BIT_VALUES = np.uint64(1) << np.arange(NUM_CARDS, dtype=np.uint64)
+
+
+class BatchedGinRummy:
+    """
+    N games of GinRummy held as NumPy arrays and stepped together, with the same rules.
+    Per game state is the location of all 52 cards, the stock in draw order (drawn
+    from the end, like Deck.draw), the discard pile in order, the turn counter, the
+    current player, whether the first upcard was taken and which held cards are known
+    to the other player (picked up from the discard pile). Knocks are scored one game
+    at a time through GinRummy.evaluate_knock; the knocker is -1 until a game ends that way.
+    """
+
+    def __init__(self, num_games: int, seed: int = None):
+        self.num_games = num_games
+        self.seed = seed if seed is not None else new_seed()
+        self.next_game = 0  # Index under seed of the next game dealt
+        self.game_ids = np.zeros(num_games, dtype=np.int64)
+        self.locations = np.zeros((num_games, NUM_CARDS), dtype=np.int8)
+        self.stock = np.zeros((num_games, NUM_CARDS), dtype=np.int8)
+        self.stock_size = np.zeros(num_games, dtype=np.int32)
+        self.discard_pile = np.zeros((num_games, NUM_CARDS), dtype=np.int8)
+        self.discard_size = np.zeros(num_games, dtype=np.int32)
+        self.dealer = np.zeros(num_games, dtype=np.int8)
+        self.turn = np.zeros(num_games, dtype=np.int32)
+        self.cur_player = np.zeros(num_games, dtype=np.int8)
+        self.is_first_upcard_taken = np.zeros(num_games, dtype=bool)
+        self.known = np.zeros((num_games, NUM_CARDS), dtype=bool)
+        self.knocker = np.full(num_games, -1, dtype=np.int8)
+        self.points = np.zeros(num_games, dtype=np.int32)
+        self.knock_results = [None] * num_games
+        self.reset()
+
+    def reset(self, games=None):
+        """
+        Deals new hands for the given game slots, or for all of them. Each deal is the
+        next game under the batch seed (see dealing), so slot i plays the same game as
+        GinRummy(seed=seed, game=game_ids[i]).
+        """
+        if games is None:
+            games = np.arange(self.num_games)
+        games = np.asarray(games)
+        n = len(games)
+        if n == 0:
+            return
+        ids = np.arange(self.next_game, self.next_game + n)
+        self.next_game += n
+        decks, dealer = deal_decks(self.seed, ids)
+        self.deal(games, decks.astype(np.int8), dealer.astype(np.int8))
+        self.game_ids[games] = ids
+
+    def deal(self, games, decks, dealer):
+        """
+        Deals each deck (cards are drawn from the end, as in GinRummy.deal): 10 cards
+        to each player alternately starting with the dealer's opponent, then the upcard.
+        """
+        games = np.asarray(games)
+        rows = games[:, None]
+        non_dealer = 1 - dealer
+        self.stock[games] = decks
+        self.locations[games] = LOC_STOCK
+        first = np.arange(NUM_CARDS - 1, NUM_CARDS - 1 - 2 * HAND_SIZE, -2)
+        self.locations[rows, decks[:, first]] = (non_dealer + 1)[:, None]
+        self.locations[rows, decks[:, first - 1]] = (dealer + 1)[:, None]
+        upcard = decks[:, NUM_CARDS - 1 - 2 * HAND_SIZE]
+        self.locations[games, upcard] = LOC_DISCARD
+        self.discard_pile[games, 0] = upcard
+        self.discard_size[games] = 1
+        self.stock_size[games] = NUM_CARDS - 1 - 2 * HAND_SIZE
+        self.dealer[games] = dealer
+        self.turn[games] = 1
+        self.cur_player[games] = non_dealer
+        self.is_first_upcard_taken[games] = False
+        self.known[games] = False
+        self.knocker[games] = -1
+        self.points[games] = 0
+        for game in games:
+            self.knock_results[game] = None
+
+    def get_game(self, i: int) -> GinRummy:
+        """ Returns a copy of game i as a GinRummy """
+        game = GinRummy.__new__(GinRummy)
+        game.state = bytearray(self.locations[i].tobytes() + self.stock[i].tobytes() + self.discard_pile[i].tobytes())
+        game.stock_size = int(self.stock_size[i])
+        game.discard_size = int(self.discard_size[i])
+        game.hand_masks = [int(((self.locations[i] == loc) * _BIT_VALUES).sum(dtype=np.uint64)) for loc in LOC_HAND]
+        game.known_masks = [int(((self.locations[i] == loc) * self.known[i] * _BIT_VALUES).sum(dtype=np.uint64))
+                            for loc in LOC_HAND]
+        game.meld_states = [None, None]  # Built on first use
+        game.meld_owned = 0
+        game.dealer = int(self.dealer[i])
+        game.turn = int(self.turn[i])
+        game.cur_player = int(self.cur_player[i])
+        game.is_first_upcard_taken = bool(self.is_first_upcard_taken[i])
+        game.knocker = int(self.knocker[i]) if self.knocker[i] >= 0 else None
+        game.knock_result = self.knock_results[i]
+        game.seed = self.seed
+        game.game = int(self.game_ids[i])
+        return game
+
+    def get_action_size(self):
+        return NUM_ACTIONS
+
+    def get_observation_size(self):
+        return NUM_CARDS
+
+    def get_cur_player(self):
+        return self.cur_player
+
+    def get_hand_masks(self, players=None) -> np.ndarray:
+        """ 52-bit hand bitmasks (see bit_hand) of the given players, by default the current ones """
+        if players is None:
+            players = self.cur_player
+        held = self.locations == (np.asarray(players) + 1)[:, None]
+        return (held * _BIT_VALUES).sum(axis=1, dtype=np.uint64)
+
+    def get_valid_actions(self) -> np.ndarray:
+        """ Returns an (N, 56) array of valid actions for the current player of every game """
+        valid_actions = np.zeros((self.num_games, NUM_ACTIONS), dtype=np.uint8)
+        held = self.locations == (self.cur_player + 1)[:, None]
+        hand_size = held.sum(axis=1)
+        full = hand_size == HAND_SIZE + 1
+        valid_actions[full, DISCARD_OFFSET:] = held[full]
+        if full.any():
+            masks = (held[full] * _BIT_VALUES).sum(axis=1, dtype=np.uint64)
+            valid_actions[full, Action.KNOCK] = [
+                min(deadwood for _, deadwood in calc_discard_deadwood_mask(int(mask))) <= MAX_KNOCK_DEADWOOD
+                for mask in masks]
+
+        upcard = ~full & ~self.is_first_upcard_taken & (self.turn <= 2)
+        valid_actions[upcard, Action.DRAW_DISCARD] = 1
+        valid_actions[upcard, Action.PASS] = 1
+
+        forced_stock = ~full & ~self.is_first_upcard_taken & (self.turn == 3)
+        valid_actions[forced_stock, Action.DRAW_STOCK] = 1
+
+        draw = ~full & ~upcard & ~forced_stock
+        valid_actions[draw, Action.DRAW_STOCK] = 1
+        valid_actions[draw, Action.DRAW_DISCARD] = 1
+        valid_actions[self.is_ended()] = 0
+        return valid_actions
+
+    def take_action(self, actions):
+        """ Applies one action per game, for the current player of that game """
+        actions = np.asarray(actions)
+        games = np.arange(self.num_games)
+
+        draw_stock = games[actions == Action.DRAW_STOCK]
+        if len(draw_stock):
+            self.stock_size[draw_stock] -= 1
+            card = self.stock[draw_stock, self.stock_size[draw_stock]]
+            self.locations[draw_stock, card] = self.cur_player[draw_stock] + 1
+
+        draw_discard = games[actions == Action.DRAW_DISCARD]
+        if len(draw_discard):
+            self.discard_size[draw_discard] -= 1
+            card = self.discard_pile[draw_discard, self.discard_size[draw_discard]]
+            self.locations[draw_discard, card] = self.cur_player[draw_discard] + 1
+            self.known[draw_discard, card] = True
+            self.is_first_upcard_taken[draw_discard] |= self.turn[draw_discard] <= 2
+
+        discard = games[actions >= DISCARD_OFFSET]
+        if len(discard):
+            card = actions[discard] - DISCARD_OFFSET
+            if np.any(self.locations[discard, card] != self.cur_player[discard] + 1):
+                raise Exception("Can't discard card not held in hand")
+            self.locations[discard, card] = LOC_DISCARD
+            self.known[discard, card] = False
+            self.discard_pile[discard, self.discard_size[discard]] = card
+            self.discard_size[discard] += 1
+
+        for game in games[actions == Action.KNOCK]:
+            self.knock(game)
+
+        next_turn = games[(actions == Action.PASS) | (actions >= DISCARD_OFFSET)]
+        self.turn[next_turn] += 1
+        self.cur_player[next_turn] = 1 - self.cur_player[next_turn]
+
+    def knock(self, i: int):
+        """ Ends game i with its current player knocking, scored by GinRummy.evaluate_knock """
+        game = self.get_game(i)
+        result = game.evaluate_knock()
+        if game.discard_size > self.discard_size[i]:
+            card = game.discard_pile[-1].value()
+            self.locations[i, card] = LOC_DISCARD
+            self.known[i, card] = False
+            self.discard_pile[i, self.discard_size[i]] = card
+            self.discard_size[i] += 1
+        self.knocker[i] = game.knocker
+        self.points[i] = result.points
+        self.knock_results[i] = result
+
+    def is_draw(self) -> np.ndarray:
+        """ Games whose stock is down to two cards with nobody having knocked, see GinRummy.is_draw """
+        hand_size = (self.locations == (self.cur_player + 1)[:, None]).sum(axis=1)
+        return (self.knocker < 0) & (self.stock_size <= 2) & (hand_size == HAND_SIZE)
+
+    def is_ended(self) -> np.ndarray:
+        return (self.knocker >= 0) | self.is_draw()
+
+    def get_score(self) -> np.ndarray:
+        """ (N, 2) scores of both players, as GinRummy.get_score """
+        scores = np.zeros((self.num_games, 2), dtype=np.int8)
+        knocked = np.flatnonzero(self.knocker >= 0)
+        winner = np.where(self.points[knocked] > 0, self.knocker[knocked], 1 - self.knocker[knocked])
+        scores[knocked, winner] = 1
+        scores[knocked, 1 - winner] = -1
+        return scores
+
+    def get_observation(self, players=None) -> np.ndarray:
+        """ Returns an (N, 52) array of CardState values, by default for the current players """
+        if players is None:
+            players = self.cur_player
+        players = np.asarray(players)
+        observation = _OBSERVATION_TABLE[players[:, None], self.locations]
+        observation[self.known & (self.locations == (2 - players)[:, None])] = CardState.OPP_HAND
+        games = np.flatnonzero(self.discard_size > 0)
+        top = self.discard_pile[games, self.discard_size[games] - 1]
+        observation[games, top] = CardState.TOP_DISCARD
+        return observation
@@ -0,0 +1,488 @@
+from typing import Dict, Iterable, List, Tuple
+
+from gin_rummy.cards import Card, Rank, Suit
+
+# A hand is stored as a 52-bit integer in a 4x13-bit suit layout: bit
+# `suit * 13 + rank` is set when the card is held, which is exactly Card.value().
+NUM_RANKS = len(Rank)
+NUM_SUITS = len(Suit)
+NUM_CARDS = NUM_RANKS * NUM_SUITS
+SUIT_BITS = (1 << NUM_RANKS) - 1
+FULL_MASK = (1 << NUM_CARDS) - 1
+
+POINT_VALUES = [min(rank + 1, 10) for rank in range(NUM_RANKS)]
+CARD_POINTS = [POINT_VALUES[card % NUM_RANKS] for card in range(NUM_CARDS)]
+RANK_MASKS = [sum(1 << (suit * NUM_RANKS + rank) for suit in range(NUM_SUITS)) for rank in range(NUM_RANKS)]
+SUIT_MASKS = [SUIT_BITS << (suit * NUM_RANKS) for suit in range(NUM_SUITS)]
+
+# Deadwood of every possible 13-bit suit pattern, so a hand costs four lookups.
+_SUIT_DEADWOOD = [0] * (1 << NUM_RANKS)
+for _pattern in range(1, 1 << NUM_RANKS):
+    _low = (_pattern & -_pattern).bit_length() - 1
+    _SUIT_DEADWOOD[_pattern] = _SUIT_DEADWOOD[_pattern & (_pattern - 1)] + POINT_VALUES[_low]
+
+_CARDS = tuple(Card.enumerate())
+
+
+def popcount(mask: int) -> int:
+    return mask.bit_count()
+
+
+def card_bit(card: Card) -> int:
+    return 1 << card.value()
+
+
+def cards_to_mask(cards: Iterable[Card]) -> int:
+    mask = 0
+    for card in cards:
+        mask |= 1 << card.value()
+    return mask
+
+
+def mask_to_cards(mask: int) -> List[Card]:
+    """ Returns the cards of a mask, ordered by Card.value() """
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(_CARDS[low.bit_length() - 1])
+        mask ^= low
+    return cards
+
+
+def mask_deadwood(mask: int) -> int:
+    return (_SUIT_DEADWOOD[mask & SUIT_BITS] +
+            _SUIT_DEADWOOD[(mask >> NUM_RANKS) & SUIT_BITS] +
+            _SUIT_DEADWOOD[(mask >> 2 * NUM_RANKS) & SUIT_BITS] +
+            _SUIT_DEADWOOD[(mask >> 3 * NUM_RANKS) & SUIT_BITS])
+
+
+def is_run_mask(mask: int) -> bool:
+    """ True for 3 or more consecutive ranks of a single suit """
+    if popcount(mask) < 3:
+        return False
+    for suit_mask in SUIT_MASKS:
+        if mask & suit_mask == mask:
+            low = mask & -mask
+            return (mask + low) & mask == 0
+    return False
+
+
+def is_set_mask(mask: int) -> bool:
+    """ True for 3 or 4 cards of the same rank """
+    if popcount(mask) < 3:
+        return False
+    low = (mask & -mask).bit_length() - 1
+    return mask & RANK_MASKS[low % NUM_RANKS] == mask
+
+
+def _build_suit_runs():
+    """ For every 13-bit suit pattern, the 3, 4 and 5 card runs it contains """
+    windows = [((1 << length) - 1) << start
+               for length in (3, 4, 5) for start in range(NUM_RANKS - length + 1)]
+    return [tuple(w for w in windows if pattern & w == w) for pattern in range(1 << NUM_RANKS)]
+
+
+def _build_rank_sets():
+    """ For every 4-bit pattern of suits within a rank, the 3 and 4 card sets it contains """
+    table = []
+    for pattern in range(16):
+        if popcount(pattern) == 4:
+            table.append((pattern,) + tuple(pattern ^ (1 << s) for s in range(NUM_SUITS)))
+        elif popcount(pattern) == 3:
+            table.append((pattern,))
+        else:
+            table.append(())
+    return table
+
+
+_SUIT_RUNS = _build_suit_runs()
+_RANK_SETS = _build_rank_sets()
+
+
+def _spread_rank_pattern(pattern: int, rank: int) -> int:
+    mask = 0
+    for suit in range(NUM_SUITS):
+        if pattern >> suit & 1:
+            mask |= 1 << (suit * NUM_RANKS + rank)
+    return mask
+
+
+def _rank_pattern(mask: int, rank: int) -> int:
+    """ The 4-bit pattern of suits held at a rank """
+    return ((mask >> rank & 1) |
+            (mask >> (NUM_RANKS + rank) & 1) << 1 |
+            (mask >> (2 * NUM_RANKS + rank) & 1) << 2 |
+            (mask >> (3 * NUM_RANKS + rank) & 1) << 3)
+
+
+_SET_MASKS = [[tuple(_spread_rank_pattern(s, rank) for s in _RANK_SETS[pattern]) for pattern in range(16)]
+              for rank in range(NUM_RANKS)]
+
+
+def get_all_meld_masks(mask: int) -> List[int]:
+    """ Same melds as knock_evaluation.get_all_melds: all 3 and 4 card sets, and 3 to 5 card runs """
+    melds = []
+    for rank in range(NUM_RANKS):
+        rank_bits = mask & RANK_MASKS[rank]
+        if rank_bits and popcount(rank_bits) >= 3:
+            pattern = 0
+            for suit in range(NUM_SUITS):
+                if rank_bits >> (suit * NUM_RANKS + rank) & 1:
+                    pattern |= 1 << suit
+            melds.extend(_SET_MASKS[rank][pattern])
+    for suit in range(NUM_SUITS):
+        shift = suit * NUM_RANKS
+        for run in _SUIT_RUNS[(mask >> shift) & SUIT_BITS]:
+            melds.append(run << shift)
+    return melds
+
+
+class MeldSearch:
+    """
+    Finds the highest melded point total, and the non-overlapping melds achieving it,
+    for any subset of the cards covered by a fixed list of melds.
+    Branches on the lowest card still covered by a meld: either it stays deadwood, or
+    it is used by one of the melds containing it. Results are memoized by the mask of
+    remaining cards, so overlapping melds never cause the factorial blow-up of
+    knock_evaluation.build_meld_tree, and sub-hands of the same hand share their work.
+    """
+    __slots__ = ('by_card', 'covered', 'memo', 'losses')
+
+    def __init__(self, melds: List[int]):
+        self.by_card = {}
+        self.covered = 0
+        for meld in melds:
+            self.covered |= meld
+            score = mask_deadwood(meld)
+            rest = meld
+            while rest:
+                low = rest & -rest
+                self.by_card.setdefault(low, []).append((meld, score))
+                rest ^= low
+        self.memo = {0: (0, ())}
+        self.losses = {}
+
+    def search(self, remaining: int) -> Tuple[int, tuple]:
+        result = self.memo.get(remaining)
+        if result is not None:
+            return result
+        low = remaining & -remaining
+        best_score, best_melds = self.search(remaining ^ low)
+        for meld, score in self.by_card[low]:
+            if meld & remaining == meld:
+                sub_score, sub_melds = self.search(remaining ^ meld)
+                if sub_score + score > best_score:
+                    best_score = sub_score + score
+                    best_melds = (meld,) + sub_melds
+        self.memo[remaining] = best_score, best_melds
+        return best_score, best_melds
+
+    def best(self, mask: int) -> Tuple[int, List[int]]:
+        score, melds = self.search(mask & self.covered)
+        return score, list(melds)
+
+    def discard_losses(self, mask: int) -> Dict[int, int]:
+        """ Card bit -> melded points lost by removing it from the mask, for every card of the mask """
+        losses = self.losses.get(mask)
+        if losses is None:
+            score = self.search(mask & self.covered)[0]
+            losses = {}
+            rest = mask
+            while rest:
+                low = rest & -rest
+                rest ^= low
+                losses[low] = score - self.search((mask ^ low) & self.covered)[0]
+            self.losses[mask] = losses
+        return losses
+
+
+def best_meld_combination(mask: int, melds: List[int]) -> Tuple[int, List[int]]:
+    """ Returns the highest melded point total and the non-overlapping melds achieving it """
+    if not melds:
+        return 0, []
+    return MeldSearch(melds).best(mask)
+
+
+def discard_deadwoods(mask: int, stats: dict = None) -> List[Tuple[int, int]]:
+    """
+    Returns (card value, optimal deadwood after discarding it) for every card in the
+    mask, in card value order. Melds are enumerated once for the full hand and every
+    sub-hand searches through the same memo. If given, stats receives the number of
+    candidate melds and search nodes.
+    """
+    melds = get_all_meld_masks(mask)
+    search = MeldSearch(melds)
+    total = mask_deadwood(mask)
+    results = []
+    rest = mask
+    while rest:
+        low = rest & -rest
+        rest ^= low
+        score, _ = search.best(mask ^ low)
+        results.append((low.bit_length() - 1, total - mask_deadwood(low) - score))
+    if stats is not None:
+        stats['melds'] = len(melds)
+        stats['nodes'] = len(search.memo) - 1
+    return results
+
+
+def melds_with(mask: int, card: int) -> List[int]:
+    """ The melds of get_all_meld_masks(mask) that contain the card value """
+    bit = 1 << card
+    rank = card % NUM_RANKS
+    shift = card - rank
+    melds = [run << shift for run in _SUIT_RUNS[(mask >> shift) & SUIT_BITS] if run >> rank & 1]
+    pattern = _rank_pattern(mask, rank)
+    if popcount(pattern) >= 3:
+        melds.extend(meld for meld in _SET_MASKS[rank][pattern] if meld & bit)
+    return melds
+
+
+class BitHand:
+    """ A hand of cards stored as a single 52-bit integer """
+    __slots__ = ('mask',)
+
+    def __init__(self, mask: int = 0):
+        self.mask = mask
+
+    @staticmethod
+    def from_cards(cards: Iterable[Card]) -> 'BitHand':
+        return BitHand(cards_to_mask(cards))
+
+    def to_cards(self) -> List[Card]:
+        return mask_to_cards(self.mask)
+
+    def add(self, card: Card):
+        self.mask |= 1 << card.value()
+
+    def remove(self, card: Card):
+        bit = 1 << card.value()
+        if not self.mask & bit:
+            raise Exception("Can't remove card not held in hand")
+        self.mask ^= bit
+
+    def __contains__(self, card: Card) -> bool:
+        return bool(self.mask >> card.value() & 1)
+
+    def __len__(self) -> int:
+        return popcount(self.mask)
+
+    def __eq__(self, other):
+        return isinstance(other, BitHand) and self.mask == other.mask
+
+    def __hash__(self):
+        return hash(self.mask)
+
+    def __repr__(self):
+        return str(self.to_cards())
+
+    def count_deadwood(self) -> int:
+        return mask_deadwood(self.mask)
+
+    def get_all_melds(self) -> List[List[Card]]:
+        return [mask_to_cards(meld) for meld in get_all_meld_masks(self.mask)]
+
+    def optimal_deadwood(self) -> Tuple[int, List[int]]:
+        """ Returns the optimal deadwood and the best melds as masks """
+        score, melds = best_meld_combination(self.mask, get_all_meld_masks(self.mask))
+        return mask_deadwood(self.mask) - score, melds
+
+    def calc_optimal_deadwood(self) -> Tuple[int, List[List[Card]]]:
+        """ Same result shape as knock_evaluation.calc_optimal_deadwood """
+        deadwood, melds = self.optimal_deadwood()
+        return deadwood, [mask_to_cards(meld) for meld in melds]
+
+
+# Sweep state: 2 bits per suit holding the length of the run that is still open at the
+# previous rank, capped at 3. Lengths 1 and 2 must be continued, 3 may stop.
+_RUN_DONE = 3
+_sweep_transitions = {}
+# Ranks that can start a 3 card run within their suit.
+_RUN_STARTS = sum(((1 << (NUM_RANKS - 2)) - 1) << (suit * NUM_RANKS) for suit in range(NUM_SUITS))
+
+
+def runnable_mask(mask: int) -> int:
+    """ The cards of a mask that belong to at least one 3 card run """
+    starts = mask & mask >> 1 & mask >> 2 & _RUN_STARTS
+    return starts | starts << 1 | starts << 2
+
+
+def _get_sweep_transitions(state: int, pattern: int, runnable: int, anchors: int):
+    """
+    Returns (new_state, set_pattern, run_pattern, deadwood_pattern) for every legal
+    assignment of the cards in `pattern` to a set, a run or deadwood. Only runnable
+    cards may join a run, and anchors are cards that must.
+    """
+    key = (state, pattern, runnable, anchors)
+    transitions = _sweep_transitions.get(key)
+    if transitions is not None:
+        return transitions
+    must_continue = 0
+    for suit in range(NUM_SUITS):
+        length = state >> (2 * suit) & 3
+        if length and length != _RUN_DONE:
+            must_continue |= 1 << suit
+    transitions = []
+    subset = pattern
+    while True:
+        # Subsets of the held pattern used as a set: none, 3 or 4 cards.
+        if subset == 0 or (popcount(subset) >= 3 and not subset & anchors):
+            candidates = (pattern ^ subset) & runnable
+            run = candidates
+            while True:
+                if run & must_continue == must_continue and run & anchors == anchors:
+                    new_state = 0
+                    for suit in range(NUM_SUITS):
+                        if run >> suit & 1:
+                            length = state >> (2 * suit) & 3
+                            new_state |= min(length + 1, _RUN_DONE) << (2 * suit)
+                    transitions.append((new_state, subset, run, pattern ^ subset ^ run))
+                if run == 0:
+                    break
+                run = (run - 1) & candidates
+        if subset == 0:
+            break
+        subset = (subset - 1) & pattern
+    _sweep_transitions[key] = transitions
+    return transitions
+
+
+def sweep_optimal_deadwood(mask: int, anchors: int = 0, free: int = 0, stats: dict = None) -> Tuple[int, List[int]]:
+    """
+    Returns the optimal deadwood and the best melds as masks, by dynamic programming
+    over ranks Ace to King. The only state carried between ranks is the open run
+    length per suit, so the cost is bounded by 13 ranks * 256 states no matter how
+    many overlapping melds the hand contains.
+    Anchors are cards outside the hand that must sit in runs at no cost, and free
+    cards score no deadwood; knock evaluation uses these to model layoffs. If given,
+    stats receives the number of DP states visited as search nodes.
+    """
+    cards = mask | anchors
+    runnable = runnable_mask(cards)
+    meldable = runnable
+    for rank_mask in RANK_MASKS:
+        if popcount(cards & rank_mask) >= 3:
+            meldable |= cards & rank_mask
+    # Cards outside every possible meld are deadwood whatever the sweep decides.
+    best = {0: mask_deadwood(mask & ~meldable & ~free)}
+    history = []
+    cards &= meldable
+    if not cards:
+        if stats is not None:
+            stats['nodes'] = 0
+        return best[0], []
+    for rank in range(NUM_RANKS + 1):
+        pattern = _rank_pattern(cards, rank) if rank < NUM_RANKS and cards & RANK_MASKS[rank] else 0
+        if not pattern and len(best) == 1 and 0 in best:
+            history.append(None)
+            continue
+        runnable_pattern = _rank_pattern(runnable, rank) if runnable and rank < NUM_RANKS else 0
+        anchor_pattern = _rank_pattern(anchors, rank) if anchors and rank < NUM_RANKS else 0
+        free_pattern = _rank_pattern(free, rank) if free and rank < NUM_RANKS else 0
+        points = POINT_VALUES[rank] if rank < NUM_RANKS else 0
+        step = {}
+        for state, deadwood in best.items():
+            for new_state, set_pattern, run_pattern, dead_pattern in \
+                    _get_sweep_transitions(state, pattern, runnable_pattern, anchor_pattern):
+                cost = deadwood + points * popcount(dead_pattern & ~free_pattern)
+                current = step.get(new_state)
+                if current is None or cost < current[0]:
+                    step[new_state] = (cost, state, set_pattern, run_pattern)
+        history.append(step)
+        best = {state: entry[0] for state, entry in step.items()}
+
+    if stats is not None:
+        stats['nodes'] = sum(len(step) for step in history if step)
+
+    # Walk back from the final (empty) rank to recover each rank's set and run patterns.
+    deadwood = best[0]
+    set_masks = []
+    run_ranks = [[] for _ in range(NUM_SUITS)]
+    state = 0
+    for rank in range(NUM_RANKS, -1, -1):
+        step = history[rank]
+        if step is None:
+            continue
+        _, state, set_pattern, run_pattern = step[state]
+        if set_pattern:
+            set_masks.append(_spread_rank_pattern(set_pattern, rank))
+        for suit in range(NUM_SUITS):
+            if run_pattern >> suit & 1:
+                run_ranks[suit].append(rank)
+    melds = [meld & mask for meld in set_masks]
+    for suit, ranks in enumerate(run_ranks):
+        ranks.sort()
+        run = 0
+        for i, rank in enumerate(ranks):
+            if i and rank != ranks[i - 1] + 1:
+                melds.append(run & mask)
+                run = 0
+            run |= 1 << (suit * NUM_RANKS + rank)
+        if run:
+            melds.append(run & mask)
+    return deadwood, [meld for meld in melds if meld]
+
+
+def _build_layoff_table():
+    """
+    For every possible meld mask, the cards an opponent may lay off onto it, as
+    (left steps, right steps, set card). Run steps are single card bits walking
+    outward from each end, which must be laid off in order; a 3 card set takes
+    its missing fourth card.
+    """
+    table = {}
+    for suit in range(NUM_SUITS):
+        shift = suit * NUM_RANKS
+        for start in range(NUM_RANKS):
+            for end in range(start + 2, NUM_RANKS):
+                meld = (((1 << (end - start + 1)) - 1) << start) << shift
+                left = tuple(1 << (shift + rank) for rank in range(start - 1, -1, -1))
+                right = tuple(1 << (shift + rank) for rank in range(end + 1, NUM_RANKS))
+                table[meld] = (left, right, 0)
+    for rank in range(NUM_RANKS):
+        for pattern in range(16):
+            if popcount(pattern) >= 3:
+                meld = _spread_rank_pattern(pattern, rank)
+                table[meld] = ((), (), RANK_MASKS[rank] & ~meld)
+    return table
+
+
+LAYOFF_TABLE = _build_layoff_table()
+# Cards adjacent to each meld, the only ones that can start a layoff onto it
+LAYOFF_EXTENSIONS = {meld: (left[0] if left else 0) | (right[0] if right else 0) | set_card
+                     for meld, (left, right, set_card) in LAYOFF_TABLE.items()}
+
+
+def layoff_masks(meld_masks: Iterable[int]) -> Tuple[int, int, int]:
+    """
+    Returns (anchors, free, extensions) for laying off onto a knocker's melds: the
+    cards of every run, which sweep_optimal_deadwood lets the opponent extend, the
+    missing fourth card of every 3 card set, and every card adjacent to a meld.
+    """
+    anchors = 0
+    free = 0
+    extensions = 0
+    for meld in meld_masks:
+        left, right, set_card = LAYOFF_TABLE[meld]
+        if set_card:
+            free |= set_card
+        elif left or right:
+            anchors |= meld
+        extensions |= LAYOFF_EXTENSIONS[meld]
+    return anchors, free, extensions
+
+
+def layoff_chains(meld: int, hand: int) -> List[int]:
+    """ Every group of cards from the hand that can be laid off onto one side of a meld """
+    left, right, set_card = LAYOFF_TABLE[meld]
+    chains = []
+    if set_card & hand:
+        chains.append(set_card)
+    for steps in (left, right):
+        chain = 0
+        for step in steps:
+            if not step & hand:
+                break
+            chain |= step
+            chains.append(chain)
+    return chains
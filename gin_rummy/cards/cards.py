@@ -1,3 +1,4 @@
+import os
 import random
 from enum import Enum
 
@@ -53,44 +54,77 @@ class Rank(Enum):
 
 
 class Card:
-    def __init__(self, suit: Suit, rank: Rank):
-        self.suit = suit
-        self.rank = rank
+    """
+    Cards are interned: Card(suit, rank) and Card.from_value(value) return one of 52
+    shared, immutable instances, so cards can also be compared by identity.
+    """
+    __slots__ = ('suit', 'rank', 'suit_value', 'rank_value', 'points', '_value')
+
+    def __new__(cls, suit: Suit, rank: Rank):
+        return _CARDS[suit.value * len(Rank) + rank.value]
+
+    @classmethod
+    def _create(cls, suit: Suit, rank: Rank):
+        card = object.__new__(cls)
+        set_attr = object.__setattr__
+        set_attr(card, 'suit', suit)
+        set_attr(card, 'rank', rank)
+        set_attr(card, 'suit_value', suit.value)
+        set_attr(card, 'rank_value', rank.value)
+        set_attr(card, 'points', min(rank.value + 1, 10))
+        set_attr(card, '_value', suit.value * len(Rank) + rank.value)
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):
+        return Card.from_value, (self._value,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __eq__(self, other):
-        return self.suit == other.suit and self.rank == other.rank
+        return self is other or (isinstance(other, Card) and self._value == other._value)
 
     def __lt__(self, other):
-        return self.value() < other.value()
+        return self._value < other._value
 
     def __hash__(self):
-        return hash((self.suit, self.rank))
+        return self._value
 
     def __repr__(self):
         return f'{self.rank}{self.suit}'
 
     def value(self):
-        return self.suit.value * len(Suit) + self.rank.value
+        return self._value
 
     @staticmethod
     def enumerate():
-        return [Card(suit, rank) for suit in Suit for rank in Rank]
+        return list(_CARDS)
 
     @staticmethod
     def from_value(val):
-        num_suits = len(Suit)
-        suit = Suit(val / num_suits)
-        rank = Rank(val % num_suits)
-        return Card(suit, rank)
+        return _CARDS[val]
+
+
+# Every card, indexed by Card.value()
+_CARDS = tuple(Card._create(suit, rank) for suit in Suit for rank in Rank)
 
 
 class Deck:
-    def __init__(self):
-        self.cards = [Card(suit, rank) for suit in Suit for rank in Rank]
+    """ Shuffled with its own random stream, seeded from the OS unless a seed is given """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed if seed is not None else int.from_bytes(os.urandom(8), 'little'))
+        self.cards = Card.enumerate()
         self.shuffle()
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
 
     def draw(self):
         return self.cards.pop()
@@ -0,0 +1,71 @@
+import pickle
+from collections import OrderedDict
+
+
+class DeadwoodCache:
+    """
+    Bounded least-recently-used cache for deadwood and meld results. Keys are tuples
+    built from order-independent hand bitmasks (see bit_hand.cards_to_mask), so the
+    same cards in any order share an entry.
+    """
+
+    def __init__(self, capacity: int = 100000):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """ Returns the cached value, or None on a miss """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def save(self, path):
+        """ Writes all entries, least recently used first, to a file """
+        with open(path, 'wb') as f:
+            pickle.dump(list(self.entries.items()), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):
+        """ Warm-starts the cache from a file written by save() """
+        with open(path, 'rb') as f:
+            items = pickle.load(f)
+        for key, value in items:
+            self.put(key, value)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
@@ -0,0 +1,78 @@
+"""
+Counter-based dealing. Every random number of game g under seed s is a hash of
+(s, g, counter), so each game has its own stream: any game can be dealt again from
+(s, g) alone, in any order or process, and N games are dealt in one vectorized call
+without shared RNG state.
+
+A deck is a permutation of the 52 card values, drawn from the end: positions 51 down
+to 32 deal 10 cards to each player alternately, starting with the dealer's opponent,
+position 31 is the upcard and positions 0 to 30 are the stock.
+"""
+import os
+
+import numpy as np
+
+NUM_CARDS = 52
+HAND_SIZE = 10
+STOCK_SIZE = NUM_CARDS - 2 * HAND_SIZE - 1
+UPCARD = STOCK_SIZE
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_MASK_64 = (1 << 64) - 1
+# Random words per game: one sort key per card, then the dealer
+_WORDS = NUM_CARDS + 1
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    """ SplitMix64 finalizer of x + golden ratio, elementwise on uint64 arrays (wrapping) """
+    z = x + _GOLDEN
+    z = (z ^ (z >> np.uint64(30))) * _MIX_1
+    z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    return z ^ (z >> np.uint64(31))
+
+
+def new_seed() -> int:
+    """ A fresh seed from the OS, without touching any shared RNG """
+    return int.from_bytes(os.urandom(8), 'little') >> 1
+
+
+def random_words(seed: int, games, count: int = _WORDS) -> np.ndarray:
+    """ (N, count) uint64 random words of the given game indices under seed """
+    games = np.atleast_1d(np.asarray(games, dtype=np.uint64))
+    base = _splitmix64(np.array([seed & _MASK_64], dtype=np.uint64))
+    streams = _splitmix64(base + games * _GOLDEN)
+    counters = np.arange(count, dtype=np.uint64) * _GOLDEN
+    return _splitmix64(streams[:, None] + counters)
+
+
+def deal_decks(seed: int, games):
+    """
+    Deals games from a seed: games is a number of games, numbered from 0, or an array
+    of game indices. Returns an (N, 52) uint8 array of decks and the (N,) dealers.
+    """
+    if np.isscalar(games):
+        games = np.arange(games)
+    words = random_words(seed, games)
+    decks = np.argsort(words[:, :NUM_CARDS], axis=1).astype(np.uint8)
+    dealers = (words[:, NUM_CARDS] >> np.uint64(63)).astype(np.uint8)
+    return decks, dealers
+
+
+def deal_deck(seed: int, game: int = 0):
+    """ The deck, as bytes, and dealer of one game """
+    decks, dealers = deal_decks(seed, [game])
+    return decks[0].tobytes(), int(dealers[0])
+
+
+def split_deals(decks: np.ndarray, dealers: np.ndarray):
+    """
+    Splits decks into the initial deal: (N, 2, 10) hands indexed by player, (N,)
+    upcards and (N, 31) stocks, drawn from the end.
+    """
+    first = decks[:, NUM_CARDS - 1:UPCARD:-2]  # The dealer's opponent is dealt first
+    second = decks[:, NUM_CARDS - 2:UPCARD:-2]
+    dealers = np.asarray(dealers, dtype=bool)[:, None, None]
+    hands = np.where(dealers, np.stack([first, second], axis=1), np.stack([second, first], axis=1))
+    return hands, decks[:, UPCARD], decks[:, :STOCK_SIZE]
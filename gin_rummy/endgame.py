@@ -0,0 +1,137 @@
+from gin_rummy.bit_hand import popcount
+from gin_rummy.deadwood_cache import DeadwoodCache
+from gin_rummy.gin_rummy import Action, DISCARD_OFFSET, GinRummy, HAND_SIZE, NUM_CARDS, _DISCARD, _STOCK
+
+# Kinds of transposition table entries: the exact value, or a bound from a pruned search
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class EndgameSolver:
+    """
+    Exact values of GinRummy positions once the stock is down to max_stock cards.
+    The search is expectimax. The player to move takes the best action, searched as
+    negamax with alpha-beta pruning through consecutive decisions. A stock draw
+    averages over every card left in the stock, all equally likely, since the stock
+    order is hidden. Knocks are scored by GinRummy.evaluate_knock, and values are
+    GinRummy.get_score for the player to move.
+    A line that comes back to a position already on it, or that runs for max_turns
+    turns without ending, counts as a draw, as in MCTS.
+    Values are kept in an LRU transposition table keyed by the card locations, the
+    discard pile in order and the player to move. The stock order is left out.
+    Calling the solver with a game returns its value, or None above the threshold, so
+    it can be handed to MCTS as leaf_solver.
+    """
+
+    def __init__(self, max_stock: int = 4, max_turns: int = 4, capacity: int = 1000000):
+        self.max_stock = max_stock
+        self.max_turns = max_turns
+        self.table = DeadwoodCache(capacity)
+        self.nodes = 0
+        self.solves = 0
+
+    def __call__(self, game: GinRummy):
+        if game.is_ended() or game.stock_size > self.max_stock:
+            return None
+        return self.solve(game)
+
+    def solve(self, game: GinRummy) -> float:
+        """ Value of the game for its player to move """
+        self.solves += 1
+        return self.search(game, self.max_turns, -1.0, 1.0, set())
+
+    @staticmethod
+    def get_key(game: GinRummy) -> bytes:
+        state = game.state
+        return bytes(state[:NUM_CARDS]) + bytes(state[_DISCARD:_DISCARD + game.discard_size]) + \
+            bytes((game.cur_player,))
+
+    def search(self, game: GinRummy, turns: int, alpha: float, beta: float, path: set) -> float:
+        if game.is_ended():
+            return game.get_score(game.cur_player)
+        if turns == 0:
+            return 0.0
+        key = self.get_key(game)
+        if key in path:
+            return 0.0
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= turns:
+            _, kind, value = entry
+            if kind == EXACT or (kind == LOWER and value >= beta) or (kind == UPPER and value <= alpha):
+                return value
+        self.nodes += 1
+        path.add(key)
+        original_alpha = alpha
+        best = -1.0
+        player = game.cur_player
+        for action in self.ordered_actions(game):
+            if action == Action.DRAW_STOCK:
+                value = self.expect_stock_draw(game, turns, alpha, beta, path)
+            else:
+                child = game.clone()
+                child.take_action(action)
+                if child.cur_player == player:
+                    value = self.search(child, turns, alpha, beta, path)
+                else:
+                    value = -self.search(child, turns - 1, -beta, -alpha, path)
+            if value > best:
+                best = value
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+        path.discard(key)
+        kind = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        self.table.put(key, (turns, kind, best))
+        return best
+
+    def expect_stock_draw(self, game: GinRummy, turns: int, alpha: float, beta: float, path: set) -> float:
+        """
+        Mean value over every card the player could draw from the stock. Each draw is
+        searched with the window that could still move the mean inside (alpha, beta),
+        given that unsearched draws are worth between -1 and 1 (Star1 pruning), and a
+        bound is returned as soon as the mean can't end up inside it.
+        """
+        count = game.stock_size
+        total = 0.0
+        last = _STOCK + count - 1
+        for searched, i in enumerate(range(last, _STOCK - 1, -1)):
+            child = game.clone()
+            state = child.state
+            state[i], state[last] = state[last], state[i]
+            child.take_action(Action.DRAW_STOCK)
+            low = count * alpha - total + searched - (count - 1)
+            high = count * beta - total - searched + (count - 1)
+            value = self.search(child, turns, max(low, -1.0), min(high, 1.0), path)
+            total += value
+            if value <= low:
+                return (total + count - 1 - searched) / count
+            if value >= high:
+                return (total - (count - 1 - searched)) / count
+        return total / count
+
+    @staticmethod
+    def ordered_actions(game: GinRummy):
+        """ Valid actions, likely best first: knock, then discards leaving the least deadwood, or improving draws """
+        player = game.cur_player
+        valid_actions = game.get_valid_actions(player)
+        meld_state = game.get_meld_state(player)
+        if popcount(meld_state.mask) == HAND_SIZE + 1:
+            discards = sorted(meld_state.discard_deadwoods(), key=lambda discard: discard[1])
+            actions = [DISCARD_OFFSET + card for card, _ in discards]
+            return [Action.KNOCK] + actions if valid_actions[Action.KNOCK] else actions
+        actions = [action for action in (Action.DRAW_STOCK, Action.PASS) if valid_actions[action]]
+        if valid_actions[Action.DRAW_DISCARD]:
+            if meld_state.draw_improvement(game.top_discard()) > 0:
+                actions.insert(0, Action.DRAW_DISCARD)
+            else:
+                actions.append(Action.DRAW_DISCARD)
+        return actions
+
+    def clear(self):
+        self.table.clear()
+        self.nodes = 0
+        self.solves = 0
+
+    def stats(self):
+        return dict(self.table.stats(), nodes=self.nodes, solves=self.solves)
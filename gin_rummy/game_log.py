@@ -0,0 +1,162 @@
+"""
+Append-only logs of whole games. Since a game is dealt from its seed and game index
+(see dealing), a record is just those, the dealer and one byte per action:
+
+    seed     uint64
+    game     uint32
+    dealer   uint8
+    count    uint16   number of actions
+    actions  count bytes, Action ids
+
+so a typical game takes around a hundred bytes. A log file starts with a short
+header and records follow back to back, little-endian. Logs are read as a stream,
+one record at a time, and replayed lazily into GinRummy games or batches of
+observations. A log can be split into shards (every num_shards-th record) and
+replayed by a pool of processes.
+"""
+import multiprocessing
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from gin_rummy.gin_rummy import GinRummy
+
+MAGIC = b'GRGAMES\0'
+VERSION = 1
+_HEADER = struct.Struct('<8sI')
+_RECORD = struct.Struct('<QIBH')
+
+GameRecord = namedtuple('GameRecord', ['seed', 'game', 'dealer', 'actions'])
+
+
+class GameLogWriter:
+    """ Appends game records to a log file, writing the header if the file is new """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(_HEADER.pack(MAGIC, VERSION))
+        else:
+            _check_header(path)
+        self.count = 0
+
+    def append(self, seed: int, game: int, dealer: int, actions):
+        actions = bytes(actions)
+        self.file.write(_RECORD.pack(seed, game, dealer, len(actions)) + actions)
+        self.count += 1
+
+    def append_game(self, game: GinRummy, actions):
+        """ Records a game by its deal and the actions played since """
+        self.append(game.seed, game.game, game.dealer, actions)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _check_header(path):
+    with open(path, 'rb') as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size or header[:len(MAGIC)] != MAGIC:
+        raise Exception(f"Not a game log: {path}")
+    _, version = _HEADER.unpack(header)
+    if version != VERSION:
+        raise Exception(f"Unsupported game log version {version}: {path}")
+
+
+def read_records(path, shard: int = 0, num_shards: int = 1):
+    """ Yields the GameRecords of a log one at a time, only every num_shards-th from shard """
+    _check_header(path)
+    with open(path, 'rb') as f:
+        f.seek(_HEADER.size)
+        index = 0
+        while True:
+            head = f.read(_RECORD.size)
+            if not head:
+                return
+            if len(head) < _RECORD.size:
+                raise Exception(f"Truncated game record {index} in {path}")
+            seed, game, dealer, count = _RECORD.unpack(head)
+            if index % num_shards != shard:
+                f.seek(count, os.SEEK_CUR)
+            else:
+                actions = f.read(count)
+                if len(actions) < count:
+                    raise Exception(f"Truncated game record {index} in {path}")
+                yield GameRecord(seed, game, dealer, actions)
+            index += 1
+
+
+def replay_record(record: GameRecord) -> GinRummy:
+    """ The game at the end of a record """
+    return GinRummy.replay(record.seed, record.actions, record.game, record.dealer)
+
+
+def replay_positions(record: GameRecord):
+    """
+    Yields (game, action) for every move of a record, before the action is taken.
+    The same game is played on in place, so clone it to keep a position.
+    """
+    game = GinRummy(record.dealer, record.seed, record.game)
+    for action in record.actions:
+        yield game, action
+        game.take_action(action)
+
+
+def replay_games(path, shard: int = 0, num_shards: int = 1):
+    """ Yields the final game of every record of a log (shard) """
+    for record in read_records(path, shard, num_shards):
+        yield replay_record(record)
+
+
+def replay_observations(path, encoder, batch_size: int = 1024, shard: int = 0, num_shards: int = 1):
+    """
+    Yields batches of every position of a log (shard) as (observations, players, actions)
+    arrays of up to batch_size rows, observations encoded by an ObservationEncoder for
+    the player to move. Only one batch of positions is held at a time.
+    """
+    positions, players, actions = [], [], []
+    for record in read_records(path, shard, num_shards):
+        for game, action in replay_positions(record):
+            positions.append(game.clone())
+            players.append(game.cur_player)
+            actions.append(action)
+            if len(positions) == batch_size:
+                yield encoder.encode_games(positions, players), np.array(players), np.array(actions)
+                positions, players, actions = [], [], []
+    if positions:
+        yield encoder.encode_games(positions, players), np.array(players), np.array(actions)
+
+
+def _map_shard(task):
+    function, path, shard, num_shards = task
+    return function(read_records(path, shard, num_shards))
+
+
+def map_shards(function, paths, num_shards: int = 1, num_workers: int = None):
+    """
+    Splits each log into num_shards shards and returns function(records) for every
+    shard, in order of paths then shards, computed by a pool of num_workers processes
+    (in this process with 1 worker). function must be picklable, e.g. defined at
+    module level.
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    tasks = [(function, path, shard, num_shards) for path in paths for shard in range(num_shards)]
+    num_workers = num_workers or multiprocessing.cpu_count()
+    if num_workers == 1 or len(tasks) < 2:
+        return [_map_shard(task) for task in tasks]
+    with multiprocessing.Pool(min(num_workers, len(tasks))) as pool:
+        return pool.map(_map_shard, tasks)
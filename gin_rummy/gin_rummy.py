@@ -1,9 +1,13 @@
 import random
 from enum import IntEnum
+from operator import itemgetter
 from typing import List
 
-from gin_rummy.knock_evaluation import can_knock
-from gin_rummy.cards import Deck, Card
+from gin_rummy.bit_hand import FULL_MASK, mask_to_cards, popcount
+from gin_rummy.knock_evaluation import KnockResult, MAX_KNOCK_DEADWOOD, evaluate_knock
+from gin_rummy.cards import Card
+from gin_rummy.dealing import deal_deck, new_seed
+from gin_rummy.meld_state import MeldState
 from mcts import Game
 
 
@@ -15,6 +19,10 @@ class CardState(IntEnum):
     OPP_HAND = 4
 
 
+DISCARD_OFFSET = 4  # Discard actions follow the 4 Enum states
+NUM_ACTIONS = 56  # 4 Enum states, 52 Discard states
+
+
 class Action(IntEnum):
     DRAW_STOCK = 0
     DRAW_DISCARD = 1
@@ -23,55 +31,157 @@ class Action(IntEnum):
 
     @staticmethod
     def DISCARD(card: Card):
-        return 4 + card.value()
+        return DISCARD_OFFSET + card.value()
 
     @staticmethod
     def get_discard_card(i: int) -> Card:
-        val = i - 4
+        val = i - DISCARD_OFFSET
         return Card.from_value(val)
 
     def __len__(self):
-        return 56  # 4 Enum states, 52 Discard states
+        return NUM_ACTIONS
+
+
+# Card locations, one byte per card in GinRummy.state
+LOC_STOCK = 0
+LOC_HAND = (1, 2)  # indexed by player
+LOC_DISCARD = 3
+
+NUM_CARDS = 52
+HAND_SIZE = 10
+# Layout of GinRummy.state: card locations, then the stock in draw order (drawn from
+# the end), then the discard pile in order (top last).
+_LOCATIONS = 0
+_STOCK = NUM_CARDS
+_DISCARD = 2 * NUM_CARDS
+_STATE_SIZE = 3 * NUM_CARDS
+
+# Observation value of every location, seen from each player. The opponent's hand
+# looks like the stock, except for the cards it is known to hold.
+_OBSERVATION_TABLE = (
+    (CardState.STOCK, CardState.MY_HAND, CardState.STOCK, CardState.DISCARD),
+    (CardState.STOCK, CardState.STOCK, CardState.MY_HAND, CardState.DISCARD),
+)
 
 
 class GinRummy(Game):
-    def __init__(self, dealer=None):
-        self.stock = Deck()
-        self.dealer = dealer if dealer else random.choice([0, 1])
-        self.hands = [[], []]
-        self.discard_pile = []
-        self.deal()
+    """
+    Game state is a single bytearray plus a few ints, so clone() is one buffer copy.
+    Hands are also kept as 52-bit masks (see bit_hand) for deadwood queries, along with
+    the cards of each hand the other player has seen picked up from the discard pile,
+    and a MeldState per hand that keeps its optimal deadwood up to date as cards come
+    and go.
+    The deck and dealer come from (seed, game) through dealing.deal_deck, so a game
+    is replayed exactly from its seed, game index and actions.
+    """
+    __slots__ = ('state', 'stock_size', 'discard_size', 'hand_masks', 'known_masks', 'meld_states',
+                 'meld_owned', 'dealer', 'turn', 'cur_player', 'is_first_upcard_taken', 'knocker',
+                 'knock_result', 'seed', 'game')
+
+    def __init__(self, dealer=None, seed: int = None, game: int = 0):
+        self.state = bytearray(_STATE_SIZE)
+        self.stock_size = 0
+        self.discard_size = 0
+        self.hand_masks = [0, 0]
+        self.known_masks = [0, 0]
+        self.meld_states = [MeldState(), MeldState()]
+        self.meld_owned = 3
+        self.seed = seed if seed is not None else new_seed()
+        self.game = game
+        deck, seeded_dealer = deal_deck(self.seed, game)
+        self.dealer = dealer if dealer is not None else seeded_dealer
+        self.deal(deck)
         self.turn = 1
         self.cur_player = self.get_opponent(self.dealer)
         self.is_first_upcard_taken = False
+        self.knocker = None
+        self.knock_result = None
 
     @staticmethod
     def get_opponent(player):
         return 0 if player == 1 else 1
 
-    def deal(self):
+    @staticmethod
+    def replay(seed: int, actions, game: int = 0, dealer=None) -> 'GinRummy':
+        """ Deals the game from its seed and plays the given actions """
+        replayed = GinRummy(dealer, seed, game)
+        for action in actions:
+            replayed.take_action(action)
+        return replayed
+
+    def deal(self, deck: bytes):
+        """ Deals from a deck of card values, drawing from the end """
+        state = self.state
+        state[_LOCATIONS:_LOCATIONS + NUM_CARDS] = bytes(NUM_CARDS)
+        state[_STOCK:_STOCK + NUM_CARDS] = deck
+        self.stock_size = NUM_CARDS
+        self.discard_size = 0
+        self.hand_masks = [0, 0]
+        self.known_masks = [0, 0]
+        self.meld_states = [MeldState(), MeldState()]
+        self.meld_owned = 3
         deal_order = [self.get_opponent(self.dealer), self.dealer]
-        for _ in range(10):
+        for _ in range(HAND_SIZE):
             for player in deal_order:
-                card = self.stock.draw()
-                self.hands[player].append(card)
+                self.add_to_hand(player, self.pop_stock())
 
-        card = self.stock.draw()
-        self.discard_pile.append(card)
+        card = self.pop_stock()
+        self.push_discard(card)
+
+    def pop_stock(self) -> int:
+        self.stock_size -= 1
+        return self.state[_STOCK + self.stock_size]
+
+    def push_discard(self, card: int):
+        self.state[_LOCATIONS + card] = LOC_DISCARD
+        self.state[_DISCARD + self.discard_size] = card
+        self.discard_size += 1
+
+    def add_to_hand(self, player: int, card: int):
+        self.state[_LOCATIONS + card] = LOC_HAND[player]
+        meld_state = self._changing_meld_state(player)
+        if meld_state is not None:
+            meld_state.add(card)
+        self.hand_masks[player] |= 1 << card
 
     def draw_stock(self):
-        card = self.stock.draw()
-        self.hands[self.cur_player].append(card)
+        self.add_to_hand(self.cur_player, self.pop_stock())
 
     def draw_discard(self):
-        card = self.discard_pile.pop()
-        self.hands[self.cur_player].append(card)
+        self.discard_size -= 1
+        card = self.state[_DISCARD + self.discard_size]
+        self.add_to_hand(self.cur_player, card)
+        self.known_masks[self.cur_player] |= 1 << card
+        if self.turn <= 2:
+            self.is_first_upcard_taken = True
 
     def discard(self, card: Card):
-        if card not in self.hands[self.cur_player]:
+        self.discard_value(card.value())
+
+    def discard_value(self, card: int):
+        bit = 1 << card
+        if not self.hand_masks[self.cur_player] & bit:
             raise Exception("Can't discard card not held in hand")
-        self.hands[self.cur_player].remove(card)
-        self.discard_pile.append(card)
+        meld_state = self._changing_meld_state(self.cur_player)
+        if meld_state is not None:
+            meld_state.remove(card)
+        self.hand_masks[self.cur_player] ^= bit
+        self.known_masks[self.cur_player] &= ~bit
+        self.push_discard(card)
+
+    @property
+    def hands(self) -> List[List[Card]]:
+        return [mask_to_cards(mask) for mask in self.hand_masks]
+
+    @property
+    def stock(self) -> List[Card]:
+        """ Stock cards, the next to be drawn last """
+        return [Card.from_value(v) for v in self.state[_STOCK:_STOCK + self.stock_size]]
+
+    @property
+    def discard_pile(self) -> List[Card]:
+        """ Discarded cards, the top card last """
+        return [Card.from_value(v) for v in self.state[_DISCARD:_DISCARD + self.discard_size]]
 
     def get_cur_player(self):
         return self.cur_player
@@ -80,25 +190,74 @@ class GinRummy(Game):
         self.turn += 1
         self.cur_player = self.get_opponent(self.cur_player)
 
-    def can_knock(self):
-        return can_knock(self.hands[self.cur_player])
+    def _changing_meld_state(self, player: int) -> MeldState:
+        """
+        The player's MeldState, about to follow a change of the hand: copied first if
+        still shared with a clone, or None if it no longer matches the hand.
+        """
+        meld_state = self.meld_states[player]
+        if meld_state is None or meld_state.mask != self.hand_masks[player]:
+            self.meld_states[player] = None
+            return None
+        if not self.meld_owned >> player & 1:
+            meld_state = self.meld_states[player] = meld_state.copy()
+            self.meld_owned |= 1 << player
+        return meld_state
+
+    def get_meld_state(self, player: int) -> MeldState:
+        """ The player's MeldState, rebuilt if the hand mask was changed behind its back """
+        meld_state = self.meld_states[player]
+        if meld_state is None or meld_state.mask != self.hand_masks[player]:
+            meld_state = self.meld_states[player] = MeldState(self.hand_masks[player])
+            self.meld_owned |= 1 << player
+        return meld_state
+
+    def get_deadwood(self, player: int) -> int:
+        """ Optimal deadwood of the player's hand as it is """
+        return self.get_meld_state(player).deadwood
+
+    def get_outs(self, player: int):
+        """ Card value -> deadwood improvement, for the unseen cards that would improve the player's hand """
+        return self.get_meld_state(player).outs(self.get_unseen_mask(player))
 
-    def evaluate_knock(self):
-        pass  # TODO
+    def can_knock(self):
+        return self.get_meld_state(self.cur_player).min_discard_deadwood() <= MAX_KNOCK_DEADWOOD
+
+    def evaluate_knock(self) -> KnockResult:
+        """
+        Ends the hand with the current player knocking. The knocker discards the card
+        leaving the least deadwood, unless all 11 cards meld (big gin).
+        """
+        player = self.cur_player
+        card, deadwood = min(self.get_meld_state(player).discard_deadwoods(), key=itemgetter(1))
+        if deadwood > MAX_KNOCK_DEADWOOD:
+            raise Exception("Can't knock with more than 10 deadwood")
+        if deadwood or not self.is_big_gin(player):
+            self.discard_value(card)
+        self.knocker = player
+        self.knock_result = evaluate_knock(mask_to_cards(self.hand_masks[player]),
+                                           mask_to_cards(self.hand_masks[self.get_opponent(player)]))
+        return self.knock_result
+
+    def is_big_gin(self, player) -> bool:
+        return self.get_deadwood(player) == 0
 
     def get_action_size(self):
-        return len(Action)
+        return NUM_ACTIONS
 
     def get_valid_actions(self, player):
         valid_actions = [0] * self.get_action_size()
-        if player != self.cur_player:
+        if player != self.cur_player or self.is_ended():
             return valid_actions
 
-        if len(self.hands[player]) == 11:
-            for card in self.hands[player]:
-                valid_actions[Action.DISCARD(card)] = 1
-            # TODO can knock?
-            valid_actions[Action.KNOCK] = 1
+        hand = self.hand_masks[player]
+        if popcount(hand) == HAND_SIZE + 1:
+            while hand:
+                low = hand & -hand
+                valid_actions[DISCARD_OFFSET + low.bit_length() - 1] = 1
+                hand ^= low
+            if self.can_knock():
+                valid_actions[Action.KNOCK] = 1
             return valid_actions
 
         if (self.turn == 1 or self.turn == 2) and not self.is_first_upcard_taken:
@@ -124,39 +283,127 @@ class GinRummy(Game):
         elif action == Action.KNOCK:
             self.evaluate_knock()
         else:
-            card = Action.get_discard_card(action)
-            self.discard(card)
+            self.discard_value(action - DISCARD_OFFSET)
             self.next_turn()
 
+    def is_chance_action(self, action: int) -> bool:
+        # The card drawn from the stock is hidden until it is drawn
+        return action == Action.DRAW_STOCK
+
     def get_observation_size(self):
-        return 52
+        return NUM_CARDS
 
     def get_observation(self, player: int) -> List[int]:
-        observation = [CardState.STOCK]*52
-        for card in self.discard_pile[:-1]:
-            observation[card.value()] = CardState.DISCARD
-        for card in self.discard_pile[-1:]:
-            observation[card.value()] = CardState.TOP_DISCARD
-        for card in self.hands[player]:
-            observation[card.value()] = CardState.MY_HAND
-        for card in self.hands[self.get_opponent(player)]:
-            observation[card.value()] = CardState.OPP_HAND
+        table = _OBSERVATION_TABLE[player]
+        observation = [table[loc] for loc in self.state[_LOCATIONS:_LOCATIONS + NUM_CARDS]]
+        known = self.known_masks[self.get_opponent(player)]
+        while known:
+            low = known & -known
+            observation[low.bit_length() - 1] = CardState.OPP_HAND
+            known ^= low
+        if self.discard_size:
+            observation[self.state[_DISCARD + self.discard_size - 1]] = CardState.TOP_DISCARD
         return observation
 
-    def get_observation_str(self, observation: List[int]) -> str:
-        return str(observation)
+    def get_unseen_mask(self, player: int) -> int:
+        """ Cards the player can't locate: the stock and the opponent's cards not known to it """
+        opponent = self.get_opponent(player)
+        return (FULL_MASK ^ self.hand_masks[player] ^ self.hand_masks[opponent] ^
+                self.discard_mask()) | (self.hand_masks[opponent] & ~self.known_masks[opponent])
+
+    def top_discard(self) -> int:
+        """ Value of the card on top of the discard pile, None if it is empty """
+        return self.state[_DISCARD + self.discard_size - 1] if self.discard_size else None
+
+    def discard_mask(self) -> int:
+        mask = 0
+        for card in self.state[_DISCARD:_DISCARD + self.discard_size]:
+            mask |= 1 << card
+        return mask
+
+    def determinize(self, player: int, rng: random.Random) -> 'GinRummy':
+        """
+        Returns a clone where the cards unseen by the player are dealt again at random:
+        the opponent keeps its known cards and as many unseen ones as it held, and the
+        rest become the stock in a random order, drawn from rng. There is no default, so
+        determinized search never depends on the shared random module.
+        """
+        game = self.clone()
+        opponent = self.get_opponent(player)
+        unseen = [card for card in range(NUM_CARDS) if self.get_unseen_mask(player) >> card & 1]
+        rng.shuffle(unseen)
+        hidden = popcount(self.hand_masks[opponent] & ~self.known_masks[opponent])
+        state = game.state
+        hand = game.known_masks[opponent]
+        for card in unseen[:hidden]:
+            state[_LOCATIONS + card] = LOC_HAND[opponent]
+            hand |= 1 << card
+        game.hand_masks[opponent] = hand
+        for card in unseen[hidden:]:
+            state[_LOCATIONS + card] = LOC_STOCK
+        state[_STOCK:_STOCK + game.stock_size] = bytes(unseen[hidden:])
+        return game
+
+    def get_observation_str(self, observation: List[int]) -> bytes:
+        # Every CardState fits in a byte
+        return bytes(observation)
+
+    def get_state_key(self) -> bytes:
+        # Turns past 3 all follow the same rules, so they share keys.
+        state = self.state
+        return bytes((self.stock_size, self.discard_size, self.dealer, min(self.turn, 4), self.cur_player,
+                      self.is_first_upcard_taken, self.knock_result is not None)) + \
+            self.known_masks[0].to_bytes(7, 'little') + self.known_masks[1].to_bytes(7, 'little') + \
+            state[_LOCATIONS:_LOCATIONS + NUM_CARDS] + state[_STOCK:_STOCK + self.stock_size] + \
+            state[_DISCARD:_DISCARD + self.discard_size]
 
     def is_ended(self):
-        pass  # TODO
+        return self.knock_result is not None or self.is_draw()
 
     def is_draw(self):
-        pass  # TODO
+        # The hand is dead once only two stock cards remain and nobody knocked
+        return self.knock_result is None and self.stock_size <= 2 and \
+            popcount(self.hand_masks[self.cur_player]) == HAND_SIZE
+
+    def get_winner(self):
+        """ The player scoring the knocked hand, or None """
+        if self.knock_result is None:
+            return None
+        return self.knocker if self.knock_result.points > 0 else self.get_opponent(self.knocker)
+
+    def get_points(self, player) -> int:
+        """ Points won (positive) or lost (negative) by a player on the hand """
+        if self.knock_result is None:
+            return 0
+        points = self.knock_result.points
+        return points if player == self.knocker else -points
 
     def get_score(self, player):
-        pass  # TODO
+        """ 1 for the player scoring the hand, -1 for the other and 0 for a draw """
+        winner = self.get_winner()
+        if winner is None:
+            return 0
+        return 1 if player == winner else -1
 
     def clone(self):
-        pass  # TODO
+        game = GinRummy.__new__(GinRummy)
+        game.state = self.state[:]
+        game.stock_size = self.stock_size
+        game.discard_size = self.discard_size
+        game.hand_masks = self.hand_masks[:]
+        game.known_masks = self.known_masks[:]
+        # Meld states are shared until either game changes a hand
+        game.meld_states = self.meld_states[:]
+        game.meld_owned = self.meld_owned = 0
+        game.dealer = self.dealer
+        game.turn = self.turn
+        game.cur_player = self.cur_player
+        game.is_first_upcard_taken = self.is_first_upcard_taken
+        game.knocker = self.knocker
+        game.knock_result = self.knock_result
+        game.seed = self.seed
+        game.game = self.game
+        return game
 
 
 
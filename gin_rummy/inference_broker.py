@@ -0,0 +1,216 @@
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from mcts import Agent
+
+# Counters at the start of the stats block, followed by the batch size and queue depth histograms
+_BATCHES = 0
+_REQUESTS = 1
+_ROWS = 2
+_COUNTERS = 3
+
+
+def _layout(num_clients, max_client_batch, observation_size, action_size, max_batch_size):
+    return [
+        ('stats', np.int64, (_COUNTERS + max_batch_size + 1 + num_clients + 1,)),
+        ('counts', np.int32, (num_clients,)),
+        ('observations', np.float32, (num_clients, max_client_batch, observation_size)),
+        ('policies', np.float32, (num_clients, max_client_batch, action_size)),
+        ('values', np.float32, (num_clients, max_client_batch)),
+    ]
+
+
+class _Shared:
+    """ Arrays of a broker's shared memory block, created by the broker and attached by clients """
+
+    def __init__(self, spec, create=False):
+        layout = _layout(spec['num_clients'], spec['max_client_batch'], spec['observation_size'],
+                         spec['action_size'], spec['max_batch_size'])
+        if create:
+            size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, dtype, shape in layout)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=spec['name'])
+        offset = 0
+        for name, dtype, shape in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            setattr(self, name, array)
+            offset += array.nbytes
+        if create:
+            self.stats[:] = 0
+
+    def close(self):
+        for name in ('stats', 'counts', 'observations', 'policies', 'values'):
+            setattr(self, name, None)
+        self.shm.close()
+
+
+def _serve(spec, agent_factory, stop_event):
+    """ Broker process: collects requests into batches and answers them """
+    shared = _Shared(spec)
+    agent = agent_factory()
+    requests = spec['requests']
+    replies = spec['replies']
+    max_batch_size = spec['max_batch_size']
+    max_wait = spec['max_wait']
+    stats = shared.stats
+    batch_histogram = stats[_COUNTERS:_COUNTERS + max_batch_size + 1]
+    depth_histogram = stats[_COUNTERS + max_batch_size + 1:]
+    deferred = None
+    try:
+        while not stop_event.is_set():
+            if deferred is not None:
+                batch, deferred = [deferred], None
+            else:
+                try:
+                    batch = [requests.get(timeout=0.1)]
+                except queue.Empty:
+                    continue
+            rows = int(shared.counts[batch[0]])
+            deadline = time.monotonic() + max_wait
+            while rows < max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    client = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+                except queue.Empty:
+                    break
+                count = int(shared.counts[client])
+                if rows + count > max_batch_size:
+                    deferred = client
+                    break
+                batch.append(client)
+                rows += count
+
+            depth = len(batch) + (deferred is not None) + requests.qsize()
+            observations = np.concatenate([shared.observations[client, :shared.counts[client]] for client in batch])
+            policies, values = agent.predict_batch(observations)
+            # Counted before replying, so a client sees its own request in metrics
+            stats[_BATCHES] += 1
+            stats[_REQUESTS] += len(batch)
+            stats[_ROWS] += rows
+            batch_histogram[min(rows, max_batch_size)] += 1
+            depth_histogram[min(depth, len(depth_histogram) - 1)] += 1
+            start = 0
+            for client in batch:
+                count = int(shared.counts[client])
+                shared.policies[client, :count] = policies[start:start + count]
+                shared.values[client, :count] = values[start:start + count]
+                start += count
+                replies[client].release()
+    finally:
+        shared.close()
+
+
+class InferenceBroker:
+    """
+    Owns one model in a separate process and serves every self-play worker with it.
+    Clients (BrokerAgent) write observations into their own slot of a shared memory
+    block and send their id over a queue. The broker gathers requests into one
+    predict_batch call until max_batch_size rows are waiting or max_wait seconds have
+    passed since the first, then writes each client's policies and values back into
+    its slot and wakes it up. A client sends at most max_client_batch rows at a time,
+    by default max_batch_size.
+    Create it in the parent, start() it, and hand get_client_spec(i) to worker i.
+    """
+
+    def __init__(self, agent_factory, num_clients: int, observation_size: int, action_size: int,
+                 max_batch_size: int = 64, max_wait: float = 0.002, max_client_batch: int = None):
+        max_client_batch = max_client_batch or max_batch_size
+        if max_client_batch > max_batch_size:
+            raise Exception("max_client_batch can't be larger than max_batch_size")
+        self.agent_factory = agent_factory
+        self.spec = {
+            'num_clients': num_clients,
+            'observation_size': observation_size,
+            'action_size': action_size,
+            'max_batch_size': max_batch_size,
+            'max_wait': max_wait,
+            'max_client_batch': max_client_batch,
+            'requests': multiprocessing.Queue(),
+            'replies': [multiprocessing.Semaphore(0) for _ in range(num_clients)],
+        }
+        self.shared = _Shared(self.spec, create=True)
+        self.spec['name'] = self.shared.shm.name
+        self.stop_event = multiprocessing.Event()
+        self.process = None
+
+    def start(self):
+        self.process = multiprocessing.Process(target=_serve, daemon=True,
+                                               args=(self.spec, self.agent_factory, self.stop_event))
+        self.process.start()
+
+    def get_client_spec(self, client_id: int):
+        """ Everything BrokerAgent needs to connect as the given client """
+        return dict(self.spec, client_id=client_id)
+
+    def get_client(self, client_id: int) -> 'BrokerAgent':
+        return BrokerAgent(self.get_client_spec(client_id))
+
+    def stop(self):
+        self.stop_event.set()
+        if self.process is not None:
+            self.process.join()
+            self.process = None
+
+    def close(self):
+        self.stop()
+        self.shared.close()
+        self.shared.shm.unlink()
+
+    def metrics(self):
+        """ Batch, request and row counts, the mean batch size and the batch size and queue depth histograms """
+        stats = self.shared.stats.copy()
+        max_batch_size = self.spec['max_batch_size']
+        batches = int(stats[_BATCHES])
+        return {
+            'batches': batches,
+            'requests': int(stats[_REQUESTS]),
+            'rows': int(stats[_ROWS]),
+            'mean_batch_size': stats[_ROWS] / batches if batches else 0.0,
+            'batch_size_histogram': stats[_COUNTERS:_COUNTERS + max_batch_size + 1],
+            'queue_depth_histogram': stats[_COUNTERS + max_batch_size + 1:],
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class BrokerAgent(Agent):
+    """ Agent answered by an InferenceBroker, usable wherever a local Agent is """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.client_id = spec['client_id']
+        self.shared = _Shared(spec)
+        self.requests = spec['requests']
+        self.reply = spec['replies'][self.client_id]
+
+    def predict(self, game, game_player):
+        policies, values = self.predict_batch([game.get_observation(game_player)])
+        return policies[0], float(values[0])
+
+    def predict_batch(self, observations, games=None):
+        observations = np.asarray(observations, dtype=np.float32)
+        count = len(observations)
+        limit = self.spec['max_client_batch']
+        if count > limit:
+            # Larger requests go through in pieces
+            parts = [self.predict_batch(observations[i:i + limit]) for i in range(0, count, limit)]
+            return np.concatenate([p for p, _ in parts]), np.concatenate([v for _, v in parts])
+        slot = self.client_id
+        self.shared.observations[slot, :count] = observations
+        self.shared.counts[slot] = count
+        self.requests.put(slot)
+        self.reply.acquire()
+        return self.shared.policies[slot, :count].copy(), self.shared.values[slot, :count].copy()
+
+    def close(self):
+        self.shared.close()
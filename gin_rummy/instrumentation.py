@@ -0,0 +1,98 @@
+"""
+Optional counters for the deadwood hot paths: calls, cumulative time, candidate melds
+and search nodes per function. Off unless enable() is called or the
+GIN_RUMMY_INSTRUMENT environment variable is set to a value other than 0. When off,
+an instrumented call costs one flag check.
+"""
+import functools
+import os
+import time
+
+enabled = os.environ.get('GIN_RUMMY_INSTRUMENT', '0') not in ('', '0')
+
+
+class FunctionStats:
+    __slots__ = ('calls', 'seconds', 'melds', 'nodes')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.melds = 0
+        self.nodes = 0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'seconds': self.seconds, 'melds': self.melds, 'nodes': self.nodes}
+
+
+_stats = {}
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    _stats.clear()
+
+
+def get_function_stats(name: str) -> FunctionStats:
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = FunctionStats()
+    return stats
+
+
+def count(name: str, melds: int = 0, nodes: int = 0):
+    """ Adds meld and search node counts to a function; callers check `enabled` first """
+    stats = get_function_stats(name)
+    stats.melds += melds
+    stats.nodes += nodes
+
+
+def get_stats():
+    return {name: stats.as_dict() for name, stats in _stats.items()}
+
+
+def report() -> str:
+    lines = [f"{'function':32} {'calls':>10} {'seconds':>10} {'us/call':>10} {'melds':>10} {'nodes':>10}"]
+    for name, stats in sorted(_stats.items()):
+        per_call = stats.seconds / stats.calls * 1e6 if stats.calls else 0.0
+        lines.append(f"{name:32} {stats.calls:10} {stats.seconds:10.4f} {per_call:10.2f} "
+                     f"{stats.melds:10} {stats.nodes:10}")
+    return '\n'.join(lines)
+
+
+def instrumented(function):
+    """ Counts calls and cumulative time of a function while instrumentation is enabled """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return function(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats = get_function_stats(name)
+            stats.calls += 1
+            stats.seconds += time.perf_counter() - start
+
+    return wrapper
+
+
+class Lazy:
+    """ Defers building a log message argument until a handler formats it """
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        self.function = function
+
+    def __str__(self):
+        return str(self.function())
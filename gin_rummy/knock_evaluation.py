@@ -1,16 +1,45 @@
+from collections import namedtuple
 from operator import attrgetter
 from typing import List
+from gin_rummy import instrumentation
+from gin_rummy.bit_hand import MeldSearch, best_meld_combination, cards_to_mask, discard_deadwoods, \
+    get_all_meld_masks, layoff_chains, layoff_masks, mask_deadwood, mask_to_cards, sweep_optimal_deadwood
 from gin_rummy.cards import Card
+from gin_rummy.deadwood_cache import DeadwoodCache
+from gin_rummy.instrumentation import Lazy, instrumented
 import logging
 
 logger = logging.getLogger('knock_evaluation')
 
+# Shared by every evaluation in the process. Replace it to change the capacity, or
+# use DeadwoodCache(capacity=0) to turn caching off.
+cache = DeadwoodCache()
+
+# 'tree' is the original recursive meld tree, 'bitmask' the memoized search over
+# BitHand masks, and 'sweep' the rank-by-rank dynamic program. On random hands the
+# bitmask search is about 4x faster than the tree and 1.5x faster than the sweep,
+# with or without layoffs, so it is the default. The sweep costs at most 13 ranks x
+# 256 states whatever the hand, and only wins on hands dense with overlapping melds.
+SOLVERS = ('tree', 'bitmask', 'sweep')
+DEFAULT_SOLVER = 'bitmask'
+
+MAX_KNOCK_DEADWOOD = 10
+GIN_BONUS = 25
+BIG_GIN_BONUS = 31
+UNDERCUT_BONUS = 25
+
+# Ways a hand can end on a knock
+KNOCK = 'knock'
+GIN = 'gin'
+BIG_GIN = 'big gin'
+UNDERCUT = 'undercut'
+
+# points > 0 are scored by the knocker, points < 0 by the opponent (an undercut)
+KnockResult = namedtuple('KnockResult', ['kind', 'knocker_deadwood', 'opponent_deadwood', 'points'])
+
 
 def point_value(card: Card) -> int:
-    v = card.rank.value + 1
-    if v > 10:
-        return 10
-    return v
+    return card.points
 
 
 def count_deadwood(cards: List[Card]) -> int:
@@ -20,10 +49,10 @@ def count_deadwood(cards: List[Card]) -> int:
 def is_run_meld(cards: List[Card]):
     if len(cards) < 3:
         return False
-    suit = cards[0].suit
-    rank = cards[0].rank
+    suit = cards[0].suit_value
+    rank = cards[0].rank_value
     for i, card in enumerate(cards[1:]):
-        if card.suit != suit or card.rank.value != rank.value + i + 1:
+        if card.suit_value != suit or card.rank_value != rank + i + 1:
             return False
     return True
 
@@ -31,25 +60,28 @@ def is_run_meld(cards: List[Card]):
 def is_set_meld(cards: List[Card]):
     if len(cards) < 3:
         return False
-    rank = cards[0].rank
+    rank = cards[0].rank_value
     for card in cards:
-        if card.rank != rank:
+        if card.rank_value != rank:
             return False
     return True
 
 
 def sort_by_value(cards: List[Card]):
     """ Returns cards sorted first by number value, then by suit """
-    return sorted(cards, key=attrgetter('rank.value', 'suit.value'))
+    return sorted(cards, key=attrgetter('rank_value', 'suit_value'))
 
 
 def sort_by_suit(cards: List[Card]):
     """ Returns cards sorted first by suit, then by number value """
-    return sorted(cards, key=attrgetter('suit.value', 'rank.value'))
+    return sorted(cards, key=attrgetter('suit_value', 'rank_value'))
 
 
 class MeldNode:
+    created = 0  # Total nodes built, read by instrumentation
+
     def __init__(self, meld, parent=None):
+        MeldNode.created += 1
         self.parent = parent
         self.meld = meld
         self.deadwood = count_deadwood(meld)
@@ -148,98 +180,227 @@ def get_all_melds(cards: List[Card]) -> List[List[Card]]:
     return all_melds
 
 
-def calc_optimal_deadwood(cards: List[Card]):
-    logger.info('calc_optimal_deadwood: ' + str(cards))
-    all_melds = get_all_melds(cards)
+def log_melds(melds):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('All melds:')
+        for meld in melds:
+            logger.info(meld)
+
+
+@instrumented
+def solve_optimal_deadwood(cards: List[Card], solver: str = DEFAULT_SOLVER):
+    """ Uncached solve, returns the optimal deadwood and the best melds as masks """
+    if solver == 'tree':
+        all_melds = get_all_melds(cards)
+
+        # Find the optimal set of melds.
+        all_melds.sort(key=count_deadwood)
+        log_melds(all_melds)
+        created = MeldNode.created
+        best_score, best_melds = get_best_combination(all_melds)
+        if instrumentation.enabled:
+            instrumentation.count('solve_optimal_deadwood', len(all_melds), MeldNode.created - created)
+        return count_deadwood(cards) - best_score, [cards_to_mask(meld) for meld in best_melds]
+    elif solver == 'bitmask':
+        mask = cards_to_mask(cards)
+        all_melds = get_all_meld_masks(mask)
+        search = MeldSearch(all_melds)
+        best_score, best_melds = search.best(mask)
+        if instrumentation.enabled:
+            instrumentation.count('solve_optimal_deadwood', len(all_melds), len(search.memo) - 1)
+        return mask_deadwood(mask) - best_score, best_melds
+    elif solver == 'sweep':
+        if instrumentation.enabled:
+            stats = {}
+            result = sweep_optimal_deadwood(cards_to_mask(cards), stats=stats)
+            instrumentation.count('solve_optimal_deadwood', len(result[1]), stats['nodes'])
+            return result
+        return sweep_optimal_deadwood(cards_to_mask(cards))
+    raise Exception(f"Unknown solver: {solver}")
+
+
+@instrumented
+def calc_optimal_deadwood(cards: List[Card], solver: str = DEFAULT_SOLVER):
+    logger.info('calc_optimal_deadwood: %s', cards)
+    key = ('deadwood', solver, cards_to_mask(cards))
+    cached = cache.get(key)
+    if cached is None:
+        deadwood, meld_masks = solve_optimal_deadwood(cards, solver)
+        cache.put(key, (deadwood, tuple(meld_masks)))
+    else:
+        deadwood, meld_masks = cached
+    best_melds = [mask_to_cards(meld) for meld in meld_masks]
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('Optimal melds: %s', Lazy(lambda: ' '.join([str(m) for m in best_melds])))
+        logger.info('Deadwood: %s (%d)', Lazy(lambda: format_deadwood_cards(cards, best_melds)), deadwood)
+    return deadwood, best_melds
 
-    # Find the optimal set of melds.
-    all_melds.sort(key=count_deadwood)
-    logger.info('All melds:')
-    for meld in all_melds:
-        logger.info(meld)
-    best_score, best_melds = get_best_combination(all_melds)
-    deadwood = count_deadwood(cards) - best_score
-    logger.info(f"Optimal melds: {' '.join([str(m) for m in best_melds])}")
+
+def format_deadwood_cards(cards: List[Card], melds: List[List[Card]]) -> str:
     deadwood_cards = cards[:]
-    for meld in best_melds:
+    for meld in melds:
         for card in meld:
             deadwood_cards.remove(card)
-    logger.info(f"Deadwood: {', '.join([str(c) for c in sort_by_value(deadwood_cards)])} ({deadwood})")
-    return deadwood, best_melds
-
-
-def can_knock(cards: List[Card]):
+    return ', '.join([str(c) for c in sort_by_value(deadwood_cards)])
+
+
+@instrumented
+def calc_discard_deadwood_mask(mask: int):
+    """ Cached bit_hand.discard_deadwoods, as (card value, deadwood) pairs """
+    key = ('discard', mask)
+    cached = cache.get(key)
+    if cached is None:
+        if instrumentation.enabled:
+            stats = {}
+            cached = tuple(discard_deadwoods(mask, stats))
+            instrumentation.count('calc_discard_deadwood_mask', stats['melds'], stats['nodes'])
+        else:
+            cached = tuple(discard_deadwoods(mask))
+        cache.put(key, cached)
+    return cached
+
+
+def calc_discard_deadwood(cards: List[Card]):
+    """
+    Returns the optimal deadwood after discarding each card of an 11 card hand, in
+    hand order, and the minimum of those. All 11 sub-hands share one meld enumeration
+    and one memoized search.
+    """
     if len(cards) != 11:
         raise Exception("Should only be called with exactly 11 cards")
 
-    deadwood, _ = calc_optimal_deadwood(cards)
-    if deadwood <= 20:
-        for i in range(len(cards)):
-            hand = cards[:i] + cards[i+1:]
-            logger.info("i: " + str(hand))
-            deadwood, _ = calc_optimal_deadwood(hand)
-            if deadwood <= 10:
-                return True
-    return False
+    by_value = dict(calc_discard_deadwood_mask(cards_to_mask(cards)))
+    deadwoods = [by_value[card.value()] for card in cards]
+    logger.info('Deadwood after discard: %s', deadwoods)
+    return deadwoods, min(deadwoods)
 
 
-def get_layable_melds(existing_melds: List[List[Card]], cards: List[Card]) -> List[List[Card]]:
-    layable_melds = []
+@instrumented
+def can_knock(cards: List[Card]):
+    _, deadwood = calc_discard_deadwood(cards)
+    return deadwood <= MAX_KNOCK_DEADWOOD
 
-    # First, check 3 card sets of the same-numbered card
-    existing_sets = [meld for meld in existing_melds if is_set_meld(meld) and len(meld) == 3]
-    for set_meld in existing_sets:
-        rank = set_meld[0].rank
-        for card in cards:
-            if card.rank.value == rank.value:
-                layable_melds.append([card])
 
-    # Next, check for runs in the same suit
-    cards = sort_by_value(cards)
-    existing_runs = [meld for meld in existing_melds if is_run_meld(meld)]
-    for run_meld in existing_runs:
-        suit = run_meld[0].suit
-        start_rank = run_meld[0].rank
-        end_rank = run_meld[-1].rank
-
-        for i in range(len(cards)):
-            if cards[i].suit.value == suit.value:
-                if cards[i].rank.value == start_rank.value - 2 and i+1<len(cards) and \
-                        cards[i+1].rank.value == start_rank.value - 1:
-                    layable_melds.append([cards[i], cards[i+1]])
-                if cards[i].rank.value == start_rank.value - 1:
-                    layable_melds.append([cards[i]])
-                if cards[i].rank.value == end_rank.value + 1:
-                    layable_melds.append([cards[i]])
-                if cards[i].rank.value == end_rank.value + 1 and i+1<len(cards) \
-                        and cards[i+1].rank.value == start_rank.value + 2:
-                    layable_melds.append([cards[i], cards[i+1]])
-
-    # 3 or more card lays on opp's runs are equivalent to own 3 card run
+def get_layable_melds(existing_melds: List[List[Card]], cards: List[Card]) -> List[List[Card]]:
+    """
+    Returns every group of cards that can be laid off onto one of the existing melds:
+    the missing card of a 3 card set, or a chain of cards extending either end of a run.
+    """
+    hand = cards_to_mask(cards)
+    layable_melds = []
+    for meld in existing_melds:
+        for chain in layoff_chains(cards_to_mask(meld), hand):
+            layable_melds.append(mask_to_cards(chain))
     return layable_melds
 
 
-def evaluate_knock(player_hand, opponent_hand):
-    player_deadwood, player_melds = calc_optimal_deadwood(player_hand)
+def get_layoff_masks(existing_melds: List[List[Card]]):
+    """
+    Returns (anchors, free) describing layoffs onto the knocker's melds for
+    sweep_optimal_deadwood: the cards of every run, which the opponent may extend,
+    and the missing fourth card of every 3 card set.
+    """
+    anchors, free, _ = layoff_masks(cards_to_mask(meld) for meld in existing_melds)
+    return anchors, free
+
+
+@instrumented
+def solve_opponent_deadwood(player_melds: List[List[Card]], opponent_hand: List[Card], solver: str = DEFAULT_SOLVER):
+    """ Uncached solve of the opponent's deadwood after layoffs, returns the deadwood and melds as masks """
+    if solver == 'sweep':
+        anchors, free = get_layoff_masks(player_melds)
+        opponent_mask = cards_to_mask(opponent_hand)
+        stats = {} if instrumentation.enabled else None
+        opponent_deadwood, meld_masks = sweep_optimal_deadwood(opponent_mask, anchors, free, stats)
+        if stats is not None:
+            instrumentation.count('solve_opponent_deadwood', len(meld_masks), stats['nodes'])
+        laid_off = opponent_mask & free
+        for meld in meld_masks:
+            laid_off &= ~meld
+        while laid_off:
+            low = laid_off & -laid_off
+            meld_masks.append(low)
+            laid_off ^= low
+        return opponent_deadwood, tuple(meld_masks)
+
+    if solver == 'bitmask':
+        opponent_mask = cards_to_mask(opponent_hand)
+        all_melds = get_all_meld_masks(opponent_mask)
+        for meld in player_melds:
+            all_melds.extend(layoff_chains(cards_to_mask(meld), opponent_mask))
+        if instrumentation.enabled:
+            instrumentation.count('solve_opponent_deadwood', len(all_melds))
+        opponent_score, meld_masks = best_meld_combination(opponent_mask, all_melds)
+        return mask_deadwood(opponent_mask) - opponent_score, tuple(meld_masks)
 
-    # Calculate best melds for opponent, allowing lays extending player's melds
-    cards_to_consider = opponent_hand[:]
-    for meld in player_melds:
-        cards_to_consider.extend(meld)
     all_melds = get_layable_melds(player_melds, opponent_hand) + get_all_melds(opponent_hand)
 
     # Find the optimal set of melds.
     all_melds.sort(key=count_deadwood)
-    logger.info('All melds:')
-    for meld in all_melds:
-        logger.info(meld)
-    opponent_score, opponent_melds = get_best_combination(all_melds)
-    opponent_deadwood = count_deadwood(opponent_hand) - opponent_score
-    logger.info(f"Opponent melds: {' '.join([str(m) for m in opponent_melds])}")
-    opponent_deadwood_cards = opponent_hand[:]
-    for meld in opponent_melds:
-        for card in meld:
-            opponent_deadwood_cards.remove(card)
-    opponent_deadwood_cards_str = ', '.join([str(c) for c in sort_by_value(opponent_deadwood_cards)])
-    logger.info(f"Opponent Deadwood: {opponent_deadwood_cards_str} ({opponent_deadwood})")
-
+    log_melds(all_melds)
+    if instrumentation.enabled:
+        instrumentation.count('solve_opponent_deadwood', len(all_melds))
+    if solver == 'tree':
+        opponent_score, opponent_melds = get_best_combination(all_melds)
+        meld_masks = [cards_to_mask(meld) for meld in opponent_melds]
+    else:
+        raise Exception(f"Unknown solver: {solver}")
+    return count_deadwood(opponent_hand) - opponent_score, tuple(meld_masks)
+
+
+def calc_opponent_deadwood(player_melds: List[List[Card]], opponent_hand: List[Card], solver: str = DEFAULT_SOLVER):
+    """
+    Cached opponent deadwood after laying off onto the knocker's melds, returns the
+    deadwood and melds as masks. When no opponent card touches a knocker meld, nothing
+    can be laid off and this is the opponent's own optimal deadwood.
+    """
+    opponent_mask = cards_to_mask(opponent_hand)
+    meld_masks = [cards_to_mask(meld) for meld in player_melds]
+    _, _, extensions = layoff_masks(meld_masks)
+    if not extensions & opponent_mask:
+        key = ('deadwood', solver, opponent_mask)
+        cached = cache.get(key)
+        if cached is None:
+            deadwood, opponent_melds = solve_optimal_deadwood(opponent_hand, solver)
+            cached = (deadwood, tuple(opponent_melds))
+            cache.put(key, cached)
+        return cached
+
+    # Layoffs depend on how the cards split into melds, not only on their union
+    key = ('knock', solver, tuple(sorted(meld_masks)), opponent_mask)
+    cached = cache.get(key)
+    if cached is None:
+        cached = solve_opponent_deadwood(player_melds, opponent_hand, solver)
+        cache.put(key, cached)
+    return cached
+
+
+@instrumented
+def evaluate_knock(player_hand: List[Card], opponent_hand: List[Card], solver: str = DEFAULT_SOLVER) -> KnockResult:
+    """
+    Scores a hand ended by the player holding player_hand: 10 cards after the knock
+    discard, or 11 cards for big gin. Layoffs are only allowed against a knock.
+    """
+    player_deadwood, player_melds = calc_optimal_deadwood(player_hand, solver)
+    if player_deadwood == 0:
+        # No layoffs against gin
+        opponent_deadwood, meld_masks = calc_opponent_deadwood([], opponent_hand, solver)
+        if len(player_hand) == 11:
+            kind, points = BIG_GIN, opponent_deadwood + BIG_GIN_BONUS
+        else:
+            kind, points = GIN, opponent_deadwood + GIN_BONUS
+    else:
+        # Calculate best melds for opponent, allowing lays extending player's melds
+        opponent_deadwood, meld_masks = calc_opponent_deadwood(player_melds, opponent_hand, solver)
+        if opponent_deadwood <= player_deadwood:
+            kind, points = UNDERCUT, opponent_deadwood - player_deadwood - UNDERCUT_BONUS
+        else:
+            kind, points = KNOCK, opponent_deadwood - player_deadwood
+
+    if logger.isEnabledFor(logging.INFO):
+        opponent_melds = [mask_to_cards(meld) for meld in meld_masks]
+        logger.info('Opponent melds: %s', Lazy(lambda: ' '.join([str(m) for m in opponent_melds])))
+        logger.info('Opponent Deadwood: %s (%d)',
+                    Lazy(lambda: format_deadwood_cards(opponent_hand, opponent_melds)), opponent_deadwood)
+        logger.info('%s: %d points', kind, points)
+    return KnockResult(kind, player_deadwood, opponent_deadwood, points)
@@ -0,0 +1,196 @@
+from bisect import insort
+from operator import itemgetter
+from typing import Dict, List, Tuple
+
+from gin_rummy.bit_hand import CARD_POINTS, MeldSearch, mask_deadwood, melds_with
+
+
+class MeldState:
+    """
+    Optimal deadwood of a hand kept up to date one card at a time. Candidate melds are
+    indexed by card, and cards linked through overlapping melds form groups, each
+    solved on its own by a MeldSearch. Adding a card only re-solves the groups its
+    new melds touch, and removing one only re-queries its own group, whose search
+    (and memo) stays valid for any subset of its cards. deadwood is a plain
+    attribute; discard_deadwoods and the draw improvements of outs are solved on
+    first use after each change.
+    """
+    __slots__ = ('mask', 'melds', 'groups', 'deadwood', '_discards', '_outs')
+
+    def __init__(self, mask: int = 0):
+        self.mask = 0
+        self.melds = {}  # card bit -> melds containing it
+        self.groups = []  # (cards, search, melded points) per group of overlapping melds
+        self.deadwood = 0
+        self._discards = None
+        self._outs = {}
+        while mask:
+            low = mask & -mask
+            self.add(low.bit_length() - 1)
+            mask ^= low
+
+    def copy(self) -> 'MeldState':
+        # Groups are immutable tuples and searches only ever grow their memo, so both are shared
+        state = MeldState.__new__(MeldState)
+        state.mask = self.mask
+        state.melds = self.melds.copy()
+        state.groups = self.groups[:]
+        state.deadwood = self.deadwood
+        state._discards = self._discards
+        state._outs = self._outs
+        return state
+
+    def _update(self):
+        self.deadwood = mask_deadwood(self.mask) - sum(score for _, _, score in self.groups)
+        self._discards = None
+        self._outs = {}
+
+    def add(self, card: int):
+        bit = 1 << card
+        if self.mask & bit:
+            raise Exception("Can't add card already in hand")
+        out = self._outs.get(card)
+        if out is not None and out[1] is not None:
+            # Solved by draw_improvement already; copied, as _outs may be shared with other copies
+            drawn = out[1].copy()
+            self.mask = drawn.mask
+            self.melds = drawn.melds
+            self.groups = drawn.groups
+            self.deadwood = drawn.deadwood
+            self._discards = drawn._discards
+            self._outs = {}
+            return
+        self.mask |= bit
+        new_melds = melds_with(self.mask, card)
+        if not new_melds:
+            # No group changes: every other discard leaves the new card as extra deadwood
+            points = CARD_POINTS[card]
+            if self._discards is not None:
+                discards = [(other, deadwood + points) for other, deadwood in self._discards]
+                insort(discards, (card, self.deadwood))
+                self._discards = discards
+            self.deadwood += points
+            self._outs = {}
+            return
+        cards = 0
+        for meld in new_melds:
+            cards |= meld
+            rest = meld
+            while rest:
+                low = rest & -rest
+                self.melds[low] = self.melds.get(low, ()) + (meld,)
+                rest ^= low
+        kept = []
+        for group in self.groups:
+            if group[0] & cards:
+                cards |= group[0]
+            else:
+                kept.append(group)
+        melds = set()
+        rest = cards
+        while rest:
+            low = rest & -rest
+            melds.update(self.melds[low])
+            rest ^= low
+        search = MeldSearch(list(melds))
+        kept.append((cards, search, search.best(cards)[0]))
+        self.groups = kept
+        self._update()
+
+    def remove(self, card: int):
+        bit = 1 << card
+        if not self.mask & bit:
+            raise Exception("Can't remove card not held in hand")
+        self.mask ^= bit
+        if bit not in self.melds:
+            points = CARD_POINTS[card]
+            if self._discards is not None:
+                self._discards = [(other, deadwood - points) for other, deadwood in self._discards if other != card]
+            self.deadwood -= points
+            self._outs = {}
+            return
+        unmelded = bit  # Cards left without any meld drop out of their group
+        for meld in self.melds.pop(bit, ()):
+            rest = meld ^ bit
+            while rest:
+                low = rest & -rest
+                remaining = tuple(m for m in self.melds[low] if m != meld)
+                if remaining:
+                    self.melds[low] = remaining
+                else:
+                    del self.melds[low]
+                    unmelded |= low
+                rest ^= low
+        for i, (cards, search, _) in enumerate(self.groups):
+            if cards & bit:
+                cards &= ~unmelded
+                if cards:
+                    self.groups[i] = (cards, search, search.best(cards)[0])
+                else:
+                    del self.groups[i]
+                break
+        self._update()
+
+    def best_melds(self) -> List[int]:
+        melds = []
+        for cards, search, _ in self.groups:
+            melds.extend(search.best(cards)[1])
+        return melds
+
+    def discard_deadwoods(self) -> List[Tuple[int, int]]:
+        """ Same as discard_deadwoods(mask), only re-solving the group of each discarded card """
+        if self._discards is not None:
+            return self._discards
+        losses = {}
+        for cards, search, _ in self.groups:
+            losses.update(search.discard_losses(cards))
+        deadwood = self.deadwood
+        results = []
+        rest = self.mask
+        while rest:
+            low = rest & -rest
+            rest ^= low
+            card = low.bit_length() - 1
+            results.append((card, deadwood - CARD_POINTS[card] + losses.get(low, 0)))
+        self._discards = results
+        return results
+
+    def min_discard_deadwood(self) -> int:
+        return min(self.discard_deadwoods(), key=itemgetter(1))[1]
+
+    def draw_improvement(self, card: int) -> int:
+        """
+        How much drawing the card, then discarding the best card, lowers the deadwood.
+        A card that completes no meld leaves every group as it is, so its answer only
+        takes the discard deadwoods of the current hand; the rest are solved on a copy,
+        which add() takes over if that card is drawn.
+        """
+        out = self._outs.get(card)
+        if out is not None:
+            return out[0]
+        bit = 1 << card
+        if self.mask & bit:
+            raise Exception("Can't draw card already in hand")
+        state = None
+        if melds_with(self.mask | bit, card):
+            state = self.copy()
+            state.add(card)
+            improvement = max(0, self.deadwood - state.min_discard_deadwood())
+        elif self.mask:
+            improvement = max(0, self.deadwood - CARD_POINTS[card] - self.min_discard_deadwood())
+        else:
+            improvement = 0
+        self._outs[card] = (improvement, state)
+        return improvement
+
+    def outs(self, cards: int) -> Dict[int, int]:
+        """ Card value -> draw improvement, for the cards of a mask that lower the deadwood """
+        outs = {}
+        while cards:
+            low = cards & -cards
+            cards ^= low
+            card = low.bit_length() - 1
+            improvement = self.draw_improvement(card)
+            if improvement:
+                outs[card] = improvement
+        return outs
@@ -0,0 +1,120 @@
+"""
+Bitplane observations written straight into NumPy buffers. An observation is a stack
+of 52-card planes seen from one player, flattened to planes * 52 values:
+
+    hand         cards in the player's hand
+    known        opponent cards the player knows about (picked up from the discard pile)
+    discard      the discard pile, 1 for the top card and less for older ones if recency
+                 is on, so the order of discards is kept
+    top_discard  the card the player may pick up
+    unseen       everything else: the stock and the rest of the opponent's hand
+
+Whole batches of games are encoded with array operations, from a list of GinRummy
+games or from a BatchedGinRummy, into a caller supplied (N, size) buffer.
+"""
+import numpy as np
+
+from gin_rummy.dealing import random_words
+from gin_rummy.gin_rummy import GinRummy, LOC_DISCARD, NUM_CARDS, _DISCARD, _LOCATIONS, _STATE_SIZE
+
+HAND = 'hand'
+KNOWN = 'known'
+DISCARD = 'discard'
+TOP_DISCARD = 'top_discard'
+UNSEEN = 'unseen'
+PLANES = (HAND, KNOWN, DISCARD, TOP_DISCARD, UNSEEN)
+
+_CARD_BITS = np.arange(NUM_CARDS, dtype=np.uint64)
+_HASH_SEED = 0x6F627365  # Fixed, so hashes are stable across processes and runs
+_multipliers = {}
+
+
+class ObservationEncoder:
+    """
+    Encodes games as planes * 52 values of the given dtype, in the order of planes.
+    Buffers passed as out are overwritten; without one a new array is returned.
+    """
+
+    def __init__(self, planes=PLANES, recency: bool = True, dtype=np.float32):
+        for plane in planes:
+            if plane not in PLANES:
+                raise Exception(f"Unknown observation plane {plane}")
+        if recency and not np.issubdtype(dtype, np.floating):
+            raise Exception("Discard recency needs a floating point dtype")
+        self.planes = tuple(planes)
+        self.recency = recency
+        self.dtype = np.dtype(dtype)
+        self.size = len(self.planes) * NUM_CARDS
+
+    def get_observation_size(self):
+        return self.size
+
+    def allocate(self, num_games: int) -> np.ndarray:
+        return np.zeros((num_games, self.size), dtype=self.dtype)
+
+    def encode(self, game: GinRummy, player: int, out: np.ndarray = None) -> np.ndarray:
+        """ The (size,) observation of one game """
+        if out is None:
+            out = np.zeros(self.size, dtype=self.dtype)
+        self.encode_games([game], [player], out.reshape(1, self.size))
+        return out
+
+    def encode_games(self, games, players=None, out: np.ndarray = None) -> np.ndarray:
+        """ The (N, size) observations of a list of GinRummy games, by default for their current players """
+        if players is None:
+            players = [game.cur_player for game in games]
+        states = np.frombuffer(b''.join(game.state for game in games), dtype=np.uint8).reshape(-1, _STATE_SIZE)
+        known = np.array([game.known_masks[0] | game.known_masks[1] for game in games], dtype=np.uint64)
+        return self._encode(states[:, _LOCATIONS:_LOCATIONS + NUM_CARDS], states[:, _DISCARD:_DISCARD + NUM_CARDS],
+                            np.array([game.discard_size for game in games]),
+                            (known[:, None] >> _CARD_BITS & np.uint64(1)).astype(bool), players, out)
+
+    def encode_batched(self, batch, players=None, out: np.ndarray = None) -> np.ndarray:
+        """ The (N, size) observations of a BatchedGinRummy, by default for the current players """
+        if players is None:
+            players = batch.cur_player
+        return self._encode(batch.locations, batch.discard_pile, batch.discard_size, batch.known, players, out)
+
+    def _encode(self, locations, discard_pile, discard_size, known, players, out):
+        num_games = len(locations)
+        if out is None:
+            out = self.allocate(num_games)
+        elif out.shape != (num_games, self.size) or not out.flags.c_contiguous:
+            raise Exception(f"Observation buffer must be a contiguous {(num_games, self.size)} array")
+        planes = out.reshape(num_games, len(self.planes), NUM_CARDS)
+        players = np.asarray(players, dtype=np.int8)[:, None]
+        hand = locations == players + 1
+        known = known & (locations == 2 - players)
+        discarded = locations == LOC_DISCARD
+        for i, plane in enumerate(self.planes):
+            if plane == HAND:
+                planes[:, i] = hand
+            elif plane == KNOWN:
+                planes[:, i] = known
+            elif plane == UNSEEN:
+                planes[:, i] = ~(hand | known | discarded)
+            elif plane == DISCARD and not self.recency:
+                planes[:, i] = discarded
+            else:
+                planes[:, i] = 0
+                games = np.flatnonzero(discard_size > 0)
+                if plane == TOP_DISCARD:
+                    planes[games, i, discard_pile[games, discard_size[games] - 1]] = 1
+                else:
+                    games, positions = np.nonzero(np.arange(NUM_CARDS) < discard_size[:, None])
+                    planes[games, i, discard_pile[games, positions]] = (positions + 1) / discard_size[games]
+        return out
+
+
+def observation_key(observation: np.ndarray) -> bytes:
+    """ Exact, hashable key of one observation """
+    return observation.tobytes()
+
+
+def hash_observations(observations: np.ndarray) -> np.ndarray:
+    """ (N,) uint64 hashes of the rows of an (N, size) array, stable across runs """
+    rows = np.ascontiguousarray(observations).reshape(len(observations), -1).view(np.uint8)
+    width = rows.shape[1]
+    if width not in _multipliers:
+        _multipliers[width] = random_words(_HASH_SEED, [width], count=width)[0] | np.uint64(1)
+    return rows.astype(np.uint64) @ _multipliers[width]
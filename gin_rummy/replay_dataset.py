@@ -0,0 +1,165 @@
+import os
+
+import numpy as np
+
+from gin_rummy.gin_rummy import NUM_ACTIONS, NUM_CARDS
+
+MAGIC = b'GRREPLAY'
+VERSION = 1
+HEADER_SIZE = 64
+SHARD_PATTERN = 'shard-{:05d}.bin'
+
+
+def record_dtype(observation_size: int = NUM_CARDS, action_size: int = NUM_ACTIONS) -> np.dtype:
+    """ Fixed-width record: uint8 observation, action mask packed into bits, action id and reward """
+    return np.dtype([
+        ('observation', np.uint8, (observation_size,)),
+        ('mask', np.uint8, ((action_size + 7) // 8,)),
+        ('action', np.uint8),
+        ('reward', '<f4'),
+    ])
+
+
+def _header(observation_size: int, action_size: int) -> bytes:
+    fields = np.array([VERSION, observation_size, action_size, record_dtype(observation_size, action_size).itemsize],
+                      dtype='<u4')
+    return (MAGIC + fields.tobytes()).ljust(HEADER_SIZE, b'\0')
+
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+        raise Exception(f"Not a replay shard: {path}")
+    version, observation_size, action_size, record_size = np.frombuffer(header, dtype='<u4', count=4,
+                                                                        offset=len(MAGIC))
+    if version != VERSION:
+        raise Exception(f"Unsupported replay shard version {version}: {path}")
+    return int(observation_size), int(action_size)
+
+
+def pack_masks(masks) -> np.ndarray:
+    return np.packbits(np.asarray(masks, dtype=np.uint8), axis=-1)
+
+
+def unpack_masks(packed, action_size: int = NUM_ACTIONS) -> np.ndarray:
+    return np.unpackbits(packed, axis=-1, count=action_size)
+
+
+class ReplayWriter:
+    """
+    Appends records to numbered shard files in a directory, starting a new shard every
+    shard_size records. Existing shards are kept, and writing resumes after the last one.
+    """
+
+    def __init__(self, directory, shard_size: int = 1 << 20,
+                 observation_size: int = NUM_CARDS, action_size: int = NUM_ACTIONS):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.observation_size = observation_size
+        self.action_size = action_size
+        self.dtype = record_dtype(observation_size, action_size)
+        os.makedirs(directory, exist_ok=True)
+        self.shard_index = len(_shard_paths(directory))
+        self.file = None
+        self.shard_records = 0
+
+    def _open_shard(self):
+        path = os.path.join(self.directory, SHARD_PATTERN.format(self.shard_index))
+        self.file = open(path, 'wb')
+        self.file.write(_header(self.observation_size, self.action_size))
+        self.shard_records = 0
+        self.shard_index += 1
+
+    def append(self, observations, masks, actions, rewards):
+        """ Appends a batch of records; masks are unpacked 0/1 vectors of length action_size """
+        records = np.zeros(len(actions), dtype=self.dtype)
+        records['observation'] = observations
+        records['mask'] = pack_masks(masks)
+        records['action'] = actions
+        records['reward'] = rewards
+        start = 0
+        while start < len(records):
+            if self.file is None or self.shard_records == self.shard_size:
+                if self.file is not None:
+                    self.file.close()
+                self._open_shard()
+            count = min(self.shard_size - self.shard_records, len(records) - start)
+            self.file.write(records[start:start + count].tobytes())
+            self.shard_records += count
+            start += count
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _shard_paths(directory):
+    names = sorted(name for name in os.listdir(directory) if name.startswith('shard-') and name.endswith('.bin'))
+    return [os.path.join(directory, name) for name in names]
+
+
+class ReplayDataset:
+    """
+    Read-only view of every shard in a directory through memory maps. Indexing returns
+    zero-copy views of the shard files and sampling only touches the sampled pages, so
+    memory use does not grow with the dataset. A partially written trailing record is
+    ignored.
+    """
+
+    def __init__(self, directory):
+        self.shards = []
+        for path in _shard_paths(directory):
+            observation_size, action_size = _read_header(path)
+            dtype = record_dtype(observation_size, action_size)
+            count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+            if count:
+                self.shards.append(np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,)))
+        self.action_size = action_size if self.shards else NUM_ACTIONS
+        self.dtype = self.shards[0].dtype if self.shards else record_dtype()
+        self.offsets = np.cumsum([0] + [len(shard) for shard in self.shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def get_shard(self, i: int) -> np.ndarray:
+        return self.shards[i]
+
+    def __getitem__(self, i: int):
+        """ Zero-copy view of record i """
+        if i < 0:
+            i += len(self)
+        shard = int(np.searchsorted(self.offsets, i, side='right')) - 1
+        return self.shards[shard][i - self.offsets[shard]]
+
+    def gather(self, indices):
+        """ Copies the records at the given global indices into one structured array """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(self)):
+            raise Exception(f"Replay record index out of range for a dataset of {len(self)} records")
+        shards = np.searchsorted(self.offsets, indices, side='right') - 1
+        records = np.empty(len(indices), dtype=self.dtype)
+        for shard in np.unique(shards):
+            selected = shards == shard
+            records[selected] = self.shards[shard][indices[selected] - self.offsets[shard]]
+        return records
+
+    def sample(self, batch_size: int, rng: np.random.Generator = None):
+        """ Uniform random minibatch: observations, unpacked masks, actions and rewards """
+        if not len(self):
+            raise Exception("Can't sample from an empty replay dataset")
+        rng = rng if rng is not None else np.random.default_rng()
+        records = self.gather(rng.integers(0, len(self), batch_size))
+        return (records['observation'], unpack_masks(records['mask'], self.action_size),
+                records['action'], records['reward'])
@@ -0,0 +1,68 @@
+import random
+from operator import itemgetter
+
+import numpy as np
+
+from gin_rummy.bit_hand import popcount
+from gin_rummy.gin_rummy import Action, DISCARD_OFFSET, GinRummy, HAND_SIZE, NUM_ACTIONS
+from gin_rummy.knock_evaluation import MAX_KNOCK_DEADWOOD
+from mcts import Agent
+
+
+class GreedyAgent(Agent):
+    """
+    Cheap default policy for rollouts, reading each hand's MeldState instead of solving
+    it: takes the upcard when its draw improvement is positive, otherwise draws from the
+    stock (or passes), knocks as soon as it can and otherwise discards the card leaving
+    the least deadwood. With probability epsilon a move is uniformly random instead.
+    predict plays num_rollouts games out from the position, on determinized copies if
+    determinize is set, and returns the greedy policy with their mean score.
+    """
+
+    def __init__(self, num_rollouts: int = 1, epsilon: float = 0.0, determinize: bool = False,
+                 max_steps: int = 200, seed: int = None):
+        self.num_rollouts = num_rollouts
+        self.epsilon = epsilon
+        self.determinize = determinize
+        self.max_steps = max_steps
+        self.rng = random.Random(seed)
+
+    def greedy_action(self, game: GinRummy) -> int:
+        player = game.cur_player
+        meld_state = game.get_meld_state(player)
+        if popcount(meld_state.mask) == HAND_SIZE + 1:
+            card, deadwood = min(meld_state.discard_deadwoods(), key=itemgetter(1))
+            return Action.KNOCK if deadwood <= MAX_KNOCK_DEADWOOD else DISCARD_OFFSET + card
+        valid_actions = game.get_valid_actions(player)
+        if valid_actions[Action.DRAW_DISCARD] and meld_state.draw_improvement(game.top_discard()) > 0:
+            return Action.DRAW_DISCARD
+        return Action.DRAW_STOCK if valid_actions[Action.DRAW_STOCK] else Action.PASS
+
+    def choose_action(self, game: GinRummy) -> int:
+        if self.epsilon and self.rng.random() < self.epsilon:
+            valid_actions = game.get_valid_actions(game.cur_player)
+            return self.rng.choice([action for action, valid in enumerate(valid_actions) if valid])
+        return self.greedy_action(game)
+
+    def rollout(self, game: GinRummy) -> int:
+        """ Plays the game out in place, returns the number of moves made """
+        steps = 0
+        while steps < self.max_steps and not game.is_ended():
+            game.take_action(self.choose_action(game))
+            steps += 1
+        return steps
+
+    def predict(self, game, game_player):
+        policy = np.zeros(NUM_ACTIONS)
+        if game.is_ended():
+            return policy, game.get_score(game_player)
+        policy[self.greedy_action(game)] = 1.0
+        if self.epsilon:
+            valid_actions = np.asarray(game.get_valid_actions(game.cur_player), dtype=float)
+            policy = (1 - self.epsilon) * policy + self.epsilon * valid_actions / valid_actions.sum()
+        value = 0.0
+        for _ in range(self.num_rollouts):
+            world = game.determinize(game_player, self.rng) if self.determinize else game.clone()
+            self.rollout(world)
+            value += world.get_score(game_player)
+        return policy, value / self.num_rollouts
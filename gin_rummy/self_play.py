@@ -0,0 +1,149 @@
+import functools
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+from gin_rummy.gin_rummy import GinRummy, NUM_ACTIONS, NUM_CARDS
+from gin_rummy.inference_broker import BrokerAgent, InferenceBroker
+from gin_rummy.trajectory_buffer import TrajectoryBuffer
+from mcts import Agent, MCTS
+
+
+class UniformAgent(Agent):
+    """ Uniform policy and zero value, for self-play without a trained model """
+
+    def predict(self, game, game_player):
+        return np.ones(game.get_action_size()), 0.0
+
+    def predict_batch(self, observations, games=None):
+        return np.ones((len(observations), NUM_ACTIONS)), np.zeros(len(observations))
+
+
+def play_game(rng: np.random.Generator, agent: Agent = None, num_simulations: int = 0, max_steps: int = 1000):
+    """
+    Plays one GinRummy game. Moves come from MCTS visit counts, or are uniformly random
+    over valid actions when num_simulations is 0. Each move searches a fresh tree over
+    a determinization of the game for the player to move, so the search only knows
+    what the recorded observation shows.
+    Returns observations, action masks, policies and outcomes (the final score for the
+    player to move at each step), one row per step.
+    """
+    game = GinRummy(seed=int(rng.integers(1 << 63)))
+    determinize_rng = random.Random(int(rng.integers(1 << 63)))
+    observations, masks, policies, players = [], [], [], []
+    while not game.is_ended() and len(players) < max_steps:
+        player = game.get_cur_player()
+        mask = np.asarray(game.get_valid_actions(player), dtype=np.uint8)
+        if num_simulations:
+            world = game.determinize(player, determinize_rng)
+            policy = MCTS(agent, num_simulations=num_simulations).get_action_prob(world)
+        else:
+            policy = mask / mask.sum()
+        observations.append(game.get_observation(player))
+        masks.append(mask)
+        policies.append(policy)
+        players.append(player)
+        game.take_action(int(rng.choice(NUM_ACTIONS, p=policy)))
+    if game.is_ended():
+        scores = [game.get_score(player) for player in range(2)]
+    else:
+        scores = [0, 0]
+    outcomes = np.array([scores[player] for player in players], dtype=np.float32)
+    return np.array(observations, dtype=np.uint8), np.array(masks), np.array(policies, dtype=np.float32), outcomes
+
+
+def _worker(spec, worker_id, seed, agent_factory, num_simulations, stop_event):
+    buffer = TrajectoryBuffer.attach(spec)
+    rng = np.random.default_rng(seed + worker_id)
+    agent = agent_factory()
+    try:
+        while not stop_event.is_set():
+            observations, masks, policies, outcomes = play_game(rng, agent, num_simulations)
+            if not len(outcomes):
+                continue
+            if not buffer.write(observations, masks, policies, outcomes, stop_event, games=1):
+                break
+    finally:
+        buffer.close()
+
+
+class SelfPlayRunner:
+    """
+    Runs GinRummy self-play in worker processes. Workers write their records straight
+    into a shared TrajectoryBuffer, and block while it is full.
+    With use_broker, a single InferenceBroker process builds the agent and every
+    worker's MCTS is answered by it in dynamic batches, instead of each worker
+    building its own.
+    """
+
+    def __init__(self, num_workers: int = None, buffer_capacity: int = 100000, num_simulations: int = 0,
+                 agent_factory=UniformAgent, seed: int = 0, use_broker: bool = False,
+                 max_batch_size: int = 64, max_wait: float = 0.002):
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.num_simulations = num_simulations
+        self.agent_factory = agent_factory
+        self.seed = seed
+        self.buffer = TrajectoryBuffer(buffer_capacity, NUM_CARDS, NUM_ACTIONS)
+        self.broker = None
+        if use_broker:
+            self.broker = InferenceBroker(agent_factory, self.num_workers, NUM_CARDS, NUM_ACTIONS,
+                                          max_batch_size=max_batch_size, max_wait=max_wait)
+        self.stop_event = multiprocessing.Event()
+        self.workers = []
+        self.start_time = None
+
+    def start(self):
+        self.start_time = time.monotonic()
+        spec = self.buffer.get_spec()
+        if self.broker is not None:
+            self.broker.start()
+        for worker_id in range(self.num_workers):
+            agent_factory = self.agent_factory
+            if self.broker is not None:
+                agent_factory = functools.partial(BrokerAgent, self.broker.get_client_spec(worker_id))
+            worker = multiprocessing.Process(
+                target=_worker, daemon=True,
+                args=(spec, worker_id, self.seed, agent_factory, self.num_simulations, self.stop_event))
+            worker.start()
+            self.workers.append(worker)
+
+    def read(self, max_records: int):
+        return self.buffer.read(max_records)
+
+    def stop(self):
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        if self.broker is not None:
+            self.broker.stop()
+
+    def close(self):
+        self.stop()
+        self.buffer.close()
+        if self.broker is not None:
+            self.broker.close()
+
+    def metrics(self):
+        """ Games/sec and steps/sec since start(), and the buffer occupancy """
+        counters = self.buffer.get_counters()
+        elapsed = time.monotonic() - self.start_time if self.start_time else 0
+        metrics = {
+            'games': counters['games'],
+            'steps': counters['steps'],
+            'games_per_second': counters['games'] / elapsed if elapsed else 0.0,
+            'steps_per_second': counters['steps'] / elapsed if elapsed else 0.0,
+            'buffer_occupancy': self.buffer.occupancy(),
+        }
+        if self.broker is not None:
+            metrics['broker'] = self.broker.metrics()
+        return metrics
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
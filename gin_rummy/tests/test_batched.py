@@ -0,0 +1,92 @@
+from gin_rummy.batched import BatchedGinRummy
+import numpy as np
+import random
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestBatchedGinRummy(unittest.TestCase):
+    def setUp(self) -> None:
+        self.batch = BatchedGinRummy(8, seed=0)
+        self.rng = random.Random(0)
+
+    def test_deal(self):
+        for player in range(2):
+            self.assertTrue(np.all((self.batch.locations == player + 1).sum(axis=1) == 10))
+        self.assertTrue(np.all(self.batch.stock_size == 31))
+        self.assertTrue(np.all(self.batch.cur_player != self.batch.dealer))
+
+    def test_matches_gin_rummy(self):
+        batch = self.batch
+        games = [batch.get_game(i) for i in range(batch.num_games)]
+        for _ in range(40):
+            valid_actions = batch.get_valid_actions()
+            observations = batch.get_observation()
+            actions = []
+            for i, game in enumerate(games):
+                player = game.get_cur_player()
+                self.assertEqual(list(valid_actions[i]), game.get_valid_actions(player))
+                self.assertEqual(list(observations[i]), game.get_observation(player))
+                choices = [a for a, valid in enumerate(valid_actions[i]) if valid and a != 3]
+                actions.append(self.rng.choice(choices))
+            batch.take_action(actions)
+            for game, action in zip(games, actions):
+                game.take_action(action)
+
+    def test_knock_matches_gin_rummy(self):
+        batch = self.batch
+        games = [batch.get_game(i) for i in range(batch.num_games)]
+        for _ in range(200):
+            valid_actions = batch.get_valid_actions()
+            actions = []
+            for i, game in enumerate(games):
+                self.assertEqual(bool(batch.is_ended()[i]), game.is_ended())
+                if game.is_ended():
+                    actions.append(-1)  # Matches no action
+                    continue
+                choices = [a for a, valid in enumerate(valid_actions[i]) if valid]
+                actions.append(3 if 3 in choices else self.rng.choice(choices))
+            if all(action == -1 for action in actions):
+                break
+            batch.take_action(actions)
+            for game, action in zip(games, actions):
+                if action != -1:
+                    game.take_action(action)
+        scores = batch.get_score()
+        for i, game in enumerate(games):
+            self.assertEqual(list(scores[i]), [game.get_score(0), game.get_score(1)])
+            self.assertEqual(batch.get_game(i).get_observation(0), game.get_observation(0))
+
+    def test_drawn_games_have_no_valid_actions(self):
+        batch = self.batch
+        games = [batch.get_game(i) for i in range(batch.num_games)]
+        while not all(game.is_ended() for game in games):
+            valid_actions = batch.get_valid_actions()
+            actions = []
+            for i, game in enumerate(games):
+                if game.is_ended():
+                    self.assertFalse(valid_actions[i].any())
+                    actions.append(-1)
+                    continue
+                actions.append(self.rng.choice([a for a, valid in enumerate(valid_actions[i]) if valid and a != 3]))
+            batch.take_action(actions)
+            for game, action in zip(games, actions):
+                if action >= 0:
+                    game.take_action(action)
+        self.assertTrue(batch.is_draw().all())
+        self.assertFalse(batch.get_valid_actions().any())
+        for game in games:
+            self.assertTrue(game.is_draw())
+            self.assertFalse(any(game.get_valid_actions(game.get_cur_player())))
+
+    def test_reset_subset(self):
+        batch = self.batch
+        batch.take_action(np.full(batch.num_games, 2))
+        batch.reset([0, 1])
+        self.assertEqual(list(batch.turn), [1, 1] + [2] * (batch.num_games - 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+from gin_rummy.bit_hand import *
+from gin_rummy.cards import Card, Suit, Rank
+from gin_rummy.knock_evaluation import calc_optimal_deadwood, count_deadwood, get_all_melds
+import random
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestBitHand(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hand = [
+            Card(Suit.CLUBS, Rank.ACE),
+            Card(Suit.DIAMONDS, Rank.ACE),
+            Card(Suit.SPADES, Rank.ACE),
+            Card(Suit.CLUBS, Rank.FOUR),
+            Card(Suit.CLUBS, Rank.FIVE),
+            Card(Suit.CLUBS, Rank.SIX),
+            Card(Suit.CLUBS, Rank.SEVEN),
+            Card(Suit.DIAMONDS, Rank.QUEEN),
+            Card(Suit.HEARTS, Rank.TEN),
+            Card(Suit.HEARTS, Rank.FOUR),
+        ]
+
+    def test_round_trip(self):
+        hand = BitHand.from_cards(self.hand)
+        self.assertEqual(len(hand), 10)
+        self.assertEqual(sorted(hand.to_cards()), sorted(self.hand))
+        self.assertTrue(Card(Suit.HEARTS, Rank.TEN) in hand)
+        self.assertFalse(Card(Suit.HEARTS, Rank.KING) in hand)
+
+    def test_count_deadwood(self):
+        self.assertEqual(BitHand.from_cards(self.hand).count_deadwood(), count_deadwood(self.hand))
+
+    def test_is_meld(self):
+        run = cards_to_mask([Card(Suit.CLUBS, r) for r in (Rank.FOUR, Rank.FIVE, Rank.SIX)])
+        gap = cards_to_mask([Card(Suit.CLUBS, r) for r in (Rank.FOUR, Rank.FIVE, Rank.SEVEN)])
+        aces = cards_to_mask([Card(s, Rank.ACE) for s in (Suit.CLUBS, Suit.DIAMONDS, Suit.SPADES)])
+        self.assertTrue(is_run_mask(run))
+        self.assertFalse(is_run_mask(gap))
+        self.assertFalse(is_run_mask(aces))
+        self.assertTrue(is_set_mask(aces))
+        self.assertFalse(is_set_mask(run))
+
+    def test_calc_optimal_deadwood(self):
+        deadwood, melds = BitHand.from_cards(self.hand).calc_optimal_deadwood()
+        self.assertEqual(deadwood, 24)
+        self.assertEqual(len(melds), 2)
+
+
+class TestBitHandMatchesList(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = random.Random(0)
+        self.deck = Card.enumerate()
+
+    def check(self, cards):
+        expected, _ = calc_optimal_deadwood(cards)
+        hand = BitHand.from_cards(cards)
+        deadwood, melds = hand.calc_optimal_deadwood()
+        self.assertEqual(deadwood, expected)
+        melded = [card for meld in melds for card in meld]
+        self.assertEqual(len(melded), len(set(melded)))
+        self.assertEqual(count_deadwood(cards) - count_deadwood(melded), deadwood)
+        self.assertEqual(len(hand.get_all_melds()), len(get_all_melds(cards)))
+
+    def test_random_hands(self):
+        for _ in range(200):
+            self.check(self.rng.sample(self.deck, self.rng.choice([10, 11])))
+
+    def test_meld_heavy_hands(self):
+        low_cards = [card for card in self.deck if card.rank.value < 4]
+        for _ in range(20):
+            self.check(self.rng.sample(low_cards, 11))
+
+
+if __name__ == '__main__':
+    unittest.main()
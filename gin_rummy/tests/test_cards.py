@@ -1,4 +1,6 @@
-from gin_rummy.cards import Card, Suit, Rank
+from gin_rummy.cards import Card, Deck, Suit, Rank
+import copy
+import pickle
 import unittest
 import logging
 
@@ -64,6 +66,40 @@ class TestCard(unittest.TestCase):
         card2 = Card.from_value(card1_value)
         self.assertTrue(card1.value() == card2.value())
 
+    def test_interned(self):
+        card1 = Card(Suit.HEARTS, Rank.KING)
+        self.assertIs(card1, Card(Suit.HEARTS, Rank.KING))
+        self.assertIs(card1, Card.from_value(card1.value()))
+        self.assertIs(card1, pickle.loads(pickle.dumps(card1)))
+        self.assertIs(card1, copy.deepcopy(card1))
+
+    def test_from_value(self):
+        for value, card in enumerate(Card.enumerate()):
+            self.assertEqual(card.value(), value)
+            self.assertEqual(Card.from_value(value), card)
+        self.assertEqual(Card.from_value(51), Card(Suit.HEARTS, Rank.KING))
+
+    def test_precomputed(self):
+        card = Card(Suit.CLUBS, Rank.QUEEN)
+        self.assertEqual(card.points, 10)
+        self.assertEqual(card.rank_value, Rank.QUEEN.value)
+        self.assertEqual(card.suit_value, Suit.CLUBS.value)
+        self.assertEqual(Card(Suit.CLUBS, Rank.SEVEN).points, 7)
+
+    def test_immutable(self):
+        card = Card(Suit.SPADES, Rank.ACE)
+        with self.assertRaises(AttributeError):
+            card.rank = Rank.TWO
+
+
+class TestDeck(unittest.TestCase):
+    def test_interned(self):
+        deck = Deck()
+        self.assertEqual(len(deck), 52)
+        self.assertEqual(len(set(deck.cards)), 52)
+        card = deck.draw()
+        self.assertIs(card, Card.from_value(card.value()))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,88 @@
+from gin_rummy.deadwood_cache import DeadwoodCache
+from gin_rummy.cards import Card, Suit, Rank
+from gin_rummy import knock_evaluation
+import os
+import tempfile
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestDeadwoodCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = DeadwoodCache(capacity=2)
+
+    def test_lru_eviction(self):
+        self.cache.put(1, 'a')
+        self.cache.put(2, 'b')
+        self.assertEqual(self.cache.get(1), 'a')
+        self.cache.put(3, 'c')
+        self.assertTrue(1 in self.cache)
+        self.assertFalse(2 in self.cache)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_counters(self):
+        self.cache.put(1, 'a')
+        self.cache.get(1)
+        self.cache.get(2)
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_disabled(self):
+        cache = DeadwoodCache(capacity=0)
+        cache.put(1, 'a')
+        self.assertEqual(len(cache), 0)
+
+    def test_save_load(self):
+        self.cache.put(1, (2, (3,)))
+        self.cache.put(4, (5, ()))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.pkl')
+            self.cache.save(path)
+            warm = DeadwoodCache(capacity=1)
+            warm.load(path)
+        self.assertEqual(len(warm), 1)
+        self.assertEqual(warm.get(4), (5, ()))
+
+
+class TestKnockEvaluationCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.saved_cache = knock_evaluation.cache
+        knock_evaluation.cache = DeadwoodCache()
+        self.hand = [
+            Card(Suit.CLUBS, Rank.ACE),
+            Card(Suit.DIAMONDS, Rank.ACE),
+            Card(Suit.SPADES, Rank.ACE),
+            Card(Suit.CLUBS, Rank.FOUR),
+            Card(Suit.CLUBS, Rank.FIVE),
+            Card(Suit.CLUBS, Rank.SIX),
+            Card(Suit.CLUBS, Rank.SEVEN),
+            Card(Suit.DIAMONDS, Rank.QUEEN),
+            Card(Suit.HEARTS, Rank.TEN),
+            Card(Suit.HEARTS, Rank.FOUR),
+        ]
+
+    def tearDown(self) -> None:
+        knock_evaluation.cache = self.saved_cache
+
+    def test_order_independent(self):
+        first = knock_evaluation.calc_optimal_deadwood(self.hand)
+        second = knock_evaluation.calc_optimal_deadwood(list(reversed(self.hand)))
+        self.assertEqual(first, second)
+        self.assertEqual(knock_evaluation.cache.hits, 1)
+
+    def test_can_knock_and_evaluate_knock(self):
+        hand = self.hand + [Card(Suit.CLUBS, Rank.EIGHT)]
+        knock_evaluation.can_knock(hand)
+        knock_evaluation.can_knock(hand)
+        opponent = [Card(Suit.HEARTS, Rank.KING), Card(Suit.SPADES, Rank.KING)]
+        knock_evaluation.evaluate_knock(self.hand, opponent)
+        knock_evaluation.evaluate_knock(self.hand, opponent)
+        self.assertEqual(knock_evaluation.cache.hits, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+from gin_rummy.batched import BatchedGinRummy
+from gin_rummy.cards import Deck
+from gin_rummy.dealing import deal_deck, deal_decks, split_deals
+from gin_rummy.gin_rummy import Action, GinRummy
+import numpy as np
+import random
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestDealing(unittest.TestCase):
+    def test_permutations(self):
+        decks, dealers = deal_decks(7, 100)
+        self.assertEqual(decks.shape, (100, 52))
+        self.assertTrue(np.all(np.sort(decks, axis=1) == np.arange(52)))
+        self.assertTrue(0 < dealers.sum() < 100)
+
+    def test_games_are_independent_streams(self):
+        decks, dealers = deal_decks(7, 10)
+        subset, subset_dealers = deal_decks(7, [9, 3])
+        self.assertTrue(np.array_equal(subset, decks[[9, 3]]))
+        self.assertTrue(np.array_equal(subset_dealers, dealers[[9, 3]]))
+        self.assertEqual(deal_deck(7, 3), (decks[3].tobytes(), int(dealers[3])))
+        self.assertFalse(np.array_equal(deal_decks(8, 10)[0], decks))
+
+    def test_split_deals(self):
+        decks, dealers = deal_decks(3, 6)
+        hands, upcards, stocks = split_deals(decks, dealers)
+        for i in range(6):
+            game = GinRummy(seed=3, game=i)
+            self.assertEqual(game.dealer, dealers[i])
+            for player in range(2):
+                self.assertEqual(sorted(card.value() for card in game.hands[player]), sorted(hands[i, player]))
+            self.assertEqual(game.discard_pile[-1].value(), upcards[i])
+            self.assertEqual([card.value() for card in game.stock], list(stocks[i]))
+
+    def test_replay(self):
+        rng = random.Random(0)
+        game = GinRummy(seed=11, game=5)
+        actions = []
+        while not game.is_ended() and len(actions) < 80:
+            valid_actions = game.get_valid_actions(game.get_cur_player())
+            action = rng.choice([a for a, valid in enumerate(valid_actions) if valid])
+            game.take_action(action)
+            actions.append(action)
+        replayed = GinRummy.replay(game.seed, actions, game=game.game)
+        self.assertEqual(replayed.get_state_key(), game.get_state_key())
+        self.assertEqual(replayed.get_score(0), game.get_score(0))
+
+    def test_batched_matches_seeded_games(self):
+        batch = BatchedGinRummy(4, seed=21)
+        batch.take_action(np.full(4, Action.PASS))
+        batch.reset([1, 2])
+        for i in range(4):
+            game = GinRummy(seed=21, game=int(batch.game_ids[i]))
+            if i not in (1, 2):
+                game.take_action(Action.PASS)
+            self.assertEqual(batch.get_game(i).get_state_key(), game.get_state_key())
+        self.assertEqual(list(batch.game_ids), [0, 4, 5, 3])
+
+    def test_deck_seed(self):
+        self.assertEqual(Deck(seed=1).cards, Deck(seed=1).cards)
+        self.assertNotEqual(Deck(seed=1).cards, Deck(seed=2).cards)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+from gin_rummy.endgame import EndgameSolver
+from gin_rummy.gin_rummy import _STOCK, Action, DISCARD_OFFSET, GinRummy
+from gin_rummy.rollout import GreedyAgent
+from gin_rummy.self_play import UniformAgent
+from mcts import MCTS
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def expectimax(game, turns):
+    """ Plain expectimax with the solver's rules, without pruning or a table """
+    if game.is_ended():
+        return game.get_score(game.cur_player)
+    if turns == 0:
+        return 0.0
+    best = -1.0
+    for action, valid in enumerate(game.get_valid_actions(game.cur_player)):
+        if not valid:
+            continue
+        if action == Action.DRAW_STOCK:
+            total = 0.0
+            for i in range(game.stock_size):
+                child = game.clone()
+                last = _STOCK + game.stock_size - 1
+                child.state[_STOCK + i], child.state[last] = child.state[last], child.state[_STOCK + i]
+                child.take_action(action)
+                total += expectimax(child, turns)
+            value = total / game.stock_size
+        else:
+            child = game.clone()
+            child.take_action(action)
+            if child.cur_player == game.cur_player:
+                value = expectimax(child, turns)
+            else:
+                value = -expectimax(child, turns - 1)
+        best = max(best, value)
+    return best
+
+
+def late_games(stock_size, count, knock=False):
+    """ Games played half greedily, but without knocking, down to stock_size cards (or a possible knock) """
+    agent = GreedyAgent(epsilon=0.5, seed=0)
+    games = []
+    i = 0
+    while len(games) < count:
+        game = GinRummy(seed=8, game=i)
+        i += 1
+        while not game.is_ended() and game.stock_size > stock_size:
+            action = agent.choose_action(game)
+            if action == Action.KNOCK:
+                if knock:
+                    break
+                deadwoods = game.get_meld_state(game.cur_player).discard_deadwoods()
+                action = DISCARD_OFFSET + min(deadwoods, key=lambda discard: discard[1])[0]
+            game.take_action(action)
+        if not game.is_ended():
+            games.append(game)
+    return games
+
+
+class TestEndgameSolver(unittest.TestCase):
+    def test_matches_expectimax(self):
+        solver = EndgameSolver(max_stock=4, max_turns=2)
+        for game in late_games(4, 6):
+            self.assertAlmostEqual(solver(game), expectimax(game, 2))
+            # Pruned entries must not leak into later exact answers
+            self.assertAlmostEqual(solver(game.clone()), expectimax(game, 2))
+        self.assertGreater(solver.stats()['hits'], 0)
+
+    def test_threshold(self):
+        game = GinRummy(seed=0)
+        self.assertIsNone(EndgameSolver(max_stock=4)(game))
+        self.assertIsNotNone(EndgameSolver(max_stock=31, max_turns=1)(game))
+
+    def test_winning_knock(self):
+        solver = EndgameSolver(max_stock=31, max_turns=1)
+        found = 0
+        for game in late_games(10, 20, knock=True):
+            if not game.get_valid_actions(game.cur_player)[Action.KNOCK]:
+                continue
+            knocked = game.clone()
+            knocked.take_action(Action.KNOCK)
+            if knocked.get_score(game.cur_player) == 1:
+                self.assertEqual(solver(game), 1)
+                found += 1
+        self.assertGreater(found, 0)
+
+    def test_mcts_leaf_solver(self):
+        game = late_games(4, 1)[0]
+        for batch_size in (1, 4):
+            solver = EndgameSolver(max_stock=4, max_turns=2)
+            search = MCTS(UniformAgent(), num_simulations=30, batch_size=batch_size, leaf_solver=solver)
+            probs = search.get_action_prob(game)
+            self.assertAlmostEqual(sum(probs), 1)
+            self.assertGreater(search.get_stats()['solved_leaves'], 0)
+            self.assertGreater(solver.solves, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
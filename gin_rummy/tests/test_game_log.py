@@ -0,0 +1,91 @@
+from gin_rummy.game_log import GameLogWriter, map_shards, read_records, replay_games, replay_observations, \
+    replay_positions
+from gin_rummy.gin_rummy import GinRummy
+from gin_rummy.observation import ObservationEncoder
+from gin_rummy.rollout import GreedyAgent
+import numpy as np
+import os
+import tempfile
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def play(seed: int, game: int, agent: GreedyAgent):
+    played = GinRummy(seed=seed, game=game)
+    actions = []
+    while not played.is_ended() and len(actions) < 200:
+        actions.append(agent.choose_action(played))
+        played.take_action(actions[-1])
+    return played, actions
+
+
+def final_scores(records):
+    return [GinRummy.replay(record.seed, record.actions, record.game, record.dealer).get_score(0)
+            for record in records]
+
+
+class TestGameLog(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'games.log')
+        agent = GreedyAgent(epsilon=0.3, seed=0)
+        self.games = [play(11, i, agent) for i in range(9)]
+        with GameLogWriter(self.path) as writer:
+            for game, actions in self.games[:5]:
+                writer.append_game(game, actions)
+        with GameLogWriter(self.path) as writer:
+            for game, actions in self.games[5:]:
+                writer.append_game(game, actions)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        records = list(read_records(self.path))
+        self.assertEqual([list(record.actions) for record in records], [actions for _, actions in self.games])
+        for (game, _), replayed in zip(self.games, replay_games(self.path)):
+            self.assertEqual(replayed.state, game.state)
+            self.assertEqual(replayed.get_score(0), game.get_score(0))
+        size = os.path.getsize(self.path)
+        self.assertEqual(size, 12 + sum(15 + len(actions) for _, actions in self.games))
+
+    def test_positions_and_observations(self):
+        record = next(read_records(self.path))
+        game, actions = self.games[0]
+        self.assertEqual([action for _, action in replay_positions(record)], actions)
+        encoder = ObservationEncoder()
+        batches = list(replay_observations(self.path, encoder, batch_size=50))
+        total = sum(len(actions) for _, actions in self.games)
+        self.assertEqual([len(batch[0]) for batch in batches], [50] * (total // 50) + [total % 50])
+        observations, players, logged = (np.concatenate(parts) for parts in zip(*batches))
+        self.assertTrue(np.array_equal(logged, np.concatenate([actions for _, actions in self.games])))
+        first = GinRummy(seed=11, game=0)
+        self.assertTrue(np.array_equal(observations[0], encoder.encode(first, first.cur_player)))
+        self.assertEqual(players[0], first.cur_player)
+
+    def test_shards(self):
+        records = list(read_records(self.path))
+        shards = [list(read_records(self.path, shard, 3)) for shard in range(3)]
+        self.assertEqual(shards[1], records[1::3])
+        expected = [final_scores(records[shard::3]) for shard in range(3)]
+        self.assertEqual(map_shards(final_scores, self.path, num_shards=3, num_workers=1), expected)
+        self.assertEqual(map_shards(final_scores, [self.path], num_shards=3, num_workers=2), expected)
+
+    def test_bad_logs(self):
+        bad = os.path.join(self.tmp.name, 'bad.log')
+        with open(bad, 'wb') as f:
+            f.write(b'not a log at all')
+        with self.assertRaises(Exception):
+            list(read_records(bad))
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(bad, 'wb') as f:
+            f.write(data[:-3])
+        with self.assertRaises(Exception):
+            list(read_records(bad))
+
+
+if __name__ == '__main__':
+    unittest.main()
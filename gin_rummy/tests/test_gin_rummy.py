@@ -0,0 +1,183 @@
+from gin_rummy.gin_rummy import GinRummy, Action, CardState
+from gin_rummy.self_play import UniformAgent
+from mcts import DeterminizedMCTS, MCTS
+from mcts.node_store import CHANCE
+from gin_rummy.cards import Card, Rank, Suit
+from gin_rummy.knock_evaluation import BIG_GIN, BIG_GIN_BONUS, calc_optimal_deadwood
+import random
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestGinRummy(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(0)
+        self.game = GinRummy(seed=0)
+
+    def test_action_size(self):
+        self.assertEqual(self.game.get_action_size(), 56)
+        self.assertEqual(len(self.game.get_valid_actions(self.game.get_cur_player())), 56)
+
+    def test_clone(self):
+        game = self.game
+        clone = game.clone()
+        player = game.get_cur_player()
+        self.assertEqual(clone.get_observation(player), game.get_observation(player))
+        clone.take_action(Action.PASS)
+        self.assertNotEqual(clone.get_cur_player(), game.get_cur_player())
+        self.assertEqual(game.turn, 1)
+        clone.take_action(Action.DRAW_DISCARD)
+        self.assertEqual(len(clone.hands[clone.get_cur_player()]), 11)
+        self.assertEqual(len(game.discard_pile), 1)
+
+    def test_knock_mask(self):
+        game = self.game
+        for _ in range(60):
+            player = game.get_cur_player()
+            valid_actions = game.get_valid_actions(player)
+            hand = game.hands[player]
+            if len(hand) == 11:
+                best = min(calc_optimal_deadwood(hand[:i] + hand[i+1:])[0] for i in range(11))
+                self.assertEqual(valid_actions[Action.KNOCK], int(best <= 10))
+            actions = [a for a, valid in enumerate(valid_actions) if valid and a != Action.KNOCK]
+            game.take_action(random.choice(actions))
+            if len(game.stock) == 0:
+                break
+
+    def test_knock_ends_game(self):
+        rng = random.Random(1)
+        knocks = 0
+        for i in range(20):
+            game = GinRummy(seed=1, game=i)
+            while not game.is_ended():
+                valid_actions = game.get_valid_actions(game.get_cur_player())
+                if valid_actions[Action.KNOCK]:
+                    knocker = game.get_cur_player()
+                    game.take_action(Action.KNOCK)
+                    knocks += 1
+                    self.assertTrue(game.is_ended())
+                    self.assertFalse(game.is_draw())
+                    self.assertEqual(len(game.hands[knocker]), 10 if game.knock_result.kind != BIG_GIN else 11)
+                    self.assertEqual(sum(game.get_valid_actions(knocker)), 0)
+                    self.assertEqual(game.get_score(0), -game.get_score(1))
+                    self.assertNotEqual(game.get_score(0), 0)
+                    self.assertEqual(game.get_points(0), -game.get_points(1))
+                    self.assertEqual(game.clone().get_score(0), game.get_score(0))
+                    break
+                actions = [a for a, valid in enumerate(valid_actions) if valid]
+                game.take_action(rng.choice(actions))
+        self.assertGreater(knocks, 0)
+
+    def test_big_gin(self):
+        game = self.game
+        player = game.get_cur_player()
+        hand = [Card(Suit.CLUBS, rank) for rank in (Rank.ACE, Rank.TWO, Rank.THREE, Rank.FOUR)] + \
+            [Card(suit, Rank.NINE) for suit in (Suit.CLUBS, Suit.DIAMONDS, Suit.HEARTS)] + \
+            [Card(Suit.SPADES, rank) for rank in (Rank.FIVE, Rank.SIX, Rank.SEVEN, Rank.EIGHT)]
+        opponent = [Card.from_value(v) for v in range(52) if Card.from_value(v) not in hand][:10]
+        game.hand_masks[player] = sum(1 << card.value() for card in hand)
+        game.hand_masks[game.get_opponent(player)] = sum(1 << card.value() for card in opponent)
+        self.assertEqual(game.get_valid_actions(player)[Action.KNOCK], 1)
+        game.take_action(Action.KNOCK)
+        self.assertEqual(game.knock_result.kind, BIG_GIN)
+        self.assertEqual(game.get_points(player),
+                         calc_optimal_deadwood(opponent)[0] + BIG_GIN_BONUS)
+        self.assertEqual(game.get_score(player), 1)
+
+    def play(self, game, steps, rng):
+        for _ in range(steps):
+            actions = [a for a, valid in enumerate(game.get_valid_actions(game.get_cur_player()))
+                       if valid and a != Action.KNOCK]
+            game.take_action(rng.choice(actions))
+
+    def test_observation_hides_opponent_hand(self):
+        game = self.game
+        player = game.get_cur_player()
+        observation = game.get_observation(player)
+        self.assertNotIn(CardState.OPP_HAND, observation)
+        self.assertEqual(observation.count(CardState.STOCK), 41)
+        # The upcard is known once picked up
+        upcard = game.discard_pile[-1]
+        game.take_action(Action.DRAW_DISCARD)
+        observation = game.get_observation(game.get_opponent(player))
+        self.assertEqual(observation[upcard.value()], CardState.OPP_HAND)
+        game.take_action(Action.DISCARD(upcard))
+        self.assertEqual(game.get_observation(game.get_opponent(player))[upcard.value()], CardState.TOP_DISCARD)
+
+    def test_deadwood_follows_hands(self):
+        rng = random.Random(1)
+        game = self.game
+        for _ in range(60):
+            if game.is_ended():
+                break
+            clone = game.clone()
+            self.play(game, 1, rng)
+            for player in range(2):
+                expected = calc_optimal_deadwood(game.hands[player])[0]
+                self.assertEqual(game.get_deadwood(player), expected)
+                self.assertEqual(clone.get_deadwood(player), calc_optimal_deadwood(clone.hands[player])[0])
+        # Hands set directly are picked up on the next query
+        game.hand_masks[0] = sum(1 << card.value() for card in [Card(Suit.CLUBS, Rank.KING)])
+        self.assertEqual(game.get_deadwood(0), 10)
+
+    def test_determinize(self):
+        rng = random.Random(0)
+        game = self.game
+        self.play(game, 15, rng)
+        player = game.get_cur_player()
+        opponent = game.get_opponent(player)
+        for _ in range(10):
+            world = game.determinize(player, rng)
+            self.assertEqual(world.get_observation(player), game.get_observation(player))
+            self.assertEqual(world.get_valid_actions(player), game.get_valid_actions(player))
+            self.assertEqual(len(world.hands[opponent]), len(game.hands[opponent]))
+            self.assertEqual(world.hand_masks[opponent] & game.known_masks[opponent], game.known_masks[opponent])
+            self.assertEqual(sorted(world.stock + world.hands[opponent]), sorted(game.stock + game.hands[opponent]))
+            self.assertEqual(world.get_unseen_mask(player), game.get_unseen_mask(player))
+        worlds = {game.determinize(player, rng).hand_masks[opponent] for _ in range(10)}
+        self.assertGreater(len(worlds), 1)
+
+    def test_determinized_search(self):
+        self.play(self.game, 6, random.Random(0))
+        with DeterminizedMCTS(UniformAgent, num_determinizations=4, num_workers=2,
+                              num_simulations=20, seed=0) as search:
+            probs = search.get_action_prob(self.game)
+            stats = search.get_stats()
+        valid = self.game.get_valid_actions(self.game.get_cur_player())
+        self.assertAlmostEqual(probs.sum(), 1)
+        self.assertTrue(all(valid[a] for a in range(len(probs)) if probs[a] > 0))
+        self.assertEqual(stats['simulations'], 80)
+
+    def test_advance_keeps_realized_draw(self):
+        rng = random.Random(0)
+        game = self.game
+        self.play(game, 4, rng)
+        while not game.get_valid_actions(game.get_cur_player())[Action.DRAW_STOCK]:
+            self.play(game, 1, rng)
+        player = game.get_cur_player()
+        search = MCTS(UniformAgent(), num_simulations=300)
+        search.get_action_prob(game)
+        root = search.table[game.get_state_key()]
+        draw_edge = [e for e in range(*search.store.edges(root).indices(search.store.edge_size))
+                     if search.store.action[e] == Action.DRAW_STOCK][0]
+        self.assertEqual(search.store.child[draw_edge], CHANCE)
+
+        # A different card drawn from the stock was never searched
+        other = game.determinize(player, random.Random(1))
+        while other.stock[-1] == game.stock[-1]:
+            other = game.determinize(player, rng)
+        other.take_action(Action.DRAW_STOCK)
+        self.assertNotIn(other.get_state_key(), search.table)
+
+        draw_visits = search.store.visit_count[draw_edge]
+        game.take_action(Action.DRAW_STOCK)
+        carried = search.advance(game)
+        self.assertGreater(carried, 0)
+        self.assertLess(carried, draw_visits)
+        self.assertEqual(search.get_visits(game.get_state_key()), carried)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+from gin_rummy.gin_rummy import GinRummy, NUM_ACTIONS, NUM_CARDS
+from gin_rummy.inference_broker import InferenceBroker
+from gin_rummy.self_play import SelfPlayRunner
+from mcts import Agent
+import numpy as np
+import threading
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class EchoAgent(Agent):
+    """ Policy echoes the observation, value is its sum """
+
+    def predict(self, game, game_player):
+        raise NotImplementedError
+
+    def predict_batch(self, observations, games=None):
+        policies = np.zeros((len(observations), NUM_ACTIONS))
+        policies[:, :NUM_CARDS] = observations
+        return policies, observations.sum(axis=1)
+
+
+class TestInferenceBroker(unittest.TestCase):
+    def test_round_trip(self):
+        with InferenceBroker(EchoAgent, 1, NUM_CARDS, NUM_ACTIONS, max_client_batch=4) as broker:
+            client = broker.get_client(0)
+            game = GinRummy()
+            policy, value = client.predict(game, 0)
+            observation = game.get_observation(0)
+            self.assertEqual(list(policy[:NUM_CARDS]), observation)
+            self.assertEqual(value, sum(observation))
+            # Split into requests of at most max_client_batch rows
+            observations = np.random.default_rng(0).integers(0, 5, (10, NUM_CARDS))
+            policies, values = client.predict_batch(observations)
+            self.assertTrue(np.array_equal(policies[:, :NUM_CARDS], observations))
+            self.assertTrue(np.array_equal(values, observations.sum(axis=1)))
+            client.close()
+            metrics = broker.metrics()
+        self.assertEqual(metrics['rows'], 11)
+        self.assertEqual(metrics['requests'], 4)
+        self.assertEqual(metrics['batch_size_histogram'].sum(), metrics['batches'])
+
+    def test_batches_concurrent_clients(self):
+        num_clients = 4
+        with InferenceBroker(EchoAgent, num_clients, NUM_CARDS, NUM_ACTIONS, max_batch_size=8,
+                             max_wait=0.05) as broker:
+            errors = []
+
+            def run(client_id):
+                client = broker.get_client(client_id)
+                rng = np.random.default_rng(client_id)
+                for _ in range(20):
+                    observations = rng.integers(0, 5, (2, NUM_CARDS))
+                    _, values = client.predict_batch(observations)
+                    if not np.array_equal(values, observations.sum(axis=1)):
+                        errors.append(client_id)
+                client.close()
+
+            threads = [threading.Thread(target=run, args=(i,)) for i in range(num_clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            metrics = broker.metrics()
+        self.assertEqual(errors, [])
+        self.assertEqual(metrics['rows'], num_clients * 20 * 2)
+        self.assertGreater(metrics['mean_batch_size'], 2)
+        self.assertEqual(metrics['batch_size_histogram'][9:].sum(), 0)
+        self.assertEqual(metrics['queue_depth_histogram'].sum(), metrics['batches'])
+
+    def test_self_play_runner(self):
+        with SelfPlayRunner(num_workers=2, buffer_capacity=2000, num_simulations=4, use_broker=True) as runner:
+            self.assertTrue(runner.buffer.wait(20, timeout=30))
+            metrics = runner.metrics()
+        self.assertGreater(metrics['broker']['rows'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+from gin_rummy import instrumentation, knock_evaluation
+from gin_rummy.cards import Card, Suit, Rank
+from gin_rummy.deadwood_cache import DeadwoodCache
+from gin_rummy.instrumentation import Lazy
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self) -> None:
+        self.saved_cache = knock_evaluation.cache
+        knock_evaluation.cache = DeadwoodCache(capacity=0)
+        instrumentation.reset()
+        self.hand = [
+            Card(Suit.CLUBS, Rank.ACE),
+            Card(Suit.DIAMONDS, Rank.ACE),
+            Card(Suit.SPADES, Rank.ACE),
+            Card(Suit.CLUBS, Rank.TWO),
+            Card(Suit.CLUBS, Rank.THREE),
+            Card(Suit.CLUBS, Rank.FOUR),
+            Card(Suit.CLUBS, Rank.SEVEN),
+            Card(Suit.DIAMONDS, Rank.QUEEN),
+            Card(Suit.HEARTS, Rank.TEN),
+            Card(Suit.HEARTS, Rank.FOUR),
+            Card(Suit.HEARTS, Rank.ACE),
+        ]
+
+    def tearDown(self) -> None:
+        instrumentation.disable()
+        instrumentation.reset()
+        knock_evaluation.cache = self.saved_cache
+
+    def test_disabled(self):
+        instrumentation.disable()
+        knock_evaluation.calc_optimal_deadwood(self.hand)
+        self.assertEqual(instrumentation.get_stats(), {})
+
+    def test_enabled(self):
+        instrumentation.enable()
+        for solver in knock_evaluation.SOLVERS:
+            knock_evaluation.calc_optimal_deadwood(self.hand, solver=solver)
+        knock_evaluation.can_knock(self.hand)
+        stats = instrumentation.get_stats()
+        self.assertEqual(stats['calc_optimal_deadwood']['calls'], 3)
+        self.assertEqual(stats['solve_optimal_deadwood']['calls'], 3)
+        self.assertGreater(stats['solve_optimal_deadwood']['melds'], 0)
+        self.assertGreater(stats['solve_optimal_deadwood']['nodes'], 0)
+        self.assertGreater(stats['calc_optimal_deadwood']['seconds'], 0)
+        self.assertEqual(stats['can_knock']['calls'], 1)
+        self.assertGreater(stats['calc_discard_deadwood_mask']['nodes'], 0)
+        self.assertIn('can_knock', instrumentation.report())
+
+    def test_lazy(self):
+        calls = []
+        lazy = Lazy(lambda: calls.append(1) or 'message')
+        logging.getLogger('test_lazy').debug('%s', lazy)
+        self.assertEqual(str(lazy), 'message')
+
+
+if __name__ == '__main__':
+    unittest.main()
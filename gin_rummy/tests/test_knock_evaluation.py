@@ -1,5 +1,7 @@
 from gin_rummy.knock_evaluation import *
+from gin_rummy.bit_hand import cards_to_mask, sweep_optimal_deadwood
 from gin_rummy.cards import Card, Suit, Rank
+import random
 import unittest
 import logging
 
@@ -49,6 +51,13 @@ class TestKnockEvaluation2(unittest.TestCase):
     def test_can_knock(self):
         self.assertTrue(can_knock(self.hand))
 
+    def test_calc_discard_deadwood(self):
+        deadwoods, best = calc_discard_deadwood(self.hand)
+        for i, deadwood in enumerate(deadwoods):
+            expected, _ = calc_optimal_deadwood(self.hand[:i] + self.hand[i+1:], solver='tree')
+            self.assertEqual(deadwood, expected)
+        self.assertEqual(best, 4)
+
 
 class TestKnockEvaluation3(unittest.TestCase):
     def setUp(self) -> None:
@@ -75,5 +84,144 @@ class TestKnockEvaluation3(unittest.TestCase):
         # self.assertEqual(deadwood, 14)
 
 
+class TestSolvers(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rng = random.Random(0)
+        self.deck = Card.enumerate()
+
+    def check(self, cards):
+        expected, _ = calc_optimal_deadwood(cards, solver='tree')
+        for solver in SOLVERS:
+            deadwood, melds = calc_optimal_deadwood(cards, solver=solver)
+            self.assertEqual(deadwood, expected, solver)
+            melded = [card for meld in melds for card in meld]
+            self.assertEqual(len(melded), len(set(melded)))
+            for meld in melds:
+                self.assertTrue(is_set_meld(meld) or is_run_meld(sort_by_suit(meld)), meld)
+
+    def test_random_hands(self):
+        for _ in range(200):
+            self.check(self.rng.sample(self.deck, self.rng.choice([10, 11])))
+
+    def test_meld_heavy_hands(self):
+        # Four-of-a-kind sets overlapping runs in every suit
+        low_cards = [card for card in self.deck if card.rank.value < 4]
+        for _ in range(20):
+            self.check(self.rng.sample(low_cards, 11))
+
+    def test_unknown_solver(self):
+        with self.assertRaises(Exception):
+            calc_optimal_deadwood(self.deck[:10], solver='unknown')
+
+    def test_sweep_layoffs(self):
+        player_hand = [
+            Card(Suit.CLUBS, Rank.FOUR),
+            Card(Suit.CLUBS, Rank.FIVE),
+            Card(Suit.CLUBS, Rank.SIX),
+            Card(Suit.SPADES, Rank.NINE),
+            Card(Suit.HEARTS, Rank.NINE),
+            Card(Suit.DIAMONDS, Rank.NINE),
+        ]
+        anchors, free = get_layoff_masks(calc_optimal_deadwood(player_hand)[1])
+        opponent = cards_to_mask([
+            Card(Suit.CLUBS, Rank.TWO),
+            Card(Suit.CLUBS, Rank.THREE),
+            Card(Suit.CLUBS, Rank.SEVEN),
+            Card(Suit.CLUBS, Rank.NINE),
+            Card(Suit.HEARTS, Rank.KING),
+        ])
+        deadwood, _ = sweep_optimal_deadwood(opponent, anchors, free)
+        self.assertEqual(deadwood, 10)
+
+    def test_solvers_agree_on_layoffs(self):
+        checked = 0
+        while checked < 30:
+            cards = self.rng.sample(self.deck, 20)
+            player_hand, opponent_hand = cards[:10], cards[10:]
+            deadwood, player_melds = calc_optimal_deadwood(player_hand)
+            if deadwood > MAX_KNOCK_DEADWOOD:
+                continue
+            checked += 1
+            expected, _ = solve_opponent_deadwood(player_melds, opponent_hand, 'sweep')
+            for solver in SOLVERS:
+                self.assertEqual(solve_opponent_deadwood(player_melds, opponent_hand, solver)[0], expected, solver)
+
+    def test_layoff_cache_keeps_meld_splits_apart(self):
+        suits = (Suit.CLUBS, Suit.DIAMONDS, Suit.HEARTS)
+        ranks = (Rank.THREE, Rank.FOUR, Rank.FIVE)
+        sets = [[Card(suit, rank) for suit in suits] for rank in ranks]
+        runs = [[Card(suit, rank) for rank in ranks] for suit in suits]
+        opponent_hand = [Card(Suit.CLUBS, Rank.SIX), Card(Suit.SPADES, Rank.THREE), Card(Suit.SPADES, Rank.KING),
+                         Card(Suit.HEARTS, Rank.QUEEN), Card(Suit.DIAMONDS, Rank.JACK)]
+        # The same nine cards: the three of spades lays off onto the sets, the six of clubs onto the runs
+        self.assertEqual(calc_opponent_deadwood(sets, opponent_hand)[0], 36)
+        self.assertEqual(calc_opponent_deadwood(runs, opponent_hand)[0], 33)
+
+
+class TestScoring(unittest.TestCase):
+    def setUp(self) -> None:
+        # Deadwood 0: a run of clubs, a set of nines and a run of spades
+        self.gin_hand = [Card(Suit.CLUBS, rank) for rank in (Rank.ACE, Rank.TWO, Rank.THREE)] + \
+            [Card(suit, Rank.NINE) for suit in (Suit.CLUBS, Suit.DIAMONDS, Suit.HEARTS)] + \
+            [Card(Suit.SPADES, rank) for rank in (Rank.FIVE, Rank.SIX, Rank.SEVEN, Rank.EIGHT)]
+        self.opponent_hand = [
+            Card(Suit.CLUBS, Rank.FOUR),
+            Card(Suit.CLUBS, Rank.FIVE),
+            Card(Suit.SPADES, Rank.NINE),
+            Card(Suit.SPADES, Rank.FOUR),
+            Card(Suit.HEARTS, Rank.KING),
+            Card(Suit.HEARTS, Rank.QUEEN),
+            Card(Suit.DIAMONDS, Rank.KING),
+            Card(Suit.DIAMONDS, Rank.TWO),
+            Card(Suit.HEARTS, Rank.TWO),
+            Card(Suit.DIAMONDS, Rank.THREE),
+        ]
+
+    def test_gin(self):
+        result = evaluate_knock(self.gin_hand, self.opponent_hand)
+        self.assertEqual(result.kind, GIN)
+        # No layoffs against gin
+        self.assertEqual(result.opponent_deadwood, count_deadwood(self.opponent_hand))
+        self.assertEqual(result.points, result.opponent_deadwood + GIN_BONUS)
+
+    def test_big_gin(self):
+        result = evaluate_knock(self.gin_hand + [Card(Suit.SPADES, Rank.FOUR)], self.opponent_hand[:-1] +
+                                [Card(Suit.HEARTS, Rank.ACE)])
+        self.assertEqual(result.kind, BIG_GIN)
+        self.assertEqual(result.points, result.opponent_deadwood + BIG_GIN_BONUS)
+
+    def test_knock_with_layoffs(self):
+        # Swapping the eight of spades for the ten of hearts leaves 10 deadwood
+        player_hand = self.gin_hand[:-1] + [Card(Suit.HEARTS, Rank.TEN)]
+        result = evaluate_knock(player_hand, self.opponent_hand)
+        self.assertEqual(result.kind, KNOCK)
+        self.assertEqual(result.knocker_deadwood, 10)
+        # 4C and 5C extend the clubs run, 9S completes the nines and 4S extends the spades run
+        laid_off = 4 + 5 + 9 + 4
+        self.assertEqual(result.opponent_deadwood, count_deadwood(self.opponent_hand) - laid_off)
+        self.assertEqual(result.points, result.opponent_deadwood - 10)
+
+    def test_undercut(self):
+        player_hand = self.gin_hand[:-1] + [Card(Suit.HEARTS, Rank.TEN)]
+        opponent_hand = [Card(Suit.DIAMONDS, rank) for rank in (Rank.FOUR, Rank.FIVE, Rank.SIX, Rank.SEVEN)] + \
+            [Card(suit, Rank.JACK) for suit in (Suit.CLUBS, Suit.DIAMONDS, Suit.SPADES)] + \
+            [Card(Suit.HEARTS, Rank.THREE), Card(Suit.HEARTS, Rank.FOUR), Card(Suit.SPADES, Rank.ACE)]
+        result = evaluate_knock(player_hand, opponent_hand)
+        self.assertEqual(result.kind, UNDERCUT)
+        self.assertEqual(result.opponent_deadwood, 8)
+        self.assertEqual(result.points, 8 - 10 - UNDERCUT_BONUS)
+
+    def test_get_layable_melds(self):
+        player_melds = calc_optimal_deadwood(self.gin_hand)[1]
+        layable = get_layable_melds(player_melds, self.opponent_hand)
+        self.assertEqual(sorted(sorted(card.value() for card in meld) for meld in layable),
+                         sorted(sorted(card.value() for card in meld) for meld in
+                                [[Card(Suit.CLUBS, Rank.FOUR)],
+                                 [Card(Suit.CLUBS, Rank.FOUR), Card(Suit.CLUBS, Rank.FIVE)],
+                                 [Card(Suit.SPADES, Rank.NINE)],  # onto the nines
+                                 [Card(Suit.SPADES, Rank.NINE)],  # or onto the spades run
+                                 [Card(Suit.SPADES, Rank.FOUR)]]))
+
+
 if __name__ == '__main__':
     unittest.main()
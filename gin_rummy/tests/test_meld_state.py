@@ -0,0 +1,59 @@
+from gin_rummy.bit_hand import cards_to_mask, discard_deadwoods, mask_deadwood, sweep_optimal_deadwood
+from gin_rummy.cards import Card, Suit, Rank
+from gin_rummy.meld_state import MeldState
+import random
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestMeldState(unittest.TestCase):
+    def test_matches_full_solves(self):
+        rng = random.Random(0)
+        low_cards = [card.value() for card in Card.enumerate() if card.rank.value < 5]
+        for cards in (list(range(52)), low_cards):
+            state = MeldState()
+            hand = set()
+            for _ in range(300):
+                if len(hand) < 10 or (len(hand) == 10 and rng.random() < 0.5):
+                    card = rng.choice([card for card in cards if card not in hand])
+                    state.add(card)
+                    hand.add(card)
+                else:
+                    card = rng.choice(sorted(hand))
+                    state.remove(card)
+                    hand.discard(card)
+                mask = sum(1 << card for card in hand)
+                self.assertEqual(state.mask, mask)
+                self.assertEqual(state.deadwood, sweep_optimal_deadwood(mask)[0])
+                self.assertEqual(state.discard_deadwoods(), discard_deadwoods(mask))
+                self.assertEqual(mask_deadwood(mask) - sum(mask_deadwood(meld) for meld in state.best_melds()),
+                                 state.deadwood)
+
+    def test_draw_improvement(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            hand = rng.sample(range(52), 10)
+            mask = sum(1 << card for card in hand)
+            state = MeldState(mask)
+            for card in rng.sample([card for card in range(52) if card not in hand], 8):
+                best = min(deadwood for _, deadwood in discard_deadwoods(mask | 1 << card))
+                self.assertEqual(state.draw_improvement(card), max(0, state.deadwood - best))
+            # Drawing a card solved above takes over its copy
+            card = rng.choice(list(state._outs))
+            state.add(card)
+            self.assertEqual(state.discard_deadwoods(), discard_deadwoods(mask | 1 << card))
+
+    def test_copy_is_independent(self):
+        state = MeldState(cards_to_mask(Card(Suit.CLUBS, rank) for rank in (Rank.ACE, Rank.TWO, Rank.THREE)))
+        copy = state.copy()
+        copy.remove(Card(Suit.CLUBS, Rank.TWO).value())
+        self.assertEqual(state.deadwood, 0)
+        self.assertEqual(copy.deadwood, 4)
+        with self.assertRaises(Exception):
+            copy.remove(Card(Suit.CLUBS, Rank.TWO).value())
+
+
+if __name__ == '__main__':
+    unittest.main()
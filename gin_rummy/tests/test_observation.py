@@ -0,0 +1,83 @@
+from gin_rummy.batched import BatchedGinRummy
+from gin_rummy.gin_rummy import Action, CardState, GinRummy
+from gin_rummy.observation import DISCARD, HAND, KNOWN, ObservationEncoder, PLANES, TOP_DISCARD, UNSEEN, \
+    hash_observations, observation_key
+import numpy as np
+import random
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def play(game, rng, moves):
+    for _ in range(moves):
+        if game.is_ended():
+            break
+        valid_actions = game.get_valid_actions(game.get_cur_player())
+        game.take_action(rng.choice([a for a, valid in enumerate(valid_actions) if valid and a != Action.KNOCK]))
+    return game
+
+
+class TestObservationEncoder(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = random.Random(0)
+        self.games = [play(GinRummy(seed=5, game=i), rng, rng.randrange(2, 40)) for i in range(12)]
+        self.encoder = ObservationEncoder()
+
+    def test_matches_card_states(self):
+        observations = self.encoder.encode_games(self.games)
+        for game, observation in zip(self.games, observations):
+            planes = dict(zip(PLANES, observation.reshape(len(PLANES), -1)))
+            states = np.array(game.get_observation(game.get_cur_player()))
+            self.assertTrue(np.array_equal(planes[HAND] == 1, states == CardState.MY_HAND))
+            self.assertTrue(np.array_equal(planes[KNOWN] == 1, states == CardState.OPP_HAND))
+            self.assertTrue(np.array_equal(planes[TOP_DISCARD] == 1, states == CardState.TOP_DISCARD))
+            self.assertTrue(np.array_equal(planes[UNSEEN] == 1, states == CardState.STOCK))
+            self.assertTrue(np.array_equal(planes[DISCARD] > 0, (states == CardState.DISCARD) |
+                                           (states == CardState.TOP_DISCARD)))
+            self.assertTrue(np.all(planes[HAND] + planes[KNOWN] + (planes[DISCARD] > 0) + planes[UNSEEN] == 1))
+
+    def test_discard_recency(self):
+        game = self.games[0]
+        observation = self.encoder.encode(game, 0).reshape(len(PLANES), -1)
+        pile = [card.value() for card in game.discard_pile]
+        self.assertEqual(list(np.argsort(-observation[PLANES.index(DISCARD)])[:len(pile)]), pile[::-1])
+        self.assertEqual(observation[PLANES.index(DISCARD), pile[-1]], 1)
+
+    def test_layout_and_buffers(self):
+        encoder = ObservationEncoder(planes=(UNSEEN, HAND), recency=False, dtype=np.uint8)
+        out = encoder.allocate(len(self.games))
+        result = encoder.encode_games(self.games, [0] * len(self.games), out=out)
+        self.assertIs(result, out)
+        full = self.encoder.encode_games(self.games, [0] * len(self.games)).reshape(len(self.games), len(PLANES), -1)
+        self.assertTrue(np.array_equal(out.reshape(len(self.games), 2, -1), full[:, [4, 0]]))
+        with self.assertRaises(Exception):
+            encoder.encode_games(self.games, out=encoder.allocate(3))
+        with self.assertRaises(Exception):
+            ObservationEncoder(planes=('hand', 'stock'))
+
+    def test_batched_matches_games(self):
+        batch = BatchedGinRummy(6, seed=2)
+        rng = random.Random(1)
+        for _ in range(15):
+            valid_actions = batch.get_valid_actions()
+            batch.take_action([rng.choice([a for a, valid in enumerate(row) if valid and a != Action.KNOCK])
+                               for row in valid_actions])
+        games = [batch.get_game(i) for i in range(batch.num_games)]
+        for players in (None, [1] * batch.num_games):
+            expected = self.encoder.encode_games(games, players)
+            self.assertTrue(np.array_equal(self.encoder.encode_batched(batch, players), expected))
+
+    def test_hashes(self):
+        observations = self.encoder.encode_games(self.games)
+        hashes = hash_observations(observations)
+        self.assertEqual(len(set(hashes)), len(self.games))
+        self.assertTrue(np.array_equal(hash_observations(observations.copy()), hashes))
+        self.assertEqual(hash_observations(observations[3:4])[0], hashes[3])
+        self.assertEqual(observation_key(observations[3]), observation_key(observations[3].copy()))
+        self.assertNotEqual(observation_key(observations[3]), observation_key(observations[4]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+from gin_rummy.replay_dataset import ReplayDataset, ReplayWriter, record_dtype
+import numpy as np
+import tempfile
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestReplayDataset(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.count = 25
+        self.observations = rng.integers(0, 5, (self.count, 52)).astype(np.uint8)
+        self.masks = rng.integers(0, 2, (self.count, 56)).astype(np.uint8)
+        self.actions = rng.integers(0, 56, self.count)
+        self.rewards = rng.random(self.count).astype(np.float32)
+        with ReplayWriter(self.tmp.name, shard_size=10) as writer:
+            writer.append(self.observations[:7], self.masks[:7], self.actions[:7], self.rewards[:7])
+            writer.append(self.observations[7:], self.masks[7:], self.actions[7:], self.rewards[7:])
+        self.dataset = ReplayDataset(self.tmp.name)
+
+    def tearDown(self) -> None:
+        del self.dataset
+        self.tmp.cleanup()
+
+    def test_record_size(self):
+        self.assertEqual(record_dtype().itemsize, 64)
+
+    def test_shards(self):
+        self.assertEqual(len(self.dataset.shards), 3)
+        self.assertEqual(len(self.dataset), self.count)
+
+    def test_round_trip(self):
+        records = self.dataset.gather(np.arange(self.count))
+        self.assertTrue(np.array_equal(records['observation'], self.observations))
+        self.assertTrue(np.array_equal(np.unpackbits(records['mask'], axis=1, count=56), self.masks))
+        self.assertTrue(np.array_equal(records['action'], self.actions))
+        self.assertTrue(np.array_equal(records['reward'], self.rewards))
+        self.assertEqual(self.dataset[-1]['action'], self.actions[-1])
+
+    def test_zero_copy(self):
+        shard = self.dataset.get_shard(1)
+        self.assertIsInstance(shard, np.memmap)
+        self.assertTrue(np.shares_memory(shard['observation'], shard))
+
+    def test_sample(self):
+        observations, masks, actions, rewards = self.dataset.sample(16, np.random.default_rng(1))
+        self.assertEqual(observations.shape, (16, 52))
+        self.assertEqual(masks.shape, (16, 56))
+        for observation, action in zip(observations, actions):
+            i = int(np.flatnonzero((self.observations == observation).all(axis=1))[0])
+            self.assertEqual(action, self.actions[i])
+
+    def test_append_resumes(self):
+        with ReplayWriter(self.tmp.name, shard_size=10) as writer:
+            writer.append(self.observations[:2], self.masks[:2], self.actions[:2], self.rewards[:2])
+        self.assertEqual(len(ReplayDataset(self.tmp.name)), self.count + 2)
+
+    def test_empty(self):
+        with tempfile.TemporaryDirectory() as directory:
+            dataset = ReplayDataset(directory)
+            self.assertEqual(len(dataset), 0)
+            self.assertEqual(len(dataset.gather([])), 0)
+            with self.assertRaises(Exception):
+                dataset.gather([0])
+            with self.assertRaises(Exception):
+                dataset.sample(4)
+
+
+if __name__ == '__main__':
+    unittest.main()
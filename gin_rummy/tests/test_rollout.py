@@ -0,0 +1,93 @@
+from gin_rummy.bit_hand import cards_to_mask, discard_deadwoods
+from gin_rummy.cards import Card, Rank, Suit
+from gin_rummy.gin_rummy import Action, DISCARD_OFFSET, GinRummy, HAND_SIZE, NUM_CARDS
+from gin_rummy.rollout import GreedyAgent
+from mcts import MCTS
+import random
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def set_hand(game, hand, upcard):
+    """
+    Deals the game again so the player to move holds hand and upcard is turned up.
+    The player to move is dealt first, so takes every other card from the end of the deck.
+    """
+    dealt = [card.value() for card in hand]
+    rest = [card for card in range(NUM_CARDS) if card not in dealt and card != upcard.value()]
+    opponent_hand, stock = rest[:HAND_SIZE], rest[HAND_SIZE:]
+    game.deal(bytes(stock + [upcard.value()] + [card for pair in zip(opponent_hand, dealt) for card in pair]))
+    return game.get_cur_player()
+
+
+class TestGreedyAgent(unittest.TestCase):
+    def setUp(self) -> None:
+        self.agent = GreedyAgent(seed=0)
+        self.hand = [Card(Suit.CLUBS, rank) for rank in (Rank.ACE, Rank.TWO, Rank.THREE)] + \
+            [Card(Suit.HEARTS, Rank.FIVE), Card(Suit.HEARTS, Rank.SIX), Card(Suit.SPADES, Rank.NINE),
+             Card(Suit.DIAMONDS, Rank.JACK), Card(Suit.DIAMONDS, Rank.QUEEN), Card(Suit.SPADES, Rank.KING),
+             Card(Suit.HEARTS, Rank.KING)]
+
+    def test_takes_improving_upcard(self):
+        game = GinRummy(seed=0)
+        player = set_hand(game, self.hand, Card(Suit.HEARTS, Rank.SEVEN))
+        self.assertEqual(game.hand_masks[player], cards_to_mask(self.hand))
+        self.assertEqual(game.top_discard(), Card(Suit.HEARTS, Rank.SEVEN).value())
+        self.assertEqual(self.agent.greedy_action(game), Action.DRAW_DISCARD)
+        game.take_action(Action.DRAW_DISCARD)
+        # The run of hearts is complete, a king goes
+        self.assertIn(self.agent.greedy_action(game) - DISCARD_OFFSET,
+                      (Card(Suit.SPADES, Rank.KING).value(), Card(Suit.HEARTS, Rank.KING).value()))
+
+    def test_passes_useless_upcard(self):
+        game = GinRummy(seed=0)
+        set_hand(game, self.hand, Card(Suit.SPADES, Rank.TEN))
+        self.assertEqual(self.agent.greedy_action(game), Action.PASS)
+
+    def test_knocks_when_possible(self):
+        rng = random.Random(0)
+        for i in range(20):
+            game = GinRummy(seed=3, game=i)
+            while not game.is_ended():
+                player = game.get_cur_player()
+                action = self.agent.greedy_action(game)
+                self.assertEqual(game.get_valid_actions(player)[action], 1)
+                if game.get_valid_actions(player)[Action.KNOCK]:
+                    self.assertEqual(action, Action.KNOCK)
+                elif action >= DISCARD_OFFSET:
+                    deadwoods = dict(discard_deadwoods(game.hand_masks[player]))
+                    self.assertEqual(deadwoods[action - DISCARD_OFFSET], min(deadwoods.values()))
+                game.take_action(action if rng.random() < 0.9 else Action.DRAW_STOCK
+                                 if game.get_valid_actions(player)[Action.DRAW_STOCK] else action)
+
+    def test_outs(self):
+        game = GinRummy(seed=4)
+        player = game.get_cur_player()
+        outs = game.get_outs(player)
+        hand = game.hand_masks[player]
+        deadwood = game.get_deadwood(player)
+        unseen = game.get_unseen_mask(player)
+        for card in range(52):
+            if unseen >> card & 1:
+                best = min(d for _, d in discard_deadwoods(hand | 1 << card))
+                self.assertEqual(outs.get(card, 0), max(0, deadwood - best))
+            else:
+                self.assertNotIn(card, outs)
+
+    def test_predict(self):
+        agent = GreedyAgent(num_rollouts=4, epsilon=0.1, determinize=True, seed=1)
+        game = GinRummy(seed=5)
+        policy, value = agent.predict(game, game.get_cur_player())
+        valid_actions = game.get_valid_actions(game.get_cur_player())
+        self.assertAlmostEqual(policy.sum(), 1)
+        self.assertTrue(all(valid or p == 0 for p, valid in zip(policy, valid_actions)))
+        self.assertTrue(-1 <= value <= 1)
+        search = MCTS(agent, num_simulations=10)
+        probs = search.get_action_prob(game)
+        self.assertAlmostEqual(sum(probs), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+from gin_rummy.self_play import SelfPlayRunner, UniformAgent, play_game
+from gin_rummy.trajectory_buffer import TrajectoryBuffer
+import multiprocessing
+import numpy as np
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def write_games(spec, writer_id, games, steps):
+    buffer = TrajectoryBuffer.attach(spec)
+    for game in range(games):
+        values = np.full(steps, writer_id * 1000 + game)
+        buffer.write(np.zeros((steps, 4)), np.ones((steps, 3)), np.zeros((steps, 3)), values, games=1)
+    buffer.close()
+
+
+class TestTrajectoryBuffer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.buffer = TrajectoryBuffer(8, 4, 3)
+
+    def tearDown(self) -> None:
+        self.buffer.close()
+
+    def write(self, start, count):
+        values = np.arange(start, start + count)
+        self.buffer.write(np.repeat(values[:, None], 4, axis=1), np.ones((count, 3)), np.zeros((count, 3)), values)
+
+    def test_ring(self):
+        self.write(0, 6)
+        self.assertEqual(list(self.buffer.read(4)['outcomes']), [0, 1, 2, 3])
+        self.write(6, 6)
+        self.assertEqual(self.buffer.occupancy(), 1.0)
+        records = self.buffer.read(100)
+        self.assertEqual(list(records['outcomes']), list(range(4, 12)))
+        self.assertEqual(list(records['observations'][:, 0]), list(range(4, 12)))
+        self.assertEqual(self.buffer.occupancy(), 0.0)
+
+    def test_back_pressure(self):
+        self.write(0, 8)
+        event = type('Stopped', (), {'is_set': lambda self: True})()
+        self.assertFalse(self.buffer.write(np.zeros((1, 4)), np.zeros((1, 3)), np.zeros((1, 3)), [0], event))
+
+    def test_wait_for_written_records(self):
+        self.write(0, 3)
+        self.buffer.ready[1] = 0  # Reserved, but its writer hasn't filled it in yet
+        self.assertTrue(self.buffer.wait(1, timeout=0.05))
+        self.assertFalse(self.buffer.wait(2, timeout=0.05))
+        self.assertEqual(list(self.buffer.read(3)['outcomes']), [0])
+
+    def test_writers_exceeding_capacity(self):
+        buffer = TrajectoryBuffer(150, 4, 3)
+        writers = [multiprocessing.Process(target=write_games, args=(buffer.get_spec(), i, 4, 40)) for i in range(6)]
+        for writer in writers:
+            writer.start()
+        outcomes = []
+        while len(outcomes) < 6 * 4 * 40:
+            self.assertTrue(buffer.wait(40, timeout=10))
+            outcomes.extend(buffer.read(40)['outcomes'])
+        for writer in writers:
+            writer.join(timeout=10)
+        self.assertEqual(buffer.get_counters()['games'], 24)
+        values, counts = np.unique(outcomes, return_counts=True)
+        self.assertEqual(len(values), 24)
+        self.assertTrue(np.all(counts == 40))
+        buffer.close()
+
+
+class TestSelfPlay(unittest.TestCase):
+    def test_play_game(self):
+        observations, masks, policies, outcomes = play_game(np.random.default_rng(0))
+        self.assertEqual(observations.shape, (len(outcomes), 52))
+        self.assertEqual(masks.shape, (len(outcomes), 56))
+        self.assertTrue(np.allclose(policies.sum(axis=1), 1))
+        self.assertTrue(np.all(policies[masks == 0] == 0))
+
+    def test_play_game_mcts(self):
+        _, _, policies, outcomes = play_game(np.random.default_rng(0), UniformAgent(), num_simulations=4, max_steps=10)
+        self.assertEqual(len(outcomes), 10)
+        self.assertTrue(np.allclose(policies.sum(axis=1), 1))
+        _, _, replayed, _ = play_game(np.random.default_rng(0), UniformAgent(), num_simulations=4, max_steps=10)
+        self.assertTrue(np.array_equal(replayed, policies))
+
+    def test_runner(self):
+        with SelfPlayRunner(num_workers=2, buffer_capacity=2000) as runner:
+            self.assertTrue(runner.buffer.wait(200))
+            records = runner.read(200)
+            self.assertEqual(len(records['outcomes']), 200)
+            metrics = runner.metrics()
+            self.assertGreater(metrics['steps'], 0)
+            self.assertGreater(metrics['steps_per_second'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+from gin_rummy.gin_rummy import GinRummy
+from gin_rummy.rollout import GreedyAgent
+from gin_rummy.self_play import UniformAgent
+from gin_rummy.tournament import Entrant, GAUNTLET, Tournament, choose_action, fit_elo, play_pair
+import random
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+ENTRANTS = [Entrant('greedy', GreedyAgent), Entrant('uniform', UniformAgent)]
+
+
+class TestTournament(unittest.TestCase):
+    def test_pairs_swap_seats_on_same_deals(self):
+        agents = [entrant.agent_factory() for entrant in ENTRANTS]
+        matches = play_pair(ENTRANTS, agents, 0, 1, seed=7, target=40)
+        self.assertEqual([match['players'] for match in matches], [(0, 1), (1, 0)])
+        self.assertEqual(matches[0]['seed'], matches[1]['seed'])
+        for match in matches:
+            self.assertTrue(max(match['points']) >= 40 or match['hands'] == 50)
+            self.assertTrue(all(moves > 0 for moves in match['moves']))
+
+    def test_stops_when_separated(self):
+        with Tournament(ENTRANTS, seed=0, min_pairs=3, max_pairs=20, target=40) as tournament:
+            result = tournament.run()
+        self.assertEqual(result.stopped, [(0, 1)])
+        self.assertEqual(len(result.matches), 2 * 3)
+        greedy, uniform = result.summary()
+        self.assertGreater(greedy['elo'], uniform['elo'])
+        self.assertEqual(greedy['wins'] + greedy['losses'] + greedy['ties'], greedy['matches'])
+        self.assertGreater(greedy['think_ms_per_move'], 0)
+        self.assertIn('greedy', result.table())
+        self.assertGreater(result.throughput()['hands_per_second'], 0)
+
+    def test_gauntlet_with_workers(self):
+        entrants = ENTRANTS + [Entrant('uniform mcts', UniformAgent, num_simulations=8)]
+        with Tournament(entrants, mode=GAUNTLET, num_workers=2, min_pairs=2, max_pairs=2, target=20,
+                        seed=1) as tournament:
+            result = tournament.run()
+        self.assertEqual(sorted({match['players'] for match in result.matches}), [(0, 1), (0, 2), (1, 0), (2, 0)])
+        self.assertEqual(len(result.matches), 2 * 2 * 2)
+        with self.assertRaises(Exception):
+            Tournament(entrants, mode='swiss')
+
+    def test_policy_entrants_see_only_their_information(self):
+        class PeekingAgent(UniformAgent):
+            def predict(self, game, game_player):
+                seen.append(game)
+                return super().predict(game, game_player)
+
+        class NoRolloutAgent(GreedyAgent):
+            def rollout(self, game):
+                raise Exception("Rollout while choosing a tournament move")
+
+        seen = []
+        game = GinRummy(seed=3)
+        player = game.get_cur_player()
+        choose_action(Entrant('peeking', PeekingAgent), PeekingAgent(), game, random.Random(0))
+        world, = seen
+        self.assertIsNot(world, game)
+        self.assertEqual(world.hand_masks[player], game.hand_masks[player])
+        self.assertNotEqual(world.hand_masks[1 - player], game.hand_masks[1 - player])
+
+        agent = NoRolloutAgent(num_rollouts=4)
+        action = choose_action(Entrant('greedy', NoRolloutAgent), agent, game, random.Random(0))
+        self.assertEqual(action, agent.greedy_action(game))
+
+    def test_elo(self):
+        rng = random.Random(0)
+        matches = []
+        for _ in range(300):
+            players = (0, 1) if rng.random() < 0.5 else (1, 0)
+            winner = players.index(0) if rng.random() < 0.76 else players.index(1)
+            matches.append({'players': players, 'winner': winner})
+        matches.append({'players': (1, 2), 'winner': None})
+        elo = fit_elo(3, matches)
+        self.assertAlmostEqual(float(elo.sum()), 0, places=6)
+        self.assertAlmostEqual(elo[0] - elo[1], 200, delta=60)
+        self.assertAlmostEqual(elo[1], elo[2], delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,278 @@
+import logging
+import math
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from gin_rummy.gin_rummy import GinRummy
+from mcts import MCTS
+
+logger = logging.getLogger('gin_rummy.tournament')
+
+# An agent under evaluation. agent_factory builds its Agent, and must be picklable for
+# worker processes. With num_simulations it moves by MCTS over a determinization of
+# what it has seen, otherwise by its greedy_action if it has one, or by the best valid
+# action of its policy for a determinization.
+Entrant = namedtuple('Entrant', ['name', 'agent_factory', 'num_simulations'], defaults=(0,))
+
+MATCH_POINTS = 100
+MAX_HANDS = 50
+MAX_STEPS = 1000
+
+ROUND_ROBIN = 'round robin'
+GAUNTLET = 'gauntlet'
+
+# Entrants and their agents in a worker process, built once by _init_worker
+_entrants = None
+_agents = None
+
+
+def _init_worker(entrants):
+    global _entrants, _agents
+    _entrants = entrants
+    _agents = [entrant.agent_factory() for entrant in entrants]
+
+
+def choose_action(entrant: Entrant, agent, game: GinRummy, rng: random.Random) -> int:
+    """ The entrant's move, ties broken at random """
+    player = game.get_cur_player()
+    if not entrant.num_simulations and hasattr(agent, 'greedy_action'):
+        # Reads only the player's own hand and the upcard, so needs no determinization or rollouts
+        return agent.greedy_action(game)
+    valid_actions = np.asarray(game.get_valid_actions(player), dtype=np.float64)
+    world = game.determinize(player, rng)
+    if entrant.num_simulations:
+        policy = MCTS(agent, num_simulations=entrant.num_simulations).get_action_prob(world, temperature=0)
+    else:
+        policy, _ = agent.predict(world, player)
+    policy = np.asarray(policy, dtype=np.float64) * valid_actions
+    if policy.max() <= 0:
+        policy = valid_actions
+    return rng.choice(np.flatnonzero(policy == policy.max()).tolist())
+
+
+def play_match(entrants, agents, seed: int, rng: random.Random, target: int = MATCH_POINTS,
+               max_hands: int = MAX_HANDS):
+    """
+    Plays hands dealt from seed (hand i is game i) until a seat reaches target points.
+    entrants and agents are indexed by seat. Returns a dict of points, hands played,
+    winning seat (None if tied after max_hands), and think seconds and moves per seat.
+    """
+    points = [0, 0]
+    think = [0.0, 0.0]
+    moves = [0, 0]
+    hands = 0
+    while max(points) < target and hands < max_hands:
+        game = GinRummy(seed=seed, game=hands)
+        steps = 0
+        while not game.is_ended() and steps < MAX_STEPS:
+            seat = game.get_cur_player()
+            start = time.perf_counter()
+            action = choose_action(entrants[seat], agents[seat], game, rng)
+            think[seat] += time.perf_counter() - start
+            moves[seat] += 1
+            game.take_action(action)
+            steps += 1
+        for seat in range(2):
+            points[seat] += max(0, game.get_points(seat))
+        hands += 1
+    winner = None if points[0] == points[1] else int(points[1] > points[0])
+    return {'points': points, 'hands': hands, 'winner': winner, 'think': think, 'moves': moves}
+
+
+def play_pair(entrants, agents, first: int, second: int, seed: int, target: int = MATCH_POINTS,
+              max_hands: int = MAX_HANDS):
+    """
+    Plays two matches between entrants first and second on the same deals, with seats
+    swapped. Returns the matches, each with the entrant index of every seat as 'players'.
+    """
+    matches = []
+    for players in ((first, second), (second, first)):
+        rng = random.Random(seed ^ players[0])
+        match = play_match([entrants[i] for i in players], [agents[i] for i in players], seed, rng, target, max_hands)
+        match['players'] = players
+        match['seed'] = seed
+        matches.append(match)
+    return matches
+
+
+def _play_pair_in_worker(task):
+    return play_pair(_entrants, _agents, *task)
+
+
+def match_score(match, entrant: int) -> float:
+    """ 1 for a match won by the entrant, 0.5 for a tie and 0 for a loss """
+    if match['winner'] is None:
+        return 0.5
+    return 1.0 if match['players'][match['winner']] == entrant else 0.0
+
+
+def fit_elo(num_entrants: int, matches, iterations: int = 200) -> np.ndarray:
+    """
+    Elo ratings fitted to match results by Bradley-Terry minorization-maximization,
+    centered on 0. Every pairing that met counts one extra tie, so unbeaten entrants
+    still get a finite rating.
+    """
+    wins = np.zeros((num_entrants, num_entrants))
+    for match in matches:
+        a, b = match['players']
+        score = match_score(match, a)
+        wins[a, b] += score
+        wins[b, a] += 1 - score
+    games = wins + wins.T
+    met = games > 0
+    wins[met] += 0.5
+    games[met] += 1
+    strength = np.ones(num_entrants)
+    for _ in range(iterations):
+        pair_sums = strength[:, None] + strength[None, :]
+        denominators = (games / pair_sums).sum(axis=1)
+        strength = np.where(denominators > 0, wins.sum(axis=1) / np.maximum(denominators, 1e-12), strength)
+        strength /= np.exp(np.log(strength).mean())
+    return 400 * np.log10(strength)
+
+
+class TournamentResult:
+    """ Matches played by a tournament, with ratings, win rates and throughput """
+
+    def __init__(self, entrants, matches, seconds: float, stopped):
+        self.entrants = entrants
+        self.matches = matches
+        self.seconds = seconds
+        self.stopped = stopped  # Pairings ended early because their results separated
+        self.elo = fit_elo(len(entrants), matches)
+
+    def summary(self):
+        """ Per entrant: Elo, match wins, losses and ties, score rate, and think time per move """
+        rows = []
+        for i, entrant in enumerate(self.entrants):
+            played = [match for match in self.matches if i in match['players']]
+            scores = [match_score(match, i) for match in played]
+            seats = [match['players'].index(i) for match in played]
+            think = sum(match['think'][seat] for match, seat in zip(played, seats))
+            moves = sum(match['moves'][seat] for match, seat in zip(played, seats))
+            rows.append({
+                'name': entrant.name,
+                'elo': float(self.elo[i]),
+                'matches': len(played),
+                'wins': scores.count(1.0),
+                'losses': scores.count(0.0),
+                'ties': scores.count(0.5),
+                'score': sum(scores) / len(scores) if scores else 0.0,
+                'moves': moves,
+                'think_ms_per_move': 1000 * think / moves if moves else 0.0,
+            })
+        return rows
+
+    def throughput(self):
+        hands = sum(match['hands'] for match in self.matches)
+        return {
+            'matches': len(self.matches),
+            'hands': hands,
+            'seconds': self.seconds,
+            'matches_per_second': len(self.matches) / self.seconds if self.seconds else 0.0,
+            'hands_per_second': hands / self.seconds if self.seconds else 0.0,
+        }
+
+    def table(self) -> str:
+        lines = [f"{'name':20} {'elo':>7} {'W':>5} {'L':>5} {'T':>4} {'score':>6} {'ms/move':>8}"]
+        for row in sorted(self.summary(), key=lambda row: -row['elo']):
+            lines.append(f"{row['name']:20} {row['elo']:7.0f} {row['wins']:5d} {row['losses']:5d} {row['ties']:4d} "
+                         f"{row['score']:6.1%} {row['think_ms_per_move']:8.2f}")
+        stats = self.throughput()
+        lines.append(f"{stats['matches']} matches, {stats['hands']} hands in {stats['seconds']:.1f}s "
+                     f"({stats['hands_per_second']:.1f} hands/s)")
+        return '\n'.join(lines)
+
+
+class Tournament:
+    """
+    Plays entrants against each other in matches to target points: every pairing in
+    a round robin, or the first entrant against each other one in a gauntlet. Matches
+    come in pairs on the same deals with seats swapped, so the luck of the cards
+    mostly cancels out. Each round plays batch_pairs pairs for every pairing still
+    open, spread over num_workers processes (in this process with 1 worker). A pairing
+    closes after max_pairs pairs, or once it has min_pairs and the confidence interval
+    (z standard errors) of its mean pair score excludes an even result.
+    """
+
+    def __init__(self, entrants, mode: str = ROUND_ROBIN, num_workers: int = 1, min_pairs: int = 4,
+                 max_pairs: int = 50, batch_pairs: int = None, z: float = 1.96, target: int = MATCH_POINTS,
+                 max_hands: int = MAX_HANDS, seed: int = None):
+        if mode not in (ROUND_ROBIN, GAUNTLET):
+            raise Exception(f"Unknown tournament mode: {mode}")
+        self.entrants = list(entrants)
+        self.mode = mode
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.min_pairs = min_pairs
+        self.max_pairs = max_pairs
+        self.batch_pairs = batch_pairs or self.num_workers
+        self.z = z
+        self.target = target
+        self.max_hands = max_hands
+        self.rng = random.Random(seed)
+        self.agents = None
+        self.pool = None
+
+    def get_pairings(self):
+        count = len(self.entrants)
+        if self.mode == GAUNTLET:
+            return [(0, j) for j in range(1, count)]
+        return [(i, j) for i in range(count) for j in range(i + 1, count)]
+
+    def is_separated(self, pair_scores) -> bool:
+        if len(pair_scores) < self.min_pairs:
+            return False
+        mean = float(np.mean(pair_scores))
+        error = float(np.std(pair_scores, ddof=1)) / math.sqrt(len(pair_scores))
+        return abs(mean - 0.5) > self.z * error if error > 0 else mean != 0.5
+
+    def play(self, tasks):
+        if self.num_workers == 1:
+            if self.agents is None:
+                self.agents = [entrant.agent_factory() for entrant in self.entrants]
+            return [play_pair(self.entrants, self.agents, *task) for task in tasks]
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.num_workers, initializer=_init_worker, initargs=(self.entrants,))
+        return self.pool.map(_play_pair_in_worker, tasks)
+
+    def run(self) -> TournamentResult:
+        pair_scores = {pairing: [] for pairing in self.get_pairings()}
+        open_pairings = list(pair_scores)
+        stopped = []
+        matches = []
+        start = time.perf_counter()
+        while open_pairings:
+            tasks = []
+            for first, second in open_pairings:
+                count = min(self.batch_pairs, self.max_pairs - len(pair_scores[first, second]))
+                tasks.extend((first, second, self.rng.getrandbits(63), self.target, self.max_hands)
+                             for _ in range(count))
+            for pair in self.play(tasks):
+                first, second = pair[0]['players']
+                pair_scores[first, second].append(sum(match_score(match, first) for match in pair) / 2)
+                matches.extend(pair)
+            still_open = []
+            for pairing in open_pairings:
+                if self.is_separated(pair_scores[pairing]):
+                    stopped.append(pairing)
+                elif len(pair_scores[pairing]) < self.max_pairs:
+                    still_open.append(pairing)
+            open_pairings = still_open
+            logger.info('%d matches played, %d pairings open', len(matches), len(open_pairings))
+        return TournamentResult(self.entrants, matches, time.perf_counter() - start, stopped)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
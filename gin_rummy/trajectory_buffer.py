@@ -0,0 +1,154 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Header counters, stored as int64 at the start of the shared block
+_WRITE = 0
+_READ = 1
+_GAMES = 2
+_STEPS = 3
+_HEADER_SIZE = 4
+
+
+class TrajectoryBuffer:
+    """
+    Ring buffer of (observation, action mask, policy, outcome) records in shared memory.
+    Writers in other processes copy records straight into the shared arrays, so nothing
+    is pickled. A writer blocks until its whole write fits and then reserves all its
+    slots at once, which throttles self-play workers when the consumer falls behind.
+    Slots are reserved in order under the lock but filled in afterwards, so a record
+    only counts as written once its ready flag is set.
+    Create it in the parent, pass get_spec() to workers and attach() there.
+    """
+
+    def __init__(self, capacity: int, observation_size: int, action_size: int, spec=None):
+        self.capacity = capacity
+        self.observation_size = observation_size
+        self.action_size = action_size
+        layout = [
+            ('header', np.int64, (_HEADER_SIZE,)),
+            ('ready', np.uint8, (capacity,)),
+            ('observations', np.uint8, (capacity, observation_size)),
+            ('masks', np.uint8, (capacity, action_size)),
+            ('policies', np.float32, (capacity, action_size)),
+            ('outcomes', np.float32, (capacity,)),
+        ]
+        size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, dtype, shape in layout)
+        if spec is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.lock = multiprocessing.Lock()
+            self.not_full = multiprocessing.Condition(self.lock)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=spec['name'])
+            self.lock = spec['lock']
+            self.not_full = spec['not_full']
+            self.owner = False
+        offset = 0
+        for name, dtype, shape in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            setattr(self, name, array)
+            offset += array.nbytes
+        if self.owner:
+            self.header[:] = 0
+            self.ready[:] = 0
+
+    def get_spec(self):
+        """ Everything a worker process needs to attach to this buffer """
+        return {
+            'name': self.shm.name,
+            'capacity': self.capacity,
+            'observation_size': self.observation_size,
+            'action_size': self.action_size,
+            'lock': self.lock,
+            'not_full': self.not_full,
+        }
+
+    @staticmethod
+    def attach(spec) -> 'TrajectoryBuffer':
+        return TrajectoryBuffer(spec['capacity'], spec['observation_size'], spec['action_size'], spec=spec)
+
+    def write(self, observations, masks, policies, outcomes, stop_event=None, games: int = 0) -> bool:
+        """
+        Appends records, blocking while the buffer is full, and counts them as steps of
+        the given number of finished games. Returns False if stop_event was set before
+        every record could be written.
+        """
+        count = len(outcomes)
+        if count > self.capacity:
+            raise Exception("Can't write more records than the buffer capacity")
+        with self.not_full:
+            while self.capacity - int(self.header[_WRITE]) + int(self.header[_READ]) < count:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                self.not_full.wait(timeout=0.1)
+            start = int(self.header[_WRITE])
+            self.header[_WRITE] = start + count
+            self.header[_GAMES] += games
+            self.header[_STEPS] += count
+        slots = np.arange(start, start + count) % self.capacity
+        self.observations[slots] = observations
+        self.masks[slots] = masks
+        self.policies[slots] = policies
+        self.outcomes[slots] = outcomes
+        self.ready[slots] = 1
+        return True
+
+    def read(self, max_records: int):
+        """ Removes and returns up to max_records of the oldest complete records, as copies """
+        with self.lock:
+            start = int(self.header[_READ])
+            end = min(int(self.header[_WRITE]), start + max_records)
+        count = self._count_ready(start, end)
+        slots = np.arange(start, start + count) % self.capacity
+        records = {
+            'observations': self.observations[slots],
+            'masks': self.masks[slots],
+            'policies': self.policies[slots],
+            'outcomes': self.outcomes[slots],
+        }
+        self.ready[slots] = 0
+        with self.not_full:
+            self.header[_READ] = start + count
+            self.not_full.notify_all()
+        return records
+
+    def _count_ready(self, start: int, end: int) -> int:
+        """ Number of consecutive written records from slot start, up to end """
+        ready = self.ready[np.arange(start, end) % self.capacity]
+        return len(ready) if ready.all() else int(ready.argmin())
+
+    def wait(self, count: int, timeout: float = 10.0) -> bool:
+        """ Waits until at least count written records are unread, returns False on timeout """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                start = int(self.header[_READ])
+                end = int(self.header[_WRITE])
+            if self._count_ready(start, min(end, start + count)) >= count:
+                return True
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+
+    def occupancy(self) -> float:
+        """ Fraction of the buffer holding unread records """
+        return (int(self.header[_WRITE]) - int(self.header[_READ])) / self.capacity
+
+    def get_counters(self):
+        return {
+            'games': int(self.header[_GAMES]),
+            'steps': int(self.header[_STEPS]),
+            'written': int(self.header[_WRITE]),
+            'read': int(self.header[_READ]),
+        }
+
+    def close(self):
+        for name in ('header', 'ready', 'observations', 'masks', 'policies', 'outcomes'):
+            setattr(self, name, None)
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
@@ -1 +1,3 @@
 from .mcts import Game, Agent
+from .search import MCTS
+from .determinized import DeterminizedMCTS
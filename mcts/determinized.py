@@ -0,0 +1,127 @@
+import logging
+import math
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+from mcts.mcts import Game
+from mcts.search import MCTS
+
+logger = logging.getLogger('mcts')
+
+# Agent of a worker process, built once by _init_worker
+_agent = None
+
+
+def _init_worker(agent_factory):
+    global _agent
+    _agent = agent_factory()
+
+
+def _search_determinization(agent, game: Game, player, seed, mcts_options):
+    """ Searches one determinization of the game, returns the root visit counts and simulations run """
+    world = game.determinize(player, random.Random(seed))
+    search = MCTS(agent, **mcts_options)
+    search.search(world)
+    return search.get_visit_counts(world.get_state_key()), search.simulations
+
+
+def _search_in_worker(task):
+    return _search_determinization(_agent, *task)
+
+
+class DeterminizedMCTS:
+    """
+    Information set search for games with hidden information. Each move samples
+    num_determinizations worlds consistent with what the player to move has observed
+    (Game.determinize), searches each with its own MCTS, and sums the root visit
+    counts. Determinizations are spread over num_workers processes; with 1 worker
+    they run in this process.
+
+    With time_limit set, the move takes about that many wall-clock seconds: every
+    determinization is searched for time_limit divided by the rounds each worker
+    runs, so more workers give each determinization more simulations.
+
+    agent_factory builds the Agent inside each worker and must be picklable, such as a
+    module level class or function. Other keyword arguments are passed to MCTS.
+    """
+
+    def __init__(self, agent_factory, num_determinizations: int = 8, num_workers: int = 1,
+                 num_simulations: int = 100, time_limit: float = None, seed: int = None, **mcts_options):
+        self.agent_factory = agent_factory
+        self.num_determinizations = num_determinizations
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.num_simulations = num_simulations
+        self.time_limit = time_limit
+        self.mcts_options = mcts_options
+        self.rng = random.Random(seed)
+        self.agent = None
+        self.pool = None
+        self.simulations = 0
+        self.search_time = 0.0
+        self.determinizations = 0
+
+    def get_options(self):
+        """ MCTS options for one determinization """
+        options = dict(self.mcts_options, num_simulations=self.num_simulations)
+        if self.time_limit is not None:
+            rounds = math.ceil(self.num_determinizations / self.num_workers)
+            options['time_limit'] = self.time_limit / rounds
+        return options
+
+    def search(self, game: Game) -> np.ndarray:
+        """ Returns the root visit counts summed over every determinization """
+        player = game.get_cur_player()
+        options = self.get_options()
+        tasks = [(game, player, self.rng.getrandbits(64), options) for _ in range(self.num_determinizations)]
+        start = time.perf_counter()
+        if self.num_workers == 1:
+            if self.agent is None:
+                self.agent = self.agent_factory()
+            results = [_search_determinization(self.agent, *task) for task in tasks]
+        else:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.num_workers, initializer=_init_worker,
+                                                 initargs=(self.agent_factory,))
+            results = self.pool.map(_search_in_worker, tasks)
+        elapsed = time.perf_counter() - start
+        counts = np.sum([visit_counts for visit_counts, _ in results], axis=0)
+        simulations = sum(simulations for _, simulations in results)
+        self.simulations += simulations
+        self.search_time += elapsed
+        self.determinizations += len(tasks)
+        logger.info('%d determinizations, %d simulations in %.3fs (%.0f/s)',
+                    len(tasks), simulations, elapsed, simulations / elapsed if elapsed else 0)
+        return counts
+
+    def get_action_prob(self, game: Game, temperature: float = 1.0):
+        """ Returns a policy over actions from the aggregated root visit counts """
+        counts = self.search(game).astype(np.float64)
+        if temperature == 0:
+            probs = np.zeros(len(counts))
+            probs[np.argmax(counts)] = 1
+            return probs
+        counts = counts ** (1 / temperature)
+        return counts / counts.sum()
+
+    def get_stats(self):
+        return {
+            'determinizations': self.determinizations,
+            'simulations': self.simulations,
+            'seconds': self.search_time,
+            'simulations_per_second': self.simulations / self.search_time if self.search_time else 0.0,
+        }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,7 +1,11 @@
 from abc import abstractmethod
 
+import numpy as np
+
 
 class Game:
+    __slots__ = ()
+
     @abstractmethod
     def get_cur_player(self):
         """
@@ -65,11 +69,43 @@ class Game:
         Input:
             observation: observation
         Returns:
-            string: a quick conversion of state to a string format.
-                    Required by MCTS for hashing.
+            hashable: a compact key for the observation, such as bytes.
+                      Used by MCTS as a dictionary key.
         """
         pass
 
+    def get_state_key(self):
+        """
+        Returns:
+            hashable: a compact key identifying the full game state.
+                      Used by MCTS as the transposition table key. Defaults
+                      to the observation key of the current player.
+        """
+        return self.get_observation_str(self.get_observation(self.get_cur_player()))
+
+    def is_chance_action(self, action):
+        """
+        Input:
+            action: action index
+        Returns:
+            boolean: True if the state after action also depends on chance or
+                     hidden information, such as drawing from a shuffled deck.
+                     MCTS looks such outcomes up by state key every time.
+        """
+        return False
+
+    def determinize(self, player, rng):
+        """
+        Input:
+            player: player whose information is kept
+            rng: random.Random used for sampling
+        Returns:
+            Game: a clone where everything hidden from player is sampled again,
+                  consistent with what player has observed. Used by
+                  DeterminizedMCTS. Games of perfect information return a clone.
+        """
+        return self.clone()
+
     @abstractmethod
     def is_ended(self):
         """
@@ -107,9 +143,29 @@ class Game:
 
 
 class Agent:
+    __slots__ = ()
+
     @abstractmethod
     def predict(self, game, game_player):
         """
         Returns:
             policy, value: stochastic policy and a continuous value of a game observation
         """
+
+    def predict_batch(self, observations, games=None):
+        """
+        Input:
+            observations: array of K stacked Game.get_observation results, each
+                          from the point of view of the player to move
+            games: the K games observed, when the caller has them
+        Returns:
+            policies, values: arrays of shape (K, action size) and (K,).
+                              Used by MCTS when batch_size > 1. Defaults to
+                              calling predict for each game; agents that work
+                              from observations alone should override it.
+        """
+        if games is None:
+            raise Exception(f"{type(self).__name__} can only predict a batch of games, not of observations")
+        predictions = [self.predict(game, game.get_cur_player()) for game in games]
+        return np.array([policy for policy, _ in predictions], dtype=np.float64), \
+            np.array([value for _, value in predictions], dtype=np.float64)
@@ -0,0 +1,150 @@
+import numpy as np
+
+# Per node: the parent it was first expanded from (-1 for none), the player to move,
+# total visits and its range of edges.
+NODE_FIELDS = (
+    ('parent', np.int32),
+    ('player', np.int8),
+    ('visits', np.int32),
+    ('first_edge', np.int32),
+    ('num_edges', np.int16),
+)
+# Per edge, one for each valid action of its node: the action, its prior, visit count
+# and value sum, and the node it leads to (-1 until that is known, CHANCE for edges
+# whose outcome varies).
+EDGE_FIELDS = (
+    ('action', np.int16),
+    ('prior', np.float32),
+    ('visit_count', np.int32),
+    ('value_sum', np.float32),
+    ('child', np.int32),
+)
+CHANCE = -2
+NODE_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in NODE_FIELDS)
+EDGE_BYTES = sum(np.dtype(dtype).itemsize for _, dtype in EDGE_FIELDS)
+
+
+class NodeStore:
+    """
+    Search tree statistics as a struct of arrays. Nodes and edges are rows of parallel
+    NumPy arrays that grow by doubling. The edges of a node are contiguous, and only
+    valid actions get an edge, so a node costs NODE_BYTES plus EDGE_BYTES per valid
+    action.
+    """
+
+    def __init__(self, node_capacity: int = 1024, edge_capacity: int = 8192):
+        self.size = 0
+        self.edge_size = 0
+        for name, dtype in NODE_FIELDS:
+            setattr(self, name, np.zeros(node_capacity, dtype=dtype))
+        for name, dtype in EDGE_FIELDS:
+            setattr(self, name, np.zeros(edge_capacity, dtype=dtype))
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def _grow(fields, owner, needed):
+        capacity = len(getattr(owner, fields[0][0]))
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, _ in fields:
+            array = getattr(owner, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(owner, name, grown)
+
+    def add(self, parent: int, player: int, actions, priors, chance=None) -> int:
+        """ Adds a node with one edge per action, returns its index. chance flags edges with random outcomes """
+        count = len(actions)
+        self._grow(NODE_FIELDS, self, self.size + 1)
+        self._grow(EDGE_FIELDS, self, self.edge_size + count)
+        node = self.size
+        start = self.edge_size
+        self.parent[node] = parent
+        self.player[node] = player
+        self.visits[node] = 0
+        self.first_edge[node] = start
+        self.num_edges[node] = count
+        end = start + count
+        self.action[start:end] = actions
+        self.prior[start:end] = priors
+        self.visit_count[start:end] = 0
+        self.value_sum[start:end] = 0
+        self.child[start:end] = -1
+        if chance is not None:
+            self.child[start:end][np.asarray(chance, dtype=bool)] = CHANCE
+        self.size += 1
+        self.edge_size = end
+        return node
+
+    def edges(self, node: int) -> slice:
+        start = int(self.first_edge[node])
+        return slice(start, start + int(self.num_edges[node]))
+
+    def compact(self, keep: np.ndarray) -> np.ndarray:
+        """
+        Keeps the nodes where keep is True, moved to the front in their current order
+        along with their edges. Links to removed nodes become -1. Returns the new index
+        of every old node, -1 for removed ones.
+        """
+        size = self.size
+        keep = np.asarray(keep[:size], dtype=bool)
+        mapping = np.full(size + 1, -1, dtype=np.int32)  # Index -1 maps to -1
+        mapping[:size][keep] = np.arange(int(keep.sum()), dtype=np.int32)
+
+        # Edges are laid out in node order, so kept edges stay contiguous per node
+        edge_keep = np.repeat(keep, self.num_edges[:size])
+        for name, _ in EDGE_FIELDS:
+            array = getattr(self, name)
+            kept = array[:self.edge_size][edge_keep]
+            array[:len(kept)] = kept
+        self.edge_size = int(edge_keep.sum())
+        child = self.child[:self.edge_size]
+        linked = child >= 0
+        child[linked] = mapping[child[linked]]
+
+        num_edges = self.num_edges[:size][keep]
+        for name, _ in NODE_FIELDS:
+            array = getattr(self, name)
+            kept = array[:size][keep]
+            array[:len(kept)] = kept
+        self.size = len(num_edges)
+        self.parent[:self.size] = mapping[self.parent[:self.size]]
+        self.first_edge[:self.size] = np.cumsum(num_edges) - num_edges
+        return mapping[:size]
+
+    def subtree(self, root: int) -> np.ndarray:
+        """
+        Marks every node below root: nodes first expanded under it, and nodes its edges
+        lead to, transitively.
+        """
+        size = self.size
+        keep = np.zeros(size + 1, dtype=bool)  # keep[-1] stays False for parent -1
+        keep[root] = True
+        parent = self.parent[:size]
+        owner = np.repeat(np.arange(size), self.num_edges[:size])
+        child = self.child[:self.edge_size]
+        linked = child >= 0
+        count = 1
+        while True:
+            keep[:size] |= keep[parent]
+            keep[child[linked & keep[owner]]] = True
+            new_count = int(keep.sum())
+            if new_count == count:
+                return keep[:size]
+            count = new_count
+
+    def clear(self):
+        self.size = 0
+        self.edge_size = 0
+
+    def nbytes(self) -> int:
+        """ Bytes used by the stored nodes and edges, not counting spare capacity """
+        return self.size * NODE_BYTES + self.edge_size * EDGE_BYTES
+
+    def allocated_bytes(self) -> int:
+        """ Bytes held by the arrays, spare capacity included """
+        return sum(getattr(self, name).nbytes for name, _ in NODE_FIELDS + EDGE_FIELDS)
@@ -0,0 +1,342 @@
+import logging
+import math
+import sys
+import time
+
+import numpy as np
+
+from mcts.mcts import Game, Agent
+from mcts.node_store import CHANCE, NodeStore
+
+logger = logging.getLogger('mcts')
+
+
+class MCTS:
+    """
+    PUCT Monte Carlo tree search over any Game, with Agent.predict supplying priors
+    and leaf values. Statistics live in a NodeStore, and a transposition table maps
+    Game.get_state_key() to node indices, so positions reached by different move orders
+    share statistics. Edges remember the node they lead to, so descents only compute
+    keys for moves not taken before; transitions must be determined by the state key.
+    When the store grows past max_nodes, or past max_memory bytes as estimated by
+    memory_bytes() (arrays, state keys and the table), the least visited nodes are
+    evicted.
+
+    With batch_size > 1, each step descends batch_size times, applying a virtual loss
+    along every path so later descents spread to other leaves, and evaluates all new
+    leaves with one Agent.predict_batch call.
+
+    With time_limit set, search runs for that many seconds instead of num_simulations.
+
+    leaf_solver, if given, is called with every new leaf and may return its exact value
+    for the player to move, used instead of asking the agent, with uniform priors.
+    It returns None for leaves it can't solve.
+
+    A descent that comes back to a position already on its path is scored as a draw.
+
+    Between moves, advance() re-roots the tree at the state actually reached and drops
+    everything else. Edges of chance actions (Game.is_chance_action) never cache their
+    child, so each outcome is looked up by key, and only the realized one is kept.
+    """
+
+    def __init__(self, agent: Agent, num_simulations: int = 100, c_puct: float = 1.0,
+                 max_nodes: int = None, max_memory: int = None, eviction_fraction: float = 0.25,
+                 batch_size: int = 1, virtual_loss: float = 1.0, time_limit: float = None, leaf_solver=None):
+        self.agent = agent
+        self.num_simulations = num_simulations
+        self.c_puct = c_puct
+        self.max_nodes = max_nodes
+        self.max_memory = max_memory
+        self.eviction_fraction = eviction_fraction
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+        self.time_limit = time_limit
+        self.leaf_solver = leaf_solver
+        self.store = NodeStore()
+        self.table = {}  # state key -> node index
+        self.keys = []  # node index -> state key
+        self.key_bytes = 0  # Size of the keys and of the node indices stored with them
+        self.action_size = None
+        self.simulations = 0
+        self.search_time = 0.0
+        self.evictions = 0
+        self.batches = 0
+        self.solved_leaves = 0
+        self.carried_visits = []  # Root visits kept by each advance()
+
+    def get_action_prob(self, game: Game, temperature: float = 1.0):
+        """ Runs num_simulations from the game state, returns a policy over actions from the root visit counts """
+        key = game.get_state_key()
+        self.search(game)
+        counts = self.get_visit_counts(key).astype(np.float64)
+        if temperature == 0:
+            probs = np.zeros(len(counts))
+            probs[np.argmax(counts)] = 1
+            return probs
+        counts = counts ** (1 / temperature)
+        return counts / counts.sum()
+
+    def get_visit_counts(self, key) -> np.ndarray:
+        """ Visit counts of every action from the node with the given state key """
+        return self._dense(key, self.store.visit_count)
+
+    def get_value_sums(self, key) -> np.ndarray:
+        return self._dense(key, self.store.value_sum)
+
+    def get_visits(self, key) -> int:
+        return int(self.store.visits[self.table[key]])
+
+    def _dense(self, key, values) -> np.ndarray:
+        edges = self.store.edges(self.table[key])
+        dense = np.zeros(self.action_size, dtype=values.dtype)
+        dense[self.store.action[edges]] = values[edges]
+        return dense
+
+    def search(self, game: Game):
+        root = game.get_state_key()
+        start = time.perf_counter()
+        if self.time_limit is not None:
+            deadline, limit = start + self.time_limit, math.inf
+        else:
+            deadline, limit = math.inf, self.num_simulations
+        done = 0
+        while done < limit and (done == 0 or time.perf_counter() < deadline):
+            if self.batch_size > 1:
+                count = min(self.batch_size, limit - done)
+                self.simulate_batch(game, count)
+            else:
+                count = 1
+                self.simulate(game.clone())
+            done += count
+            self.enforce_budget(protect=root)
+        elapsed = time.perf_counter() - start
+        self.search_time += elapsed
+        self.simulations += done
+        logger.info('%d simulations in %.3fs (%.0f/s), %d nodes',
+                    done, elapsed, done / elapsed if elapsed else 0, len(self.table))
+
+    def descend(self, game: Game):
+        """
+        Follows the tree policy, modifying the game, until a terminal or unexpanded state.
+        Returns the path as lists of node and edge indices, the leaf key (None when the
+        descent ended without reaching a new state) and the value of such an ending for
+        the player to move.
+        """
+        store = self.store
+        nodes, edges = [], []
+        if game.is_ended():
+            return (nodes, edges), None, game.get_score(game.get_cur_player())
+        key = game.get_state_key()
+        node = self.table.get(key)
+        while node is not None:
+            if node in nodes:
+                return (nodes, edges), None, 0.0
+            edge = self.select(node)
+            nodes.append(node)
+            edges.append(edge)
+            game.take_action(int(store.action[edge]))
+            if game.is_ended():
+                return (nodes, edges), None, game.get_score(game.get_cur_player())
+            node = int(store.child[edge])
+            if node < 0:
+                key = game.get_state_key()
+                node = self.table.get(key)
+                if node is not None and store.child[edge] != CHANCE:
+                    store.child[edge] = node
+        return (nodes, edges), key, None
+
+    def simulate(self, game: Game):
+        """ Runs one simulation on a game it may modify """
+        path, key, value = self.descend(game)
+        if key is None:
+            player = game.get_cur_player()
+        else:
+            node, value = self.expand(game, key, path)
+            player = self.store.player[node]
+        self.backup(path, player, value)
+
+    def simulate_batch(self, game: Game, count: int):
+        """ Runs count simulations from the game state, evaluating their leaves in one batch """
+        pending = {}
+        for _ in range(count):
+            leaf = game.clone()
+            path, key, value = self.descend(leaf)
+            if key is None:
+                self.backup(path, leaf.get_cur_player(), value)
+                continue
+            if key not in pending:
+                value = self.solve_leaf(leaf)
+                if value is not None:
+                    # Solved leaves are added right away and never go to the agent
+                    node = self.add_node(leaf, key, np.zeros(leaf.get_action_size()), path)
+                    self.backup(path, self.store.player[node], value)
+                    continue
+            self.add_virtual_loss(path)
+            if key in pending:
+                pending[key][1].append(path)
+            else:
+                pending[key] = (leaf, [path])
+        if not pending:
+            return
+        leaves = list(pending.items())
+        games = [leaf for _, (leaf, _) in leaves]
+        observations = np.stack([np.asarray(leaf.get_observation(leaf.get_cur_player())) for leaf in games])
+        policies, values = self.agent.predict_batch(observations, games)
+        self.batches += 1
+        for (key, (leaf, paths)), policy, value in zip(leaves, policies, values):
+            node = self.add_node(leaf, key, policy, paths[0])
+            player = self.store.player[node]
+            for path in paths:
+                self.link(path, node)
+                self.remove_virtual_loss(path)
+                self.backup(path, player, value)
+
+    def expand(self, game: Game, key, path=None):
+        """ Adds a node for the game state, returns its index with the agent's value estimate """
+        value = self.solve_leaf(game)
+        if value is not None:
+            return self.add_node(game, key, np.zeros(game.get_action_size()), path), value
+        policy, value = self.agent.predict(game, game.get_cur_player())
+        return self.add_node(game, key, policy, path), value
+
+    def solve_leaf(self, game: Game):
+        """ The leaf_solver value of a leaf, or None """
+        if self.leaf_solver is None:
+            return None
+        value = self.leaf_solver(game)
+        if value is not None:
+            self.solved_leaves += 1
+        return value
+
+    def add_node(self, game: Game, key, policy, path=None) -> int:
+        """ Adds a node below the end of path, or a root without one """
+        player = game.get_cur_player()
+        valid = np.asarray(game.get_valid_actions(player), dtype=np.float64)
+        self.action_size = len(valid)
+        actions = np.flatnonzero(valid)
+        prior = np.asarray(policy, dtype=np.float64)[actions]
+        total = prior.sum()
+        prior = prior / total if total > 0 else np.full(len(actions), 1 / len(actions))
+        parent = path[0][-1] if path and path[0] else -1
+        chance = [game.is_chance_action(action) for action in actions]
+        node = self.store.add(parent, player, actions, prior, chance)
+        self.table[key] = node
+        self.keys.append(key)
+        self.key_bytes += sys.getsizeof(key) + sys.getsizeof(node)
+        if path:
+            self.link(path, node)
+        return node
+
+    def link(self, path, node: int):
+        """ Points the last edge of path at node, unless it is a chance edge """
+        edges = path[1]
+        if edges and self.store.child[edges[-1]] != CHANCE:
+            self.store.child[edges[-1]] = node
+
+    def add_virtual_loss(self, path):
+        """ Counts the path as visited and lost, until its leaf is evaluated """
+        nodes, edges = path
+        store = self.store
+        store.visit_count[edges] += 1
+        store.value_sum[edges] -= self.virtual_loss
+        store.visits[nodes] += 1
+
+    def remove_virtual_loss(self, path):
+        nodes, edges = path
+        store = self.store
+        store.visit_count[edges] -= 1
+        store.value_sum[edges] += self.virtual_loss
+        store.visits[nodes] -= 1
+
+    def select(self, node: int) -> int:
+        """ Returns the index of the edge to follow from node """
+        store = self.store
+        start = int(store.first_edge[node])
+        end = start + int(store.num_edges[node])
+        counts = store.visit_count[start:end]
+        # Value sums are 0 on unvisited edges, so this is 0 there
+        q = store.value_sum[start:end] / np.maximum(counts, 1)
+        u = q + (self.c_puct * math.sqrt(store.visits[node] + 1)) * store.prior[start:end] / (1 + counts)
+        return start + int(u.argmax())
+
+    def backup(self, path, player, value):
+        """ Adds the leaf value, seen from each node's player, along the path """
+        nodes, edges = path
+        if not nodes:
+            return
+        store = self.store
+        # Nodes on a path are distinct, so fancy indexed updates don't collide
+        store.visit_count[edges] += 1
+        store.value_sum[edges] += np.where(store.player[nodes] == player, value, -value)
+        store.visits[nodes] += 1
+
+    def memory_bytes(self) -> int:
+        """
+        Estimated bytes held by the search: the NodeStore arrays with their spare
+        capacity, the state keys and node indices, and the table and key list.
+        """
+        return self.store.allocated_bytes() + self.key_bytes + sys.getsizeof(self.table) + sys.getsizeof(self.keys)
+
+    def node_bytes(self):
+        """ Average bytes per stored node, edges, keys and table entries included """
+        if not self.store.size:
+            return 0
+        return self.memory_bytes() / self.store.size
+
+    def enforce_budget(self, protect=None):
+        """ Evicts the least visited nodes once the store is over max_nodes or max_memory """
+        size = self.store.size
+        limit = self.max_nodes
+        if self.max_memory is not None and size:
+            memory_limit = int(self.max_memory // self.node_bytes())
+            limit = memory_limit if limit is None else min(limit, memory_limit)
+        if limit is None or size <= limit:
+            return
+        target = int(limit * (1 - self.eviction_fraction))
+        keep = np.zeros(size, dtype=bool)
+        if target:
+            keep[np.argpartition(-self.store.visits[:size], target - 1)[:target]] = True
+        if protect in self.table:
+            keep[self.table[protect]] = True
+        self.evictions += size - int(keep.sum())
+        self.compact(keep)
+
+    def advance(self, game: Game) -> int:
+        """
+        Re-roots the tree at the game's state after a real move: keeps the subtree
+        below that state, drops every other node and compacts the store. Returns the
+        visits carried over, 0 when the state was never reached by the search.
+        """
+        root = self.table.get(game.get_state_key())
+        if root is None:
+            carried = 0
+            self.store.clear()
+            self.keys = []
+            self.table = {}
+            self.key_bytes = 0
+        else:
+            carried = int(self.store.visits[root])
+            self.compact(self.store.subtree(root))
+        self.carried_visits.append(carried)
+        logger.info('Advanced to a root with %d visits, %d nodes kept', carried, len(self.table))
+        return carried
+
+    def compact(self, keep):
+        """ Keeps only the nodes where keep is True, renumbering them and the table """
+        self.store.compact(keep)
+        self.keys = [key for key, kept in zip(self.keys, keep) if kept]
+        self.table = {key: node for node, key in enumerate(self.keys)}
+        self.key_bytes = sum(sys.getsizeof(key) + sys.getsizeof(node) for node, key in enumerate(self.keys))
+
+    def get_stats(self):
+        return {
+            'simulations': self.simulations,
+            'seconds': self.search_time,
+            'simulations_per_second': self.simulations / self.search_time if self.search_time else 0.0,
+            'nodes': len(self.table),
+            'node_bytes': self.node_bytes(),
+            'evictions': self.evictions,
+            'batches': self.batches,
+            'solved_leaves': self.solved_leaves,
+            'carried_visits': self.carried_visits,
+        }
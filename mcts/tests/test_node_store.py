@@ -0,0 +1,50 @@
+from mcts.node_store import EDGE_BYTES, NODE_BYTES, NodeStore
+import numpy as np
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class TestNodeStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store = NodeStore(node_capacity=2, edge_capacity=2)
+
+    def add_chain(self):
+        """ Root 0 with children 1 and 2, and 3 below 2 """
+        store = self.store
+        root = store.add(-1, 0, [0, 2, 5], [0.2, 0.3, 0.5])
+        first = store.add(root, 1, [1], [1.0])
+        second = store.add(root, 1, [3, 4], [0.5, 0.5])
+        third = store.add(second, 0, [0, 1, 2, 3], [0.25] * 4)
+        store.child[store.first_edge[root]] = first
+        store.child[store.first_edge[root] + 1] = second
+        store.child[store.first_edge[second]] = third
+        return root, first, second, third
+
+    def test_add_and_grow(self):
+        root, first, second, third = self.add_chain()
+        store = self.store
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.edge_size, 10)
+        self.assertEqual(list(store.action[store.edges(second)]), [3, 4])
+        self.assertEqual(store.parent[third], second)
+        self.assertEqual(store.nbytes(), 4 * NODE_BYTES + 10 * EDGE_BYTES)
+
+    def test_compact(self):
+        root, first, second, third = self.add_chain()
+        store = self.store
+        store.visit_count[store.edges(third)] = [1, 2, 3, 4]
+        mapping = store.compact(np.array([False, False, True, True]))
+        self.assertEqual(list(mapping), [-1, -1, 0, 1])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.edge_size, 6)
+        self.assertEqual(store.parent[0], -1)
+        self.assertEqual(store.parent[1], 0)
+        self.assertEqual(list(store.action[store.edges(0)]), [3, 4])
+        self.assertEqual(list(store.child[store.edges(0)]), [1, -1])
+        self.assertEqual(list(store.visit_count[store.edges(1)]), [1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
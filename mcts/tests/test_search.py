@@ -0,0 +1,218 @@
+from mcts import Game, Agent, MCTS, DeterminizedMCTS
+import numpy as np
+import sys
+import unittest
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class Nim(Game):
+    """ Take 1 to 3 stones, whoever takes the last stone wins """
+    def __init__(self, stones=5):
+        self.stones = stones
+        self.cur_player = 0
+        self.winner = None
+
+    def get_cur_player(self):
+        return self.cur_player
+
+    def get_action_size(self):
+        return 3
+
+    def get_valid_actions(self, player):
+        return [1 if i + 1 <= self.stones else 0 for i in range(3)]
+
+    def take_action(self, action):
+        self.stones -= action + 1
+        if self.stones == 0:
+            self.winner = self.cur_player
+        self.cur_player = 1 - self.cur_player
+
+    def get_observation_size(self):
+        return 2
+
+    def get_observation(self, player):
+        return [self.stones, player]
+
+    def get_observation_str(self, observation):
+        return str(observation)
+
+    def get_state_key(self):
+        return self.stones, self.cur_player
+
+    def is_ended(self):
+        return self.stones == 0
+
+    def is_draw(self):
+        return False
+
+    def get_score(self, player):
+        return 1 if player == self.winner else -1
+
+    def clone(self):
+        game = Nim(self.stones)
+        game.cur_player = self.cur_player
+        game.winner = self.winner
+        return game
+
+
+class Cycle(Nim):
+    """ Passing forever, the position repeats every two moves """
+    def get_action_size(self):
+        return 1
+
+    def get_valid_actions(self, player):
+        return [1]
+
+    def take_action(self, action):
+        self.cur_player = 1 - self.cur_player
+
+    def clone(self):
+        game = Cycle(self.stones)
+        game.cur_player = self.cur_player
+        return game
+
+
+class UniformAgent(Agent):
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, game, game_player):
+        return [1] * game.get_action_size(), 0
+
+    def predict_batch(self, observations, games=None):
+        self.batch_sizes.append(len(observations))
+        return np.ones((len(observations), 3)), np.zeros(len(observations))
+
+
+class TestMCTS(unittest.TestCase):
+    def test_finds_winning_move(self):
+        search = MCTS(UniformAgent(), num_simulations=300)
+        probs = search.get_action_prob(Nim(5), temperature=0)
+        self.assertEqual(list(probs), [1, 0, 0])
+
+    def test_transpositions(self):
+        search = MCTS(UniformAgent(), num_simulations=300)
+        search.get_action_prob(Nim(7))
+        # Only 2 states per stone count exist, however they are reached
+        self.assertLessEqual(len(search.table), 2 * 7)
+
+    def test_stats(self):
+        search = MCTS(UniformAgent(), num_simulations=50)
+        search.get_action_prob(Nim(5))
+        stats = search.get_stats()
+        self.assertEqual(stats['simulations'], 50)
+        self.assertGreater(stats['simulations_per_second'], 0)
+
+    def test_eviction(self):
+        search = MCTS(UniformAgent(), num_simulations=200, max_nodes=4)
+        game = Nim(12)
+        search.get_action_prob(game)
+        self.assertLessEqual(len(search.table), 4)
+        self.assertGreater(search.get_stats()['evictions'], 0)
+        self.assertIn(game.get_state_key(), search.table)
+
+    def test_memory_budget_counts_keys(self):
+        search = MCTS(UniformAgent(), num_simulations=200)
+        search.get_action_prob(Nim(40))
+        size = len(search.store)
+        table_bytes = sum(sys.getsizeof(key) for key in search.keys)
+        self.assertGreater(search.memory_bytes(), search.store.allocated_bytes() + table_bytes)
+        self.assertAlmostEqual(search.node_bytes() * size, search.memory_bytes())
+
+        budget = search.memory_bytes() // 2
+        limited = MCTS(UniformAgent(), num_simulations=200, max_memory=budget)
+        limited.get_action_prob(Nim(40))
+        self.assertGreater(limited.get_stats()['evictions'], 0)
+        self.assertLess(len(limited.store), size)
+
+    def test_cycle_scored_as_draw(self):
+        search = MCTS(UniformAgent(), num_simulations=20)
+        game = Cycle()
+        search.get_action_prob(game)
+        # Every simulation after the one expanding the root ends, instead of looping
+        self.assertEqual(search.get_visits(game.get_state_key()), 19)
+        self.assertLessEqual(len(search.table), 2)
+
+    def test_advance(self):
+        search = MCTS(UniformAgent(), num_simulations=200)
+        game = Nim(9)
+        search.get_action_prob(game)
+        game.take_action(0)
+        before = len(search.table)
+        # The simulation that expanded the child counts on the edge only
+        child_visits = search.get_visit_counts((9, 0))[0] - 1
+        self.assertEqual(search.advance(game), child_visits)
+        self.assertLess(len(search.table), before)
+        self.assertNotIn((9, 0), search.table)
+        self.assertEqual(search.get_visits(game.get_state_key()), child_visits)
+        self.assertEqual(search.store.parent[search.table[game.get_state_key()]], -1)
+        # Links still lead to the right nodes after compaction
+        search.get_action_prob(game)
+        store = search.store
+        for (stones, player), node in search.table.items():
+            self.assertEqual(search.keys[node], (stones, player))
+            for edge in range(*store.edges(node).indices(store.edge_size)):
+                child = store.child[edge]
+                if child >= 0:
+                    self.assertEqual(search.keys[child], (stones - store.action[edge] - 1, 1 - player))
+        self.assertEqual(search.get_stats()['carried_visits'], [child_visits])
+        self.assertGreater(search.get_visits(game.get_state_key()), child_visits)
+
+    def test_advance_unknown_state(self):
+        search = MCTS(UniformAgent(), num_simulations=20)
+        search.get_action_prob(Nim(9))
+        self.assertEqual(search.advance(Nim(20)), 0)
+        self.assertEqual(len(search.table), 0)
+
+    def test_time_limit(self):
+        search = MCTS(UniformAgent(), num_simulations=1, time_limit=0.05)
+        search.get_action_prob(Nim(12))
+        self.assertGreater(search.get_stats()['simulations'], 1)
+
+
+class TestBatchedMCTS(unittest.TestCase):
+    def test_finds_winning_move(self):
+        agent = UniformAgent()
+        search = MCTS(agent, num_simulations=400, batch_size=8)
+        probs = search.get_action_prob(Nim(9), temperature=0)
+        self.assertEqual(list(probs), [1, 0, 0])
+        self.assertGreater(max(agent.batch_sizes), 1)
+        self.assertEqual(search.get_stats()['batches'], len(agent.batch_sizes))
+
+    def test_virtual_loss_removed(self):
+        search = MCTS(UniformAgent(), num_simulations=64, batch_size=16, virtual_loss=3.0)
+        game = Nim(10)
+        search.get_action_prob(game)
+        key = game.get_state_key()
+        visits, visit_counts = search.get_visits(key), search.get_visit_counts(key)
+        self.assertEqual(visits, visit_counts.sum())
+        self.assertLessEqual(visits, 64)
+        self.assertTrue(np.all(np.abs(search.get_value_sums(key)) <= visit_counts))
+
+    def test_default_predict_batch(self):
+        class SingleAgent(Agent):
+            def predict(self, game, game_player):
+                return [1] * game.get_action_size(), 0
+
+        search = MCTS(SingleAgent(), num_simulations=400, batch_size=8)
+        probs = search.get_action_prob(Nim(9), temperature=0)
+        self.assertEqual(list(probs), [1, 0, 0])
+        with self.assertRaises(Exception):
+            SingleAgent().predict_batch(np.zeros((2, 3)))
+
+
+class TestDeterminizedMCTS(unittest.TestCase):
+    def test_perfect_information(self):
+        # Every determinization of Nim is the game itself
+        with DeterminizedMCTS(UniformAgent, num_determinizations=4, num_simulations=100, seed=0) as search:
+            probs = search.get_action_prob(Nim(5), temperature=0)
+            self.assertEqual(list(probs), [1, 0, 0])
+            stats = search.get_stats()
+        self.assertEqual(stats['determinizations'], 4)
+        self.assertEqual(stats['simulations'], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()